@@ -0,0 +1,412 @@
+import re
+import base64
+import threading
+import datetime as dt
+from email.message import EmailMessage
+from email.utils import parseaddr
+from zoneinfo import ZoneInfo
+
+import async_core
+import calendar_batch
+import event_store
+import mail_store
+import request_scheduler
+import tracing
+from ai_google_calendar import extract
+from utils import setup_gmail_service, fold_text
+import session
+
+TZ = ZoneInfo("Europe/Warsaw")
+
+# messages printed for a search unless the user asks for another number
+SEARCH_LIMIT = 20
+
+# changing more messages than this asks for a confirmation first
+CONFIRM_ABOVE = 10
+
+# messages listed before a bulk change, the rest is only counted
+PREVIEW_LIMIT = 10
+
+# Polish names of system labels, e.g. "przenieś do kosza", "pokaż wysłane"
+LABEL_ALIASES = {
+    "odebrane": "INBOX", "skrzynka odbiorcza": "INBOX", "wysłane": "SENT", "kosz": "TRASH",
+    "spam": "SPAM", "oznaczone gwiazdką": "STARRED", "gwiazdka": "STARRED", "ważne": "IMPORTANT",
+    "wersje robocze": "DRAFT", "robocze": "DRAFT",
+}
+
+_ALIASES = {fold_text(name): label_id for name, label_id in LABEL_ALIASES.items()}
+
+MAIL_FILTER_RULES = (
+    "- from → sender name or address the user mentions, in its base form ('od Anny' → 'Anna').\n"
+    "- to → recipient name or address ('wysłane do Jana' → 'Jan').\n"
+    "- subject → words the subject must contain; text → words that may appear anywhere.\n"
+    "- label → folder or label name ('faktury', 'kosz', 'wysłane', 'odebrane').\n"
+    "- unread → true for 'nieprzeczytane', false for 'przeczytane'.\n"
+    "- after / before → ISO 8601 dates with timezone Europe/Warsaw for time phrases "
+    "('wczoraj', 'z ostatniego tygodnia'); before is exclusive.\n"
+    "- limit → only when the user asks for a number of messages.\n"
+    "Omit every filter the user did not mention.\n"
+)
+
+SEARCH_EMAILS_RULES = (
+    "Convert the following Polish natural language request into a function_call "
+    "searching the user's Gmail mailbox.\n"
+    "Rules:\n"
+    + MAIL_FILTER_RULES +
+    "Never return plain text, only function_call."
+)
+
+MODIFY_EMAILS_RULES = (
+    "Convert the following Polish natural language request into a function_call "
+    "changing messages in the user's Gmail mailbox.\n"
+    "The filters select the messages:\n"
+    + MAIL_FILTER_RULES +
+    "The actions say what to do with them:\n"
+    "- moveTo → folder or label to move them to ('przenieś do faktur' → 'Faktury', 'do kosza' → 'kosz'); "
+    "deleting messages ('usuń', 'skasuj') moves them to 'kosz'.\n"
+    "- addLabels / removeLabels → labels to add or remove without moving the messages.\n"
+    "- markRead → true for 'oznacz jako przeczytane', false for 'oznacz jako nieprzeczytane'.\n"
+    "- archive → true for 'zarchiwizuj'.\n"
+    "- star → true for 'oznacz gwiazdką', false to remove the star.\n"
+    "Never return plain text, only function_call."
+)
+
+SEND_EMAIL_RULES = (
+    "Convert the following Polish natural language request into a function_call sending an e-mail.\n"
+    "Rules:\n"
+    "- to → e-mail addresses of the recipients exactly as the user gave them.\n"
+    "- subject → a short subject in Polish, taken from the request or summarizing it.\n"
+    "- body → the message in Polish, written out in full from what the user wants to say.\n"
+    "- cc → only when the user asks for a copy to someone.\n"
+    "Never return plain text, only function_call."
+)
+
+_labels = None
+_labels_lock = threading.Lock()
+
+def labels(refresh: bool = False) -> list[dict]:
+    """Labels of the mailbox, system and user ones, fetched once and on refresh."""
+    global _labels
+
+    with _labels_lock:
+        if _labels is None or refresh:
+            _labels = setup_gmail_service().users().labels().list(userId="me").execute().get("labels", [])
+        return _labels
+
+def resolve_label(name: str, create: bool = False) -> str | None:
+    """Label id for a label name (Polish names of system labels included), case- and diacritic-insensitive.
+
+    With create, a missing user label is created after a confirmation.
+    """
+    folded = fold_text(name.strip())
+    if folded in _ALIASES:
+        return _ALIASES[folded]
+
+    # a label created in Gmail since the list was fetched is found on the second pass
+    for refresh in (False, True):
+        for label in labels(refresh):
+            if folded in (fold_text(label["name"]), label["id"].lower()):
+                return label["id"]
+
+    if not create:
+        print(f"❌ Nie znaleziono etykiety: {name}")
+        return None
+
+    confirm = session.current().ask(f"Etykieta {name} nie istnieje. Utworzyć? (T/N): ", "confirm").lower()
+    if confirm not in ("t", "y"):
+        return None
+
+    label = setup_gmail_service().users().labels().create(
+        userId="me", body={"name": name.strip(), "labelListVisibility": "labelShow", "messageListVisibility": "show"}
+    ).execute()
+    labels(refresh=True)
+    print(f"🏷️ Utworzono etykietę: {label['name']}")
+    return label["id"]
+
+def _filters(args: dict) -> dict | None:
+    """mail_store.iter_messages() filters from function_call args; None when a label does not exist."""
+    filters = {
+        "sender": args.get("from"), "recipient": args.get("to"), "subject": args.get("subject"),
+        "text": args.get("text"), "unread": args.get("unread"), "label_ids": (),
+        "after": event_store.to_timestamp(args["after"]) if args.get("after") else None,
+        "before": event_store.to_timestamp(args["before"]) if args.get("before") else None,
+    }
+    if args.get("label"):
+        label_id = resolve_label(args["label"])
+        if label_id is None:
+            return None
+        filters["label_ids"] = (label_id,)
+    return filters
+
+def gmail_query(filters: dict) -> str:
+    """The Gmail search box query for filters, used when the header index is off or unavailable."""
+    terms = []
+    for operator, key in (("from", "sender"), ("to", "recipient"), ("subject", "subject")):
+        if filters.get(key):
+            terms.append(f'{operator}:"{filters[key]}"')
+    if filters.get("text"):
+        terms.append(filters["text"])
+    if filters.get("unread") is not None:
+        terms.append("is:unread" if filters["unread"] else "-is:unread")
+    for operator in ("after", "before"):
+        if filters.get(operator) is not None:
+            terms.append(f"{operator}:{int(filters[operator])}")
+    return " ".join(terms)
+
+def _iter_live_messages(filters: dict, limit: int | None):
+    """Yield messages matching filters straight from the API, newest first, one list page at a time."""
+    service = setup_gmail_service()
+    query = gmail_query(filters)
+    found, page_token = 0, None
+
+    while limit is None or found < limit:
+        page = service.users().messages().list(
+            userId="me", q=query or None, labelIds=list(filters["label_ids"]) or None,
+            maxResults=min(limit - found, mail_store.LIST_PAGE_SIZE) if limit else mail_store.LIST_PAGE_SIZE,
+            pageToken=page_token
+        ).execute()
+
+        for message in mail_store.iter_metadata([message["id"] for message in page.get("messages", [])]):
+            found += 1
+            yield mail_store.from_api(message)
+
+        page_token = page.get("nextPageToken")
+        if not page_token:
+            return
+
+def iter_emails(filters: dict, limit: int | None = None, force_refresh: bool = False):
+    """Lazily yield messages matching filters, newest first, from the header index or the API.
+
+    While the index is first built in the background the API's q= search answers.
+    """
+    if mail_store.ENABLED:
+        try:
+            ready = mail_store.ensure_fresh(force_refresh)
+        except request_scheduler.DeadlineExceeded:
+            # a live search would have no time left either
+            raise
+        except Exception as e:
+            print(f"⚠️ Lokalny indeks poczty niedostępny, szukam na żywo: {e}")
+        else:
+            if ready:
+                yield from mail_store.iter_messages(**filters, limit=limit)
+                return
+            print("⏳ Indeks poczty jest budowany w tle, szukam na żywo.")
+
+    yield from _iter_live_messages(filters, limit)
+
+def _describe(message: dict) -> str:
+    when = dt.datetime.fromtimestamp(message["internalTs"], TZ).strftime("%d.%m.%Y %H:%M")
+    icon = "📩" if "UNREAD" in message["labelIds"] else "✉️"
+    return f"{icon} {when} {mail_store.sender_name(message)}: {message['subject'] or '(bez tematu)'}"
+
+def search_emails_api(args: dict):
+    """Print the messages matching the filters of a search_emails function_call as they are found."""
+    filters = _filters(args)
+    if filters is None:
+        return
+
+    found = False
+    for message in iter_emails(filters, limit=int(args.get("limit") or SEARCH_LIMIT)):
+        found = True
+        print(_describe(message), flush=True)
+
+    if not found:
+        print("📭 Brak pasujących wiadomości.")
+
+def modify_messages(message_ids: list[str], added=(), removed=()):
+    """Add and remove labels of many messages, MODIFY_LIMIT ids per batchModify call."""
+    service = setup_gmail_service()
+
+    for offset in range(0, len(message_ids), mail_store.MODIFY_LIMIT):
+        chunk = message_ids[offset:offset + mail_store.MODIFY_LIMIT]
+        with tracing.span("gmail.batch_modify", messages=len(chunk)):
+            service.users().messages().batchModify(
+                userId="me", body={"ids": chunk, "addLabelIds": list(added), "removeLabelIds": list(removed)}
+            ).execute()
+        mail_store.relabel(chunk, added, removed)
+
+def trash_messages(message_ids: list[str]) -> list[dict]:
+    """Move many messages to the trash with batched messages.trash calls."""
+    service = setup_gmail_service()
+    messages = service.users().messages()
+    requests = [(message_id, messages.trash(userId="me", id=message_id)) for message_id in message_ids]
+
+    results = calendar_batch.execute(service, requests, api="gmail", limit=mail_store.BATCH_LIMIT)
+    mail_store.relabel([result["item"] for result in results if result["ok"]], ["TRASH"])
+    return results
+
+def _label_changes(args: dict) -> tuple[set, set, bool] | None:
+    """(labels to add, labels to remove, move to trash) for the actions of a modify_emails function_call."""
+    added, removed, trash = set(), set(), False
+
+    if args.get("moveTo"):
+        target = resolve_label(args["moveTo"], create=True)
+        if target is None:
+            return None
+        if target == "TRASH":
+            trash = True
+        elif target != "INBOX":
+            added.add(target)
+            removed.add("INBOX")
+        else:
+            added.add("INBOX")
+
+    for name in args.get("addLabels") or []:
+        label_id = resolve_label(name, create=True)
+        if label_id is None:
+            return None
+        added.add(label_id)
+    for name in args.get("removeLabels") or []:
+        label_id = resolve_label(name)
+        if label_id is None:
+            return None
+        removed.add(label_id)
+
+    if args.get("archive"):
+        removed.add("INBOX")
+    if args.get("markRead") is not None:
+        (removed if args["markRead"] else added).add("UNREAD")
+    if args.get("star") is not None:
+        (added if args["star"] else removed).add("STARRED")
+
+    return added, removed - added, trash
+
+def modify_emails_api(args: dict):
+    """Apply the actions of a modify_emails function_call to every matching message at once."""
+    filters = _filters(args)
+    if filters is None:
+        return
+    if not any(value not in (None, ()) for value in filters.values()):
+        print("❓ Doprecyzuj, których wiadomości dotyczy polecenie.")
+        return
+
+    changes = _label_changes(args)
+    if changes is None:
+        return
+    added, removed, trash = changes
+    if not (added or removed or trash):
+        print("❓ Nie podano, co zrobić z wiadomościami.")
+        return
+
+    messages = list(iter_emails(filters, limit=int(args["limit"]) if args.get("limit") else None))
+    if not messages:
+        print("📭 Brak pasujących wiadomości.")
+        return
+
+    print(f"✏️ Do zmiany ({len(messages)}):")
+    for message in messages[:PREVIEW_LIMIT]:
+        print(f"  {_describe(message)}")
+    if len(messages) > PREVIEW_LIMIT:
+        print(f"  … i {len(messages) - PREVIEW_LIMIT} innych")
+
+    if trash or len(messages) > CONFIRM_ABOVE:
+        confirm = session.current().ask(f"Zastosować do {len(messages)} wiadomości? (T/N): ", "confirm").lower()
+        if confirm not in ("t", "y"):
+            print("❎ Zmiana anulowana.")
+            return
+
+    message_ids = [message["id"] for message in messages]
+    if trash:
+        results = trash_messages(message_ids)
+        succeeded = sum(result["ok"] for result in results)
+        for result in results:
+            if not result["ok"]:
+                print(f"  ❌ {result['item']}: {result['error']}")
+        print(f"{'✅' if succeeded == len(results) else '⚠️'} Przeniesiono do kosza: {succeeded}/{len(results)}")
+        return
+
+    if added or removed:
+        modify_messages(message_ids, added, removed)
+    print(f"✅ Zmieniono wiadomości: {len(message_ids)}")
+
+def _addresses(value) -> list[str]:
+    """Addresses of a "to" or "cc" argument, given as a list or as one comma-separated string."""
+    items = [value] if isinstance(value, str) else list(value or [])
+    return [address.strip() for item in items for address in str(item).replace(";", ",").split(",") if address.strip()]
+
+def _invalid_addresses(addresses: list[str]) -> list[str]:
+    """Addresses, bare or as "Name <address>", that are not a user@domain.tld."""
+    return [address for address in addresses if not re.fullmatch(r"[^@\s]+@[^@\s]+\.[^@\s]+", parseaddr(address)[1])]
+
+def send_email_api(args: dict):
+    """Show the message of a send_email function_call and send it after a confirmation."""
+    recipients, copies = _addresses(args.get("to")), _addresses(args.get("cc"))
+    invalid = _invalid_addresses(recipients + copies)
+
+    if not recipients or invalid:
+        print(f"❌ Podaj poprawny adres e-mail odbiorcy{': ' + ', '.join(invalid) if invalid else ''}.")
+        return
+
+    message = EmailMessage()
+    message["To"] = ", ".join(recipients)
+    if copies:
+        message["Cc"] = ", ".join(copies)
+    message["Subject"] = args.get("subject", "")
+    message.set_content(args.get("body", ""))
+
+    print(f"📧 Do: {message['To']}" + (f" (DW: {message['Cc']})" if copies else ""))
+    print(f"📝 Temat: {message['Subject']}")
+    print(args.get("body", ""))
+
+    confirm = session.current().ask("Wysłać? (T/N): ", "confirm").lower()
+    if confirm not in ("t", "y"):
+        print("❎ Wysyłanie anulowane.")
+        return
+
+    raw = base64.urlsafe_b64encode(message.as_bytes()).decode()
+    setup_gmail_service().users().messages().send(userId="me", body={"raw": raw}).execute()
+    print(f"✅ Wysłano wiadomość: {message['Subject']}")
+
+async def search_emails_api_async(args: dict):
+    with tracing.span("gmail.search_emails"):
+        await async_core.to_command_thread(search_emails_api, args)
+
+async def modify_emails_api_async(args: dict):
+    with tracing.span("gmail.modify_emails"):
+        await async_core.to_command_thread(modify_emails_api, args)
+
+async def send_email_api_async(args: dict):
+    with tracing.span("gmail.send_email"):
+        await async_core.to_command_thread(send_email_api, args)
+
+async def search_emails_prompt_async(user_prompt: str):
+    """Create prompt for ai model to search the mailbox from user input."""
+
+    session.current().history.add(user_prompt, "search_mail")
+
+    function_call = await extract(user_prompt, "search_mail", "search_emails", SEARCH_EMAILS_RULES)
+
+    if function_call:
+        await search_emails_api_async(function_call.args)
+
+async def modify_emails_prompt_async(user_prompt: str):
+    """Create prompt for ai model to move, label or mark messages from user input."""
+
+    session.current().history.add(user_prompt, "modify_mail")
+
+    function_call = await extract(user_prompt, "modify_mail", "modify_emails", MODIFY_EMAILS_RULES)
+
+    if function_call:
+        await modify_emails_api_async(function_call.args)
+
+async def send_email_prompt_async(user_prompt: str):
+    """Create prompt for ai model to write and send an e-mail from user input."""
+
+    session.current().history.add(user_prompt, "send_mail")
+
+    function_call = await extract(user_prompt, "send_mail", "send_email", SEND_EMAIL_RULES)
+
+    if function_call:
+        await send_email_api_async(function_call.args)
+
+# synchronous entry points, kept for callers outside the event loop
+
+def search_emails_prompt(user_prompt: str):
+    return async_core.run(search_emails_prompt_async(user_prompt))
+
+def modify_emails_prompt(user_prompt: str):
+    return async_core.run(modify_emails_prompt_async(user_prompt))
+
+def send_email_prompt(user_prompt: str):
+    return async_core.run(send_email_prompt_async(user_prompt))
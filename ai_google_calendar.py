@@ -1,81 +1,229 @@
-import os
+import heapq
+import queue
+import contextvars
 import datetime as dt
 from zoneinfo import ZoneInfo
-from google import genai
 import json
-from dotenv import load_dotenv
-import utils
-from utils import setup_calendar_service, messages, hex_to_rgb
-
-load_dotenv()
-client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+import async_core
+import calendar_batch
+import calendar_cache
+import colors
+import tool_registry
+import tracing
+import event_store
+import event_index
+import free_busy
+import recurrence
+import request_scheduler
+import response_cache
+from date_resolver import resolve_interval, resolve_delete
+from utils import setup_calendar_service
+import session
 
 MODEL_NAME = "gemini-2.0-flash"  
 
-def create_event_api(event: json):
-    service = setup_calendar_service()
-    calendar_id = utils.cur_calendar["id"]
-
-    COLOR_MAP = {
-        "red": "11",
-        "green": "2",
-        "blue": "9",
-        "purple": "3",
-        "yellow": "5",
-        "orange": "6",
-        "turquoise": "7",
-        "gray": "8",
-        "light blue": "1",
-        "light green": "10",
-        "pink": "4"
-    }
-
-    gemini_new_color_instructions = (
-        "Convert the user's color name input to one of the following canonical names, handling synonyms and misspellings:\n"
-        "red, green, blue, purple, yellow, orange, turquoise, gray, light blue, light green, pink.\n"
-        "If the input does not match any of these colors, return the exact phrase 'no_color'."
+TZ = ZoneInfo("Europe/Warsaw")
+
+PAGE_SIZE = 250
+
+# partial response: only the event fields Hermes prints, needs to delete an event or to expand a series
+EVENT_LIST_FIELDS = (
+    "items(id,summary,start,end,htmlLink,status,recurrence,recurringEventId,originalStartTime),nextPageToken"
+)
+
+MAX_NAME_MATCHES = 10
+
+# calendars fetched at the same time when listing several of them
+FANOUT_CONCURRENCY = 8
+
+# warn before creating an event that overlaps busy time in its calendar or the primary one
+CHECK_CONFLICTS = True
+
+# free slots suggested for a find_slot command
+SLOT_SUGGESTIONS = 3
+
+# a new recurring event is checked for conflicts over its instances in this many days
+RECURRING_CONFLICT_DAYS = 28
+
+WEEKDAYS = ["pon", "wt", "śr", "czw", "pt", "sob", "nd"]
+
+CREATE_EVENT_RULES = (
+    "Convert the following Polish natural language request into a valid Google Calendar event "
+    "matching the provided function schema.\n"
+    "If the user specifies only a date or a relative day (e.g., 'za dwa dni', 'jutro'), "
+    "assume a default start time of 10:00 and set the end time to 1 hour later.\n"
+    "Prefer the nearest future date if ambiguous.\n"
+    "If the user specifies an event color (e.g., red, green, blue, purple), "
+    "choose the appropriate colorId according to the following mapping:\n"
+    "Use the following color mapping:\n"
+    + colors.COLOR_RULES +
+    "If the user asks for the same event on several dates (e.g. 'w pon, śr i pt'), put the first date "
+    "in start/end and the other dates in additionalOccurrences.\n"
+    "If the user asks for a recurring event ('co tydzień w poniedziałek', 'codziennie', 'co drugi wtorek', "
+    "'w każdy pierwszy piątek miesiąca', 'w dni robocze'), put one RFC 5545 line in recurrence, e.g. "
+    "'RRULE:FREQ=WEEKLY;BYDAY=MO', 'RRULE:FREQ=WEEKLY;INTERVAL=2;BYDAY=TU', 'RRULE:FREQ=MONTHLY;BYDAY=1FR', "
+    "'RRULE:FREQ=WEEKLY;BYDAY=MO,TU,WE,TH,FR'; add COUNT for 'N razy' and UNTIL (e.g. 20251231T235959Z) "
+    "for 'do końca roku' or 'do 30 czerwca'. start/end hold the first occurrence, with timeZone "
+    "Europe/Warsaw. Do not use additionalOccurrences for a recurring event.\n"
+    "If the user does not specify a color, do NOT include the colorId field in the response.\n"
+    "important - If the user specifies a color which is NOT included in the mapping return: no_color\n"
+    "For reminders:\n"
+    "- If the user specifies custom reminders, always return them inside 'overrides' \n"
+    "and set 'useDefault' to false.\n"
+    "- If the user requests to use default reminders, set 'useDefault' to true and do not include overrides.\n"
+    "- Never include both 'useDefault: true' and 'overrides' together.\n"
+    "Return ONLY as function_call with args, NEVER plain JSON or text."
+)
+
+LIST_EVENTS_RULES = (
+    "Convert the following Polish natural language request into a date interval.\n"
+    "Always return a function_call with at least two arguments: timeMin and timeMax.\n"
+    "Rules:\n"
+    "- 'dzisiaj' → timeMin = today 00:00, timeMax = today 23:59.\n"
+    "- 'jutro' → timeMin = tomorrow 00:00, timeMax = tomorrow 23:59.\n"
+    "- 'ten tydzień' → timeMin = Monday of this week 00:00, timeMax = Sunday of this week 23:59.\n"
+    "- 'przyszły tydzień' → Monday next week → Sunday next week.\n"
+    "- 'ten miesiąc' → first day of this month → last day of this month.\n"
+    "- 'przyszły miesiąc' → first day of next month → last day of next month.\n"
+    "- If user specifies a range (e.g., 'od 1 września do 10 września'), use it directly.\n"
+    "- If only one date is given, use it as both timeMin (00:00) and timeMax (23:59).\n"
+    "- Always return ISO 8601 format with timezone Europe/Warsaw.\n"
+    "- If the user names other calendars (e.g. 'w pracy i w domu'), put their IDs from the list of "
+    "available calendars in calendarIds; if the user means all calendars, set allCalendars to true.\n"
+    "Never return plain text, only function_call."
+)
+
+DELETE_EVENT_RULES = (
+    "Convert the following Polish natural language request into a function_call "
+    "for deleting a Google Calendar event.\n"
+    "Always return a function_call with three arguments: eventName, timeMin, timeMax.\n"
+    "Rules:\n"
+    "- eventName → extract directly from the user request (string).\n"
+    "- 'dzisiaj' → timeMin = today 00:00, timeMax = today 23:59.\n"
+    "- 'jutro' → timeMin = tomorrow 00:00, timeMax = tomorrow 23:59.\n"
+    "- 'ten tydzień' → Monday this week → Sunday this week.\n"
+    "- 'przyszły tydzień' → Monday next week → Sunday next week.\n"
+    "- 'ten miesiąc' → first day of this month → last day of this month.\n"
+    "- 'przyszły miesiąc' → first day of next month → last day of next month.\n"
+    "- If user specifies a range (e.g. 'od 1 września do 10 września'), use it directly.\n"
+    "- If only one date is given, use it as both timeMin (00:00) and timeMax (23:59).\n"
+    "- Always return ISO 8601 format with timezone Europe/Warsaw.\n"
+    "- If no date is given check the whole week.\n"
+    "- If the user wants every matching event deleted (e.g. 'wszystkie'), set deleteAll to true.\n"
+    "- If the user names several different events, put the first one in eventName/timeMin/timeMax "
+    "and the others in additionalEvents.\n"
+    "Never return plain text, only function_call."
+)
+
+UPDATE_EVENT_RULES = (
+    "Convert the following Polish natural language request into a function_call "
+    "for changing existing Google Calendar events.\n"
+    "Always return a function_call with eventName, timeMin, timeMax and at least one change.\n"
+    "Rules:\n"
+    "- eventName → the name of the event to change, extracted directly from the user request.\n"
+    "- timeMin/timeMax → where to look for it: 'dzisiaj', 'jutro', 'ten tydzień', 'przyszły tydzień' and "
+    "explicit ranges as for deleting; if no date is given check the whole week. ISO 8601, Europe/Warsaw.\n"
+    "- 'zmień nazwę na X' → newName; 'przenieś na jutro o 15' → newStart; "
+    "'przesuń o godzinę później' → shiftMinutes = 60, 'o dzień wcześniej' → shiftMinutes = -1440.\n"
+    "- A color change → colorId according to this mapping:\n"
+    + colors.COLOR_RULES +
+    "- A new place → location, a new note → description.\n"
+    "- If the user wants every matching event changed (e.g. 'wszystkie'), set updateAll to true.\n"
+    "Never return plain text, only function_call."
+)
+
+FIND_SLOT_RULES = (
+    "Convert the following Polish natural language request into a function_call "
+    "for finding a free time slot in Google Calendar.\n"
+    "Always return a function_call with at least durationMinutes, timeMin and timeMax.\n"
+    "Rules:\n"
+    "- durationMinutes → length of the wanted slot ('godzina' = 60, 'pół godziny' = 30); default 60.\n"
+    "- 'dzisiaj' → timeMin = now, timeMax = today 23:59.\n"
+    "- 'jutro' → timeMin = tomorrow 00:00, timeMax = tomorrow 23:59.\n"
+    "- 'ten tydzień' → now → Sunday of this week 23:59.\n"
+    "- 'przyszły tydzień' → Monday next week → Sunday next week.\n"
+    "- 'ten miesiąc' → now → last day of this month.\n"
+    "- If user specifies a range (e.g., 'od 1 września do 10 września'), use it directly.\n"
+    "- If no date is given, search from now until 7 days later.\n"
+    "- If the user names calendars (e.g. 'w kalendarzu praca i dom'), put their IDs from the list of "
+    "available calendars in calendarIds; if the user means all calendars, set allCalendars to true.\n"
+    "- Always return ISO 8601 format with timezone Europe/Warsaw.\n"
+    "Never return plain text, only function_call."
+)
+
+NEW_COLOR_INSTRUCTIONS = (
+    "Convert the user's color name input to one of the following canonical names, handling synonyms and misspellings:\n"
+    f"{colors.COLOR_NAMES}.\n"
+    "If the input does not match any of these colors, return the exact phrase 'no_color'."
+)
+
+def today_header() -> str:
+    """Time-dependent part of the extraction instructions."""
+    today = dt.datetime.now(tz=dt.timezone.utc).astimezone(tz=TZ)
+
+    return (
+        f"Today is {today.date().isoformat()} and the current local time is "
+        f"{today.time().strftime('%H:%M')} in Europe/Warsaw.\n"
     )
-    
-    config = genai.types.GenerateContentConfig(
-        system_instruction=gemini_new_color_instructions,
+
+def calendars_header() -> str:
+    """The user's calendars for instructions that let Gemini pick calendar IDs."""
+    calendars = {calendar["summary"]: calendar["id"] for calendar in calendar_cache.all_calendars()}
+
+    return f"Available calendars (name: id): {calendars}\n"
+
+def ask_llm_color(new_color: str) -> str:
+    """Ask Gemini to map a color the local normalizer does not know to a COLOR_MAP name."""
+    from google.genai import types
+
+    config = types.GenerateContentConfig(
+        system_instruction=NEW_COLOR_INSTRUCTIONS,
         response_mime_type="text/plain",
         temperature=0.0,
         max_output_tokens=5
     )
 
-    if event.get("no_color", False):
+    with tracing.span("llm.generate_content", stage="color", model=MODEL_NAME) as span:
+        response = request_scheduler.generate_content(
+            model=MODEL_NAME,
+            contents=new_color,
+            config=config
+        )
+        tracing.record_usage(span, response)
+
+    return response.text.strip()
+
+def create_event_api(event: json):
+    service = setup_calendar_service()
+    calendar_id = session.current().calendar["id"]
+
+    if event.pop("no_color", False):
         print("❌ Podano kolor, który nie jest obsługiwany. Wybierz poprawny kolor. Wydarzenie nie zostało utworzone.")
         event.pop("colorId", None)
 
         while True:
-            is_new_color = input("Ustawić nowy kolor (jeśli nie domyślnie niebieski)? T,t/N,n: ").lower()
+            is_new_color = session.current().ask("Ustawić nowy kolor (jeśli nie domyślnie niebieski)? T,t/N,n: ", "color").lower()
 
             if is_new_color == "t":
-                new_color = input("Podaj nowy kolor: ").lower()
-                
-                try:
-                    response = client.models.generate_content(
-                        model=MODEL_NAME,
-                        contents=new_color,
-                        temperature=0.0,
-                        max_output_tokens=5,
-                        config=config
-                    )
-                    ai_message = response.text.strip()
+                new_color = session.current().ask("Podaj nowy kolor: ", "new_color").lower()
 
+                try:
+                    color_name = colors.resolve_color(new_color, ask_llm_color)
                 except Exception as e:
                     print(f"❌ Wystąpił błąd llm podczas generowania koloru: {e}")
                     continue
 
-                if ai_message == "no_color":
+                if color_name is None:
                     print("❌ Podano kolor, który nie jest obsługiwany. Wybierz poprawny kolor.")
                     continue
                 else:
-                    event["colorId"] = COLOR_MAP.get(ai_message)
-                    print(f"✅ Ustawiono nowy kolor: {ai_message} dla wydarzenia {event['summary']}.")
+                    event["colorId"] = colors.COLOR_MAP[color_name]
+                    print(f"✅ Ustawiono nowy kolor: {color_name} dla wydarzenia {event['summary']}.")
                     break
             elif is_new_color == "n":
-                event["colorId"] = "9"  # Default to blue
+                event["colorId"] = colors.COLOR_MAP[colors.DEFAULT_COLOR]
                 print("✅ Ustawiono domyślny kolor (niebieski) dla wydarzenia.")
                 break
             else:
@@ -89,159 +237,518 @@ def create_event_api(event: json):
             ]
         }
 
+    occurrences = event.pop("additionalOccurrences", None) or []
+    if event.get("recurrence"):
+        occurrences = []
+    else:
+        event.pop("recurrence", None)
+    events = [event] + [
+        dict(event, start=occurrence["start"], end=occurrence["end"])
+        for occurrence in occurrences
+        if occurrence["start"] != event["start"]
+    ]
+
+    if CHECK_CONFLICTS:
+        _warn_conflicts(calendar_id, [instance for event in events for instance in _first_instances(event)])
+
+    if len(events) > 1:
+        _report_batch(calendar_batch.create_events(calendar_id, events), "Utworzono wydarzenia")
+        return
+
     event = service.events().insert(calendarId=calendar_id, body=event).execute()
+    event_store.upsert(calendar_id, event)
     print(f"✅ Utworzono wydarzenie: {event.get('htmlLink')}")
+    if event.get("recurrence"):
+        print(f"🔁 Powtarzanie: {recurrence.describe(event['recurrence'])}")
+
+def _first_instances(event: dict) -> list[dict]:
+    """The event itself, or the instances of a new series in its first RECURRING_CONFLICT_DAYS days."""
+    if not event.get("recurrence"):
+        return [event]
+
+    start = event_store.to_timestamp(event["start"].get("dateTime", event["start"].get("date")))
+    try:
+        return recurrence.instances(event, start, start + RECURRING_CONFLICT_DAYS * 86400)
+    except ValueError:
+        return [event]
+
+def _format_slot(start: dt.datetime, end: dt.datetime) -> str:
+    return f"{WEEKDAYS[start.weekday()]} {start:%d.%m} {start:%H:%M}–{end:%H:%M}"
+
+def _warn_conflicts(calendar_id: str, events: list[dict]):
+    """Print a warning for every event overlapping busy time; the events are created anyway."""
+    try:
+        # "primary" may be the current calendar under another name; ask for each calendar once
+        calendar_ids = [(calendar_cache.get_calendar(key) or {"id": key})["id"] for key in (calendar_id, "primary")]
+        conflicts = free_busy.find_conflicts(calendar_ids, events)
+    except Exception as e:
+        print(f"⚠️ Nie udało się sprawdzić kolizji terminów: {e}")
+        return
 
-def list_events_api(time_min, time_max):
-    service = setup_calendar_service()
-    calendar_id = utils.cur_calendar["id"]
+    for event, busy_calendar_id, intervals in conflicts:
+        calendar = calendar_cache.get_calendar(busy_calendar_id)
+        busy = ", ".join(
+            _format_slot(dt.datetime.fromtimestamp(start, TZ), dt.datetime.fromtimestamp(end, TZ))
+            for start, end in intervals
+        )
+        print(f"⚠️ {event.get('summary', 'Wydarzenie')} koliduje z zajętym czasem "
+              f"w kalendarzu {calendar['summary'] if calendar else busy_calendar_id}: {busy}")
 
-    events_result = service.events().list(
-        calendarId=calendar_id,
-        timeMin=time_min,
-        timeMax=time_max,
-        maxResults=10,
-        singleEvents=True,
-        orderBy="startTime"
-    ).execute()
+def find_slot_api(duration_minutes: int, time_min: str, time_max: str, calendar_ids: list[str] | None = None,
+                  all_calendars: bool = False, count: int = SLOT_SUGGESTIONS):
+    """Print the earliest free slots of duration_minutes common to the calendars (the current one by default)."""
+    if all_calendars:
+        calendar_ids = [calendar["id"] for calendar in calendar_cache.all_calendars()]
+    elif not calendar_ids:
+        calendar_ids = [session.current().calendar["id"]]
 
-    events = events_result.get("items", [])
+    slots = free_busy.find_slots(calendar_ids, time_min, time_max, int(duration_minutes), count)
 
-    if not events:
-        print("📭 Brak nadchodzących wydarzeń.")
-    for event in events:
-        start = event["start"].get("dateTime", event["start"].get("date"))
-        print(f"📅 {event['summary']} (🕒 Początek: {start})")
+    if not slots:
+        print(f"📭 Brak wolnego terminu na {duration_minutes} min w podanym zakresie.")
+        return
+
+    print(f"🔎 Wolne terminy na {duration_minutes} min (kalendarze: {len(calendar_ids)}):")
+    for num, (start, end) in enumerate(slots, start=1):
+        print(f"{num}. 🕒 {_format_slot(start, end)}")
+
+def _describe(event: dict) -> str:
+    return f"{event['summary']} (🕒 Początek: {event['start'].get('dateTime', event['start'].get('date'))})"
 
-def delete_event_api(event_name: str, time_min: str, time_max: str):
+def _report_batch(results: list[dict], action: str):
+    """Print the outcome of every item of a batch and a summary line."""
+    succeeded = sum(result["ok"] for result in results)
+
+    for result in results:
+        if result["ok"]:
+            print(f"  ✅ {_describe(result['item'])}")
+        else:
+            print(f"  ❌ {_describe(result['item'])}: {result['error']}")
+
+    icon = "✅" if succeeded == len(results) else "⚠️"
+    print(f"{icon} {action}: {succeeded}/{len(results)}")
+
+def _fetch_events_page(calendar_id: str, time_min: str, time_max: str, page_size: int,
+                       fields: str | None, page_token: str | None) -> dict:
     service = setup_calendar_service()
-    calendar_id = utils.cur_calendar["id"]
 
-    events_result = service.events().list(
+    # live listings let the API expand recurring events, the only way it orders pages by start
+    # time; the mirror fetches masters instead and expands them with recurrence.py
+    return service.events().list(
         calendarId=calendar_id,
         timeMin=time_min,
         timeMax=time_max,
-        maxResults=10,
+        maxResults=page_size,
         singleEvents=True,
-        orderBy="startTime"
+        orderBy="startTime",
+        fields=fields,
+        pageToken=page_token
     ).execute()
 
-    events = events_result.get("items", [])
+def _iter_live_events(calendar_id: str, time_min: str, time_max: str, page_size: int,
+                      fields: str | None, prefetch: bool):
+    """Yield events of the interval from the API page by page, ordered by start time.
 
-    matches = [
-        event for event in events 
-        if event_name.strip().lower() in event.get("summary", "").strip().lower()
-    ]
+    With prefetch the next page is requested while the current one is consumed.
+    """
+    if fields and "nextPageToken" not in fields:
+        fields += ",nextPageToken"
 
-    if not matches:
-        print("❌ Nie znaleziono pasujących wydarzeń.")
+    executor = ThreadPoolExecutor(max_workers=1) if prefetch else None
+    try:
+        page = _fetch_events_page(calendar_id, time_min, time_max, page_size, fields, None)
+
+        while True:
+            page_token = page.get("nextPageToken")
+            next_page = None
+            if page_token and executor:
+                next_page = executor.submit(
+                    contextvars.copy_context().run,
+                    _fetch_events_page, calendar_id, time_min, time_max, page_size, fields, page_token
+                )
+
+            yield from page.get("items", [])
+
+            if not page_token:
+                return
+            if next_page:
+                page = next_page.result()
+            else:
+                page = _fetch_events_page(calendar_id, time_min, time_max, page_size, fields, page_token)
+    finally:
+        if executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+def iter_events(time_min: str, time_max: str, name: str | None = None, page_size: int = PAGE_SIZE,
+                limit: int | None = None, fields: str | None = EVENT_LIST_FIELDS, prefetch: bool = False,
+                force_refresh: bool = False, calendar_id: str | None = None):
+    """Lazily yield events of a calendar (the current one by default) in the interval, ordered by start time.
+
+    Events come from the local mirror when it is enabled, otherwise from the
+    Calendar API one page of page_size events at a time. With name given, only
+    events whose summary contains it are returned; limit caps the total count.
+    """
+    calendar_id = calendar_id or session.current().calendar["id"]
+    events = None
+
+    if event_store.ENABLED:
+        try:
+            if name is not None:
+                events = event_store.find_events(calendar_id, name, time_min, time_max, force_refresh)
+            else:
+                events = event_store.list_events(calendar_id, time_min, time_max, force_refresh)
+        except Exception as e:
+            print(f"⚠️ Lokalna kopia kalendarza niedostępna, pobieram na żywo: {e}")
+
+    if events is None:
+        events = _iter_live_events(calendar_id, time_min, time_max, page_size, fields, prefetch)
+        if name is not None:
+            events = (
+                event for event in events
+                if name.strip().lower() in event.get("summary", "").strip().lower()
+            )
+
+    yield from islice(events, limit)
+
+_END = object()
+
+# long-lived, so each worker keeps its Calendar client and connections between commands
+_fanout_executor = ThreadPoolExecutor(max_workers=FANOUT_CONCURRENCY, thread_name_prefix="hermes-fanout")
+
+def _fill_queue(events: queue.SimpleQueue, calendar_id: str, time_min: str, time_max: str, **kwargs):
+    """Worker side of the fan-out: put every event of one calendar on its queue, then _END."""
+    try:
+        for event in iter_events(time_min, time_max, calendar_id=calendar_id, **kwargs):
+            events.put(event)
+    except Exception as e:
+        print(f"⚠️ Nie udało się pobrać wydarzeń kalendarza {calendar_id}: {e}")
+    finally:
+        events.put(_END)
+
+def _drain(calendar_id: str, events: queue.SimpleQueue):
+    while (event := events.get()) is not _END:
+        yield calendar_id, event
+
+def _start_timestamp(item: tuple[str, dict]) -> float:
+    start = item[1]["start"]
+    return event_store.to_timestamp(start.get("dateTime", start.get("date")))
+
+def iter_calendars_events(calendar_ids: list[str], time_min: str, time_max: str, page_size: int = PAGE_SIZE,
+                          limit: int | None = None, fields: str | None = EVENT_LIST_FIELDS,
+                          force_refresh: bool = False):
+    """Lazily yield (calendar id, event) for the events of several calendars, ordered by start time.
+
+    Up to FANOUT_CONCURRENCY calendars are fetched at once, each on a worker
+    that hands its events over as they arrive; the per-calendar streams, each
+    already ordered, are combined with a k-way merge. The first event is ready
+    once every calendar delivered its first one, so the total wait is close to
+    the slowest calendar rather than the sum of all of them.
+    """
+    streams = []
+
+    for calendar_id in dict.fromkeys(calendar_ids):
+        events = queue.SimpleQueue()
+        _fanout_executor.submit(
+            contextvars.copy_context().run, _fill_queue, events, calendar_id, time_min, time_max,
+            page_size=page_size, fields=fields, force_refresh=force_refresh
+        )
+        streams.append(_drain(calendar_id, events))
+
+    yield from islice(heapq.merge(*streams, key=_start_timestamp), limit)
+
+def find_events_by_name(name: str, time_min: str, time_max: str, force_refresh: bool = False,
+                        limit: int | None = MAX_NAME_MATCHES) -> list[dict]:
+    """Events in the interval ranked by how closely their summary matches name (typos and inflections included)."""
+    calendar_id = session.current().calendar["id"]
+
+    if event_store.ENABLED:
+        try:
+            return event_index.search(calendar_id, name, time_min, time_max, limit, force_refresh)
+        except Exception as e:
+            print(f"⚠️ Lokalna kopia kalendarza niedostępna, pobieram na żywo: {e}")
+
+    events = _iter_live_events(calendar_id, time_min, time_max, PAGE_SIZE, EVENT_LIST_FIELDS, prefetch=True)
+    return [event for _, event in event_index.EventIndex(events).search(name, limit)]
+
+# printed after an instance of a recurring event
+_RECURRING_MARK = " 🔁"
+
+def list_events_api(time_min, time_max, page_size: int = PAGE_SIZE, limit: int | None = None,
+                    fields: str | None = EVENT_LIST_FIELDS, force_refresh: bool = False,
+                    calendar_ids: list[str] | None = None, all_calendars: bool = False):
+    if all_calendars:
+        calendar_ids = [calendar["id"] for calendar in calendar_cache.all_calendars()]
+
+    if calendar_ids and calendar_ids != [session.current().calendar["id"]]:
+        list_calendars_events_api(calendar_ids, time_min, time_max, page_size, limit, fields, force_refresh)
         return
 
-    if len(matches) == 1:
-        event = matches[0]
+    found = False
+
+    for event in iter_events(time_min, time_max, page_size=page_size, limit=limit, fields=fields,
+                             prefetch=True, force_refresh=force_refresh):
+        found = True
+        start = event["start"].get("dateTime", event["start"].get("date"))
+        print(f"📅 {event['summary']} (🕒 Początek: {start}){_RECURRING_MARK if event.get('recurringEventId') else ''}",
+              flush=True)
+
+    if not found:
+        print("📭 Brak nadchodzących wydarzeń.")
+
+def list_calendars_events_api(calendar_ids: list[str], time_min, time_max, page_size: int = PAGE_SIZE,
+                              limit: int | None = None, fields: str | None = EVENT_LIST_FIELDS,
+                              force_refresh: bool = False):
+    """Print the events of several calendars as one list, each tagged with its calendar."""
+    found = False
+
+    for calendar_id, event in iter_calendars_events(calendar_ids, time_min, time_max, page_size, limit, fields,
+                                                    force_refresh):
+        found = True
+        start = event["start"].get("dateTime", event["start"].get("date"))
+        print(f"{calendar_cache.label(calendar_id)}📅 {event['summary']} (🕒 Początek: {start})"
+              f"{_RECURRING_MARK if event.get('recurringEventId') else ''}", flush=True)
+
+    if not found:
+        print("📭 Brak nadchodzących wydarzeń.")
+
+def _confirm_and_delete(calendar_id: str, events: list[dict]):
+    """Ask once, then delete one event directly or several with a batch request."""
+    if len(events) == 1:
+        event = events[0]
         print(f"🗑️ Usuwanie wydarzenia: {event['summary']} "
               f"({event['start'].get('dateTime', event['start'].get('date'))})")
 
-        confirm = input("Usunąć? (T/N): ").lower()
+        confirm = session.current().ask("Usunąć? (T/N): ", "confirm").lower()
         if confirm in ("t", "y"):
-            service.events().delete(calendarId=calendar_id, eventId=event["id"]).execute()
+            try:
+                setup_calendar_service().events().delete(calendarId=calendar_id, eventId=event["id"]).execute()
+            except Exception as e:
+                # already deleted, e.g. by another command of a batch
+                if request_scheduler.status(e) not in (404, 410):
+                    raise
+            event_store.remove(calendar_id, event)
             print(f"✅ Usunięto: {event['summary']}")
         else:
             print("❎ Usuwanie anulowane.")
+        return
+
+    print(f"🗑️ Do usunięcia ({len(events)}):")
+    for num, event in enumerate(events, start=1):
+        print(f"{num}. 📅 {_describe(event)}")
+
+    confirm = session.current().ask(f"Usunąć wszystkie {len(events)}? (T/N): ", "confirm").lower()
+    if confirm in ("t", "y"):
+        _report_batch(calendar_batch.delete_events(calendar_id, events), "Usunięto wydarzenia")
     else:
-        print("⚠️ Znaleziono kilka pasujących wydarzeń:")
-        for num, event in enumerate(matches, start=1):
-            start = event["start"].get("dateTime", event["start"].get("date"))
-            print(f"{num}. 📅 {event['summary']} (🕒 Początek: {start})")
+        print("❎ Usuwanie anulowane.")
 
-        while True:
-            choice = input("Wybierz numer wydarzenia do usunięcia (lub Enter aby anulować): ")
-            
-            if choice.strip() == "":
-                print("❎ Usuwanie anulowane.")
-                break
+def _unattended() -> bool:
+    """Whether confirmations of the current command are answered by a fixed policy, not by a person."""
+    return "confirm" in session.current().answers
 
-            if choice.isdigit():
-                choice_num = int(choice) - 1
-                if 0 <= choice_num < len(matches):
-                    event = matches[choice_num]
-                    print(f"🗑️ Usuwanie wydarzenia: {event['summary']} "
-                          f"({event['start'].get('dateTime', event['start'].get('date'))})")
-
-                    confirm = input("Usunąć? (T/N): ").lower()
-                    if confirm in ("t", "y"):
-                        service.events().delete(calendarId=calendar_id, eventId=event["id"]).execute()
-                        print(f"✅ Usunięto: {event['summary']}")
-                    else:
-                        print("❎ Usuwanie anulowane.")
-                    break
-                else:
-                    print("❌ Nieprawidłowy numer, spróbuj ponownie.")
-            else:
-                print("❌ Podaj poprawny numer albo naciśnij Enter, aby anulować.")
-                    
-def create_event_prompt(user_prompt: str) -> str:
-    """Create a prompt for the ai model to generate calendar event in formatted way"""
+def _named(event_name: str, matches: list[dict]) -> list[dict]:
+    """Matches that surely have event_name, not just resemble it (see event_index.matches_strictly)."""
+    named = [event for event in matches if event_index.matches_strictly(event_name, event.get("summary", ""))]
+    if not named:
+        print(f"❌ Żadne wydarzenie nie nazywa się dokładnie: {event_name}")
+    return named
+
+def _strict_matches(event_name: str, matches: list[dict], action: str = "usunąć") -> list[dict]:
+    """Matches safe to delete all at once: strict ones only, and none if they carry different titles."""
+    matches = _named(event_name, matches)
+    titles = {event_index.normalize_summary(event.get("summary", "")): event.get("summary", "") for event in matches}
+
+    if len(titles) > 1:
+        print(f"❓ „{event_name}” pasuje do różnych wydarzeń ({', '.join(sorted(titles.values()))}); "
+              f"doprecyzuj nazwę, aby {action} wszystkie.")
+        return []
+    return matches
+
+def delete_event_api(event_name: str, time_min: str, time_max: str, force_refresh: bool = False):
+    calendar_id = session.current().calendar["id"]
+
+    matches = find_events_by_name(event_name, time_min, time_max, force_refresh)
+
+    if not matches:
+        print("❌ Nie znaleziono pasujących wydarzeń.")
+        return
+
+    if _unattended():
+        # nobody sees what a fixed policy confirms, so a fuzzy hit alone is not enough
+        matches = _named(event_name, matches)
+        if not matches:
+            return
+
+    if len(matches) == 1:
+        _confirm_and_delete(calendar_id, matches)
+        return
+
+    print("⚠️ Znaleziono kilka pasujących wydarzeń:")
+    for num, event in enumerate(matches, start=1):
+        print(f"{num}. 📅 {_describe(event)}")
+
+    while True:
+        choice = session.current().ask(
+            "Wybierz numer wydarzenia do usunięcia (kilka po przecinku, 'w' = wszystkie, Enter aby anulować): ",
+            "choose"
+        ).strip().lower()
+
+        if choice == "":
+            print("❎ Usuwanie anulowane.")
+            break
+
+        if choice == "w":
+            # a fixed answer policy never saw the list, so it only gets what surely has this name
+            if "choose" in session.current().answers:
+                matches = _strict_matches(event_name, matches)
+            if matches:
+                _confirm_and_delete(calendar_id, matches)
+            break
+
+        numbers = [number.strip() for number in choice.split(",")]
+        if all(number.isdigit() and 1 <= int(number) <= len(matches) for number in numbers):
+            _confirm_and_delete(calendar_id, [matches[int(number) - 1] for number in dict.fromkeys(numbers)])
+            break
+
+        print("❌ Podaj poprawne numery albo naciśnij Enter, aby anulować.")
+
+def delete_events_api(targets: list[dict], delete_all: bool = False, force_refresh: bool = False):
+    """Delete the events described by targets ({eventName, timeMin, timeMax}) after one confirmation.
+
+    With delete_all every strict match of a target is deleted (see
+    event_index.matches_strictly), and a target matching differently named
+    events is skipped; otherwise only its best match is deleted. A single
+    target without delete_all keeps the interactive choice.
+    """
+    if len(targets) == 1 and not delete_all:
+        target = targets[0]
+        delete_event_api(target["eventName"], target["timeMin"], target["timeMax"], force_refresh)
+        return
+
+    calendar_id = session.current().calendar["id"]
+    events = {}
 
-    messages.append(
-        genai.types.Content(
-            role="user",
-            parts=[genai.types.Part.from_text(text=user_prompt)]
+    for target in targets:
+        matches = find_events_by_name(
+            target["eventName"], target["timeMin"], target["timeMax"], force_refresh,
+            limit=None if delete_all else 1
         )
-    )
+        if not matches:
+            print(f"❌ Nie znaleziono pasujących wydarzeń: {target['eventName']}")
+        elif delete_all:
+            matches = _strict_matches(target["eventName"], matches)
+        elif _unattended():
+            matches = _named(target["eventName"], matches)
+        for event in matches:
+            events[event["id"]] = event
+
+    if events:
+        _confirm_and_delete(calendar_id, list(events.values()))
+
+def _moved(point: dict, delta: dt.timedelta) -> dict:
+    """A start or end moved by delta; all-day events move by whole days."""
+    if "dateTime" in point:
+        return dict(point, dateTime=(dt.datetime.fromisoformat(point["dateTime"]) + delta).isoformat())
+    return dict(point, date=(dt.date.fromisoformat(point["date"]) + dt.timedelta(days=delta.days)).isoformat())
+
+def _event_patch(event: dict, args: dict) -> dict:
+    """Fields of event changed by an update_event function_call."""
+    patch = {}
+    if args.get("newName"):
+        patch["summary"] = args["newName"]
+    for field in ("colorId", "location", "description"):
+        if args.get(field):
+            patch[field] = args[field]
+
+    delta = None
+    if args.get("newStart"):
+        new_start = dt.datetime.fromisoformat(args["newStart"])
+        start = event["start"]
+        delta = (new_start - dt.datetime.fromisoformat(start["dateTime"]) if "dateTime" in start
+                 else dt.timedelta(days=(new_start.date() - dt.date.fromisoformat(start["date"])).days))
+    elif args.get("shiftMinutes"):
+        delta = dt.timedelta(minutes=int(args["shiftMinutes"]))
+    if delta:
+        patch["start"], patch["end"] = _moved(event["start"], delta), _moved(event["end"], delta)
+    return patch
+
+def update_events_api(args: dict, force_refresh: bool = False):
+    """Change the events an update_event function_call names after one confirmation.
+
+    Without updateAll only the best match is changed. With updateAll, or when
+    the confirmation is answered by a fixed policy, only strict matches of the
+    name are changed (see event_index.matches_strictly). Several events are
+    patched with one batch request.
+    """
+    if args.get("colorId") and args["colorId"] not in colors.COLOR_MAP.values():
+        print("❌ Podano kolor, który nie jest obsługiwany. Wydarzenie nie zostało zmienione.")
+        return
+    if not any(args.get(field) for field in ("newName", "newStart", "shiftMinutes", "colorId", "location", "description")):
+        print("❓ Nie podano, co zmienić w wydarzeniu.")
+        return
 
-    today = dt.datetime.now(tz=dt.timezone.utc).astimezone(tz=ZoneInfo("Europe/Warsaw"))
+    calendar_id = session.current().calendar["id"]
+    update_all = args.get("updateAll", False)
 
-    gemini_instructions = (
-        f"Today is {today.date().isoformat()} and the current local time is "
-        f"{today.time().strftime('%H:%M')} in Europe/Warsaw.\n"
-        "Convert the following Polish natural language request into a valid Google Calendar event "
-        "matching the provided function schema.\n"
-        "If the user specifies only a date or a relative day (e.g., 'za dwa dni', 'jutro'), "
-        "assume a default start time of 10:00 and set the end time to 1 hour later.\n"
-        "Prefer the nearest future date if ambiguous.\n"
-        "If the user specifies an event color (e.g., red, green, blue, purple), "
-        "choose the appropriate colorId according to the following mapping:\n"
-        "Use the following color mapping:\n"
-        "- red → \"11\" \n"
-        "- green → \"2\"\n"
-        "- blue → \"9\"\n"
-        "- purple → \"3\"\n"
-        "- yellow → \"5\"\n"
-        "- orange → \"6\"\n"
-        "- turquoise → \"7\"\n"
-        "- gray → \"8\"\n"
-        "- light blue → \"1\"\n"
-        "- light green → \"10\"\n"
-        "- pink → \"4\"\n"
-        "If the user does not specify a color, do NOT include the colorId field in the response.\n"
-        "important - If the user specifies a color which is NOT included in the mapping return: no_color\n"
-        "For reminders:\n"
-        "- If the user specifies custom reminders, always return them inside 'overrides' \n"
-        "and set 'useDefault' to false.\n"
-        "- If the user requests to use default reminders, set 'useDefault' to true and do not include overrides.\n"
-        "- Never include both 'useDefault: true' and 'overrides' together.\n"
-        "Return ONLY as function_call with args, NEVER plain JSON or text."
-    )
+    matches = find_events_by_name(args["eventName"], args["timeMin"], args["timeMax"], force_refresh,
+                                  limit=None if update_all else 1)
+    if not matches:
+        print(f"❌ Nie znaleziono pasujących wydarzeń: {args['eventName']}")
+        return
+    if update_all or _unattended():
+        matches = _strict_matches(args["eventName"], matches, "zmienić")
+        if not matches:
+            return
+    if args.get("newStart") and len(matches) > 1:
+        print("❓ Nowy termin można ustawić tylko jednemu wydarzeniu; podaj, o ile przesunąć wszystkie.")
+        return
 
-    with open("./ai_tools_definitions/google_event.json", "r", encoding="utf-8") as file:
-        ai_tool_google_calendar_object = json.load(file)
+    changes = [(event, _event_patch(event, args)) for event in matches]
+    print(f"✏️ Do zmiany ({len(changes)}):")
+    for num, (event, patch) in enumerate(changes, start=1):
+        moved = f", 🕒 {patch['start'].get('dateTime', patch['start'].get('date'))}" if "start" in patch else ""
+        renamed = f" → {patch['summary']}" if "summary" in patch else ""
+        print(f"{num}. 📅 {_describe(event)}{renamed}{moved}")
 
-    tools = genai.types.Tool(function_declarations=[ai_tool_google_calendar_object])
+    confirm = session.current().ask("Zapisać zmiany? (T/N): ", "confirm").lower()
+    if confirm not in ("t", "y"):
+        print("❎ Zmiana anulowana.")
+        return
 
-    config = genai.types.GenerateContentConfig(
-        tools=[tools],
-        system_instruction=gemini_instructions
-    )
+    if len(changes) == 1:
+        event, patch = changes[0]
+        updated = setup_calendar_service().events().patch(
+            calendarId=calendar_id, eventId=event["id"], body=patch
+        ).execute()
+        event_store.upsert(calendar_id, updated)
+        print(f"✅ Zmieniono: {updated['summary']}")
+        return
 
-    response = client.models.generate_content(
-        model=MODEL_NAME,
-        contents=messages[-10:],
-        config=config
-    )
+    _report_batch(calendar_batch.update_events(calendar_id, changes), "Zmieniono wydarzenia")
+
+def delete_targets(args: dict) -> list[dict]:
+    """Every {eventName, timeMin, timeMax} of a delete_event function_call, the main one first."""
+    return [args] + list(args.get("additionalEvents") or [])
+
+def change_calendar_api(calendar_id: str) -> str | None:
+    """Make calendar_id the session's current calendar; returns its summary, or None when there is no such calendar."""
+    calendar = calendar_cache.get_calendar(calendar_id)
+
+    current = session.current()
+
+    if calendar is None:
+        print("❌ Nie znaleziono kalendarza o podanym identyfikatorze.")
+        return None
 
-    function_call = None
+    if current.calendar["id"] not in (calendar["id"], "primary"):
+        calendar_cache.invalidate()
 
+    current.calendar = calendar
+
+    return calendar["summary"]
+
+def _function_call(response):
+    """The function_call of a Gemini response, printed for the user, or None."""
     ai_message = response.candidates[0].content.parts[0]
 
     if ai_message.function_call:
@@ -249,175 +756,154 @@ def create_event_prompt(user_prompt: str) -> str:
 
         print(f"🛠️ Wywołanie funkcji: {function_call.name}")
         print(f"🧩 Argumenty: {function_call.args}")
+        return function_call
 
-    else:
-        print("❌ Nie znaleziono wywołania funkcji w odpowiedzi.")
-        print(f"📝 Tekst odpowiedzi: {response.text}")
+    print("❌ Nie znaleziono wywołania funkcji w odpowiedzi.")
+    print(f"📝 Tekst odpowiedzi: {response.text}")
+    return None
 
-    if function_call:
-        create_event_api(function_call.args)
-    else:
-        raise ValueError("Nie znaleziono wywołania funkcji w odpowiedzi. Sprawdź dane wejściowe.")
+async def extract(user_prompt: str, intent: str, tool: str, rules: str, header: str | None = None):
+    """function_call for the prompt from the response cache, or from Gemini on a miss.
 
-def list_events_prompt(user_prompt: str):
-    """Create prompt for ai model to list events from user input and returns two date interval"""
-    
-    messages.append(
-        genai.types.Content(
-            role="user",
-            parts=[genai.types.Part.from_text(text=user_prompt)]
+    header is the per-call part of the instructions, today_header() by default.
+    None when Gemini answered without a function_call; the user has been told.
+    """
+    history = session.current().history
+
+    function_call = response_cache.get_function_call(user_prompt, intent, MODEL_NAME)
+    if function_call is not None:
+        print(f"♻️ Odpowiedź z pamięci podręcznej: {function_call.name}")
+        print(f"🧩 Argumenty: {function_call.args}")
+        return function_call
+
+    config = tool_registry.config((tool,), rules, header or today_header())
+
+    contents = history.contents(intent)
+    with tracing.span("llm.generate_content", stage=intent, model=MODEL_NAME) as span:
+        response = await request_scheduler.generate_content_async(
+            model=MODEL_NAME,
+            contents=contents,
+            config=config
         )
-    )
+        tracing.record_usage(span, response)
+    history.count_call(intent, contents, config, response)
 
-    today = dt.datetime.now(tz=dt.timezone.utc).astimezone(tz=ZoneInfo("Europe/Warsaw"))
+    function_call = _function_call(response)
+    if function_call:
+        response_cache.put_function_call(user_prompt, intent, MODEL_NAME, function_call)
+    return function_call
 
-    gemini_instructions = (
-        f"Today is {today.date().isoformat()} and the current local time is "
-        f"{today.time().strftime('%H:%M')} in Europe/Warsaw.\n"
-        "Convert the following Polish natural language request into a date interval.\n"
-        "Always return a function_call with two arguments: timeMin and timeMax.\n"
-        "Rules:\n"
-        "- 'dzisiaj' → timeMin = today 00:00, timeMax = today 23:59.\n"
-        "- 'jutro' → timeMin = tomorrow 00:00, timeMax = tomorrow 23:59.\n"
-        "- 'ten tydzień' → timeMin = Monday of this week 00:00, timeMax = Sunday of this week 23:59.\n"
-        "- 'przyszły tydzień' → Monday next week → Sunday next week.\n"
-        "- 'ten miesiąc' → first day of this month → last day of this month.\n"
-        "- 'przyszły miesiąc' → first day of next month → last day of next month.\n"
-        "- If user specifies a range (e.g., 'od 1 września do 10 września'), use it directly.\n"
-        "- If only one date is given, use it as both timeMin (00:00) and timeMax (23:59).\n"
-        "- Always return ISO 8601 format with timezone Europe/Warsaw.\n"
-        "Never return plain text, only function_call."
-    )
+async def create_event_api_async(event: json):
+    with tracing.span("calendar.create_calendar_event"):
+        await async_core.to_command_thread(create_event_api, event)
 
-    with open("./ai_tools_definitions/google_list_events.json", "r", encoding="utf-8") as file:
-        ai_tool_google_calendar_object = json.load(file)
-    
-    tools = genai.types.Tool(function_declarations=[ai_tool_google_calendar_object])
+async def list_events_api_async(time_min, time_max, **kwargs):
+    with tracing.span("calendar.get_event_interval"):
+        await async_core.to_command_thread(list_events_api, time_min, time_max, **kwargs)
 
-    config = genai.types.GenerateContentConfig(
-        tools=[tools],
-        system_instruction=gemini_instructions
-    )   
+async def delete_events_api_async(targets: list[dict], delete_all: bool = False, force_refresh: bool = False):
+    with tracing.span("calendar.delete_event"):
+        await async_core.to_command_thread(delete_events_api, targets, delete_all, force_refresh)
 
-    response = client.models.generate_content(
-        model=MODEL_NAME,
-        contents=messages[-10:],
-        config=config
-    )
+async def update_events_api_async(args: dict, force_refresh: bool = False):
+    with tracing.span("calendar.update_event"):
+        await async_core.to_command_thread(update_events_api, args, force_refresh)
 
-    function_call = None
+async def change_calendar_api_async(calendar_id: str) -> str | None:
+    with tracing.span("calendar.change_calendar"):
+        return await async_core.to_command_thread(change_calendar_api, calendar_id)
 
-    ai_message = response.candidates[0].content.parts[0]
+async def find_slot_api_async(duration_minutes: int, time_min: str, time_max: str, **kwargs):
+    with tracing.span("calendar.find_free_slot"):
+        await async_core.to_command_thread(find_slot_api, duration_minutes, time_min, time_max, **kwargs)
 
-    if ai_message.function_call:
-        function_call = ai_message.function_call
+async def create_event_prompt_async(user_prompt: str):
+    """Create a prompt for the ai model to generate calendar event in formatted way"""
 
-        print(f"🛠️ Wywołanie funkcji: {function_call.name}")
-        print(f"🧩 Argumenty: {function_call.args}")
+    session.current().history.add(user_prompt, "add_event")
 
-    else:
-        print("❌ Nie znaleziono wywołania funkcji w odpowiedzi.")
-        print(f"📝 Tekst odpowiedzi: {response.text}")
+    function_call = await extract(user_prompt, "add_event", "create_calendar_event", CREATE_EVENT_RULES)
 
     if function_call:
-        list_events_api(function_call.args["timeMin"], function_call.args["timeMax"])
-    else:
-        raise ValueError("Nie znaleziono wywołania funkcji w odpowiedzi. Sprawdź dane wejściowe.")
+        await create_event_api_async(function_call.args)
 
-def delete_event_prompt(user_prompt: str):
-    """Create prompt for ai model to delete an event from user input."""
+async def list_events_prompt_async(user_prompt: str):
+    """Create prompt for ai model to list events from user input and returns two date interval"""
 
-    messages.append(
-        genai.types.Content(
-            role="user",
-            parts=[genai.types.Part.from_text(text=user_prompt)]
+    session.current().history.add(user_prompt, "list_events")
+
+    local_args = resolve_interval(user_prompt)
+    if local_args:
+        print(f"⚡ Zakres dat rozpoznany lokalnie: {local_args}")
+        await list_events_api_async(
+            local_args["timeMin"], local_args["timeMax"], force_refresh=session.current().force_refresh,
+            all_calendars=local_args.get("allCalendars", False)
         )
-    )
+        return
 
-    today = dt.datetime.now(tz=dt.timezone.utc).astimezone(tz=ZoneInfo("Europe/Warsaw"))
+    header = today_header() + await async_core.to_thread(calendars_header)
+    function_call = await extract(user_prompt, "list_events", "get_event_interval", LIST_EVENTS_RULES, header)
 
-    gemini_instructions = (
-        f"Today is {today.date().isoformat()} and the current local time is "
-        f"{today.time().strftime('%H:%M')} in Europe/Warsaw.\n"
-        "Convert the following Polish natural language request into a function_call "
-        "for deleting a Google Calendar event.\n"
-        "Always return a function_call with three arguments: eventName, timeMin, timeMax.\n"
-        "Rules:\n"
-        "- eventName → extract directly from the user request (string).\n"
-        "- 'dzisiaj' → timeMin = today 00:00, timeMax = today 23:59.\n"
-        "- 'jutro' → timeMin = tomorrow 00:00, timeMax = tomorrow 23:59.\n"
-        "- 'ten tydzień' → Monday this week → Sunday this week.\n"
-        "- 'przyszły tydzień' → Monday next week → Sunday next week.\n"
-        "- 'ten miesiąc' → first day of this month → last day of this month.\n"
-        "- 'przyszły miesiąc' → first day of next month → last day of next month.\n"
-        "- If user specifies a range (e.g. 'od 1 września do 10 września'), use it directly.\n"
-        "- If only one date is given, use it as both timeMin (00:00) and timeMax (23:59).\n"
-        "- Always return ISO 8601 format with timezone Europe/Warsaw.\n"
-        "- If no date is given check the whole week.\n"
-        "Never return plain text, only function_call."
-    )
+    if function_call:
+        args = function_call.args
+        await list_events_api_async(
+            args["timeMin"], args["timeMax"], force_refresh=session.current().force_refresh,
+            calendar_ids=args.get("calendarIds"), all_calendars=args.get("allCalendars", False)
+        )
 
-    with open("./ai_tools_definitions/google_delete_event.json", "r", encoding="utf-8") as file:
-        ai_tool_google_calendar_object = json.load(file)
+async def delete_event_prompt_async(user_prompt: str):
+    """Create prompt for ai model to delete an event from user input."""
 
-    tools = genai.types.Tool(function_declarations=[ai_tool_google_calendar_object])
+    session.current().history.add(user_prompt, "remove_event")
 
-    config = genai.types.GenerateContentConfig(
-        tools=[tools],
-        system_instruction=gemini_instructions
-    )
+    local_args = resolve_delete(user_prompt)
+    if local_args:
+        print(f"⚡ Polecenie rozpoznane lokalnie: {local_args}")
+        await delete_events_api_async([local_args], local_args.get("deleteAll", False), session.current().force_refresh)
+        return
 
-    response = client.models.generate_content(
-        model=MODEL_NAME,
-        contents=messages[-10:],
-        config=config
-    )
+    function_call = await extract(user_prompt, "remove_event", "delete_event", DELETE_EVENT_RULES)
 
-    function_call = None
+    if function_call:
+        await delete_events_api_async(
+            delete_targets(function_call.args), function_call.args.get("deleteAll", False),
+            session.current().force_refresh
+        )
 
-    ai_message = response.candidates[0].content.parts[0]
+async def update_event_prompt_async(user_prompt: str):
+    """Create prompt for ai model to change existing events from user input."""
 
-    if ai_message.function_call:
-        function_call = ai_message.function_call
-        print(f"🛠️ Wywołanie funkcji: {function_call.name}")
-        print(f"🧩 Argumenty: {function_call.args}")
-    else:
-        print("❌ Nie znaleziono wywołania funkcji w odpowiedzi.")
-        print(f"📝 Tekst odpowiedzi: {response.text}")
+    session.current().history.add(user_prompt, "update_event")
+
+    function_call = await extract(user_prompt, "update_event", "update_event", UPDATE_EVENT_RULES)
 
     if function_call:
-        delete_event_api(
-            function_call.args["eventName"],
-            function_call.args["timeMin"],
-            function_call.args["timeMax"]
-        )
-    else:
-        raise ValueError("No function call found in the response. Please check the input prompt.")
+        await update_events_api_async(function_call.args, session.current().force_refresh)
 
-def change_calendar_api(ai_text: str):
-    service = setup_calendar_service()
+async def find_slot_prompt_async(user_prompt: str):
+    """Create prompt for ai model to find a free slot of a given length in one or more calendars."""
 
-    utils.cur_calendar = service.calendarList().get(calendarId=ai_text).execute()
+    session.current().history.add(user_prompt, "find_slot")
 
-    bg_color = utils.cur_calendar.get("backgroundColor")
-    cur_calendar_color_rgb = hex_to_rgb(bg_color)
+    header = today_header() + await async_core.to_thread(calendars_header)
+    function_call = await extract(user_prompt, "find_slot", "find_free_slot", FIND_SLOT_RULES, header)
 
-    ansi_color = f"\033[38;2;{cur_calendar_color_rgb[0]};{cur_calendar_color_rgb[1]};{cur_calendar_color_rgb[2]}m"
-    ansi_reset = "\033[0m"
+    if function_call:
+        args = function_call.args
+        await find_slot_api_async(
+            args["durationMinutes"], args["timeMin"], args["timeMax"],
+            calendar_ids=args.get("calendarIds"), all_calendars=args.get("allCalendars", False)
+        )
 
-    return f"{ansi_color}[{utils.cur_calendar['summary']}] {ansi_reset} 💬 Wpisz swoje polecenie: "
+async def change_calendar_prompt_async(user_prompt: str) -> str:
+    from google.genai import types
 
-def change_calendar_prompt(user_prompt: str) -> str:
-    service = setup_calendar_service()
-    calendars = service.calendarList().list().execute()
-    calendars = {calendar['summary']: calendar['id'] for calendar in calendars['items']}
+    history = session.current().history
 
-    messages.append(
-        genai.types.Content(
-            role="user",
-            parts=[genai.types.Part.from_text(text=user_prompt)]
-        )
-    )
+    calendar_list = await async_core.to_thread(calendar_cache.all_calendars)
+    calendars = {calendar["summary"]: calendar["id"] for calendar in calendar_list}
+
+    history.add(user_prompt, "change_calendar")
 
     gemini_instructions = (
         f"User gave a calendar name. Here are available calendars:\n{calendars}\n\n"
@@ -425,26 +911,49 @@ def change_calendar_prompt(user_prompt: str) -> str:
         "If the name doesn't exist, return 'not_found'."
     )
 
-    config = genai.types.GenerateContentConfig(
+    config = types.GenerateContentConfig(
         system_instruction=gemini_instructions,
         response_mime_type="text/plain",
         temperature=0.0
     )
 
-    response = client.models.generate_content(
-        model=MODEL_NAME,
-        contents=messages[-10:],
-        config=config
-    )
+    contents = history.contents("change_calendar")
+    with tracing.span("llm.generate_content", stage="change_calendar", model=MODEL_NAME) as span:
+        response = await request_scheduler.generate_content_async(
+            model=MODEL_NAME,
+            contents=contents,
+            config=config
+        )
+        tracing.record_usage(span, response)
+    history.count_call("change_calendar", contents, config, response)
 
     ai_text = response.candidates[0].content.parts[0].text.strip()
 
     if ai_text in calendars.values():
-        service = setup_calendar_service()
-        cal_obj = service.calendars().get(calendarId=ai_text).execute()
-        
-        print(f"📌 Zmieniono kalendarz na: {cal_obj['summary']}")
-        return change_calendar_api(ai_text)  
+        summary = await change_calendar_api_async(ai_text)
+        if summary is not None:
+            print(f"📌 Zmieniono kalendarz na: {summary}")
     else:
         print("❌ Nie znaleziono kalendarza o podanej nazwie.")
-        return f"[{utils.cur_calendar['summary']}] 💬 Wpisz swoje polecenie: "
+
+    return calendar_cache.prompt(session.current().calendar["id"])
+
+# synchronous entry points, kept for callers outside the event loop
+
+def create_event_prompt(user_prompt: str) -> str:
+    return async_core.run(create_event_prompt_async(user_prompt))
+
+def list_events_prompt(user_prompt: str):
+    return async_core.run(list_events_prompt_async(user_prompt))
+
+def delete_event_prompt(user_prompt: str):
+    return async_core.run(delete_event_prompt_async(user_prompt))
+
+def update_event_prompt(user_prompt: str):
+    return async_core.run(update_event_prompt_async(user_prompt))
+
+def find_slot_prompt(user_prompt: str):
+    return async_core.run(find_slot_prompt_async(user_prompt))
+
+def change_calendar_prompt(user_prompt: str) -> str:
+    return async_core.run(change_calendar_prompt_async(user_prompt))
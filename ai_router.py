@@ -1,74 +1,333 @@
+import asyncio
+import functools
 from zoneinfo import ZoneInfo
-from google import genai
 import os
-from dotenv import load_dotenv
 
-from ai_google_calendar import create_event_prompt, list_events_prompt, delete_event_prompt, change_calendar_prompt    
+import async_core
+import calendar_cache
+import date_resolver
+import event_store
+import request_scheduler
+import response_cache
+import tool_registry
+import tracing
+from ai_google_calendar import create_event_prompt_async, list_events_prompt_async, delete_event_prompt_async
+from ai_google_calendar import change_calendar_prompt_async, find_slot_prompt_async
+from ai_google_calendar import create_event_api, list_events_api, delete_events_api, delete_targets, change_calendar_api
+from ai_google_calendar import update_event_prompt_async, update_events_api
+from ai_google_calendar import find_slot_api
+from ai_google_calendar import today_header, calendars_header
+from ai_google_calendar import CREATE_EVENT_RULES, LIST_EVENTS_RULES, DELETE_EVENT_RULES, UPDATE_EVENT_RULES, FIND_SLOT_RULES
+from ai_gmail import search_emails_prompt_async, modify_emails_prompt_async, send_email_prompt_async
+from ai_gmail import search_emails_api, modify_emails_api, send_email_api
+from ai_gmail import SEARCH_EMAILS_RULES, MODIFY_EMAILS_RULES, SEND_EMAIL_RULES
 
-from utils import messages
-
-load_dotenv()
-
-client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
+import session
 
 MODEL_NAME = "gemini-2.0-flash"  
 
 TZ = ZoneInfo("Europe/Warsaw")
 
-COMMANDS = ["add_event", "list_events", "remove_event", "clarification_needed", "change_calendar"]
+COMMANDS = [
+    "add_event", "list_events", "remove_event", "update_event", "clarification_needed", "change_calendar", "find_slot",
+    "search_mail", "modify_mail", "send_mail"
+]
+
+# "unified" classifies and extracts arguments in one Gemini call, "two_stage" is the classic
+# classifier -> extractor pipeline; unified falls back to two_stage when its call fails
+DISPATCH_MODE = os.getenv("HERMES_DISPATCH_MODE", "unified")
+
+# sync the current calendar's event mirror while Gemini is answering
+WARM_UP_CALENDAR = True
+
+UNIFIED_TOOLS = (
+    "create_calendar_event", "get_event_interval", "delete_event", "update_event", "change_calendar", "find_free_slot",
+    "search_emails", "modify_emails", "send_email"
+)
+
+# commands resolved by date_resolver and the function_call they stand in for
+LOCAL_FUNCTIONS = {"list_events": "get_event_interval", "remove_event": "delete_event"}
+
+# intent a unified function_call belongs to, used to tag the turn in the history
+FUNCTION_INTENTS = {
+    "create_calendar_event": "add_event",
+    "get_event_interval": "list_events",
+    "delete_event": "remove_event",
+    "update_event": "update_event",
+    "change_calendar": "change_calendar",
+    "find_free_slot": "find_slot",
+    "search_emails": "search_mail",
+    "modify_emails": "modify_mail",
+    "send_email": "send_mail"
+}
+
+UNIFIED_INSTRUCTIONS = (
+    "You are a Google Calendar and Gmail assistant for requests written in Polish.\n"
+    "Choose exactly ONE of the provided functions and return it as a function_call with its args:\n"
+    "- create_calendar_event → the user wants to add an event\n"
+    "- get_event_interval → the user wants to see or list events\n"
+    "- delete_event → the user wants to remove an event\n"
+    "- update_event → the user wants to rename, move, recolor or otherwise change existing events\n"
+    "- change_calendar → the user wants to switch to another calendar\n"
+    "- find_free_slot → the user wants to find free time for something\n"
+    "- search_emails → the user wants to find or see e-mails\n"
+    "- modify_emails → the user wants to move, delete, label, archive, star or mark e-mails as read\n"
+    "- send_email → the user wants to write and send an e-mail\n"
+    "If the request is unclear, do not call any function and reply only with: clarification_needed\n"
+)
+
+UNIFIED_RULES = (
+    UNIFIED_INSTRUCTIONS
+    + "\nRules for create_calendar_event:\n" + CREATE_EVENT_RULES
+    + "\nRules for get_event_interval:\n" + LIST_EVENTS_RULES
+    + "\nRules for delete_event:\n" + DELETE_EVENT_RULES
+    + "\nRules for update_event:\n" + UPDATE_EVENT_RULES
+    + "\nRules for change_calendar:\n"
+    + "Use one of the available calendars listed above and return its ID, never its name.\n"
+    + "\nRules for find_free_slot:\n" + FIND_SLOT_RULES
+    + "\nRules for search_emails:\n" + SEARCH_EMAILS_RULES
+    + "\nRules for modify_emails:\n" + MODIFY_EMAILS_RULES
+    + "\nRules for send_email:\n" + SEND_EMAIL_RULES
+)
+
+CLASSIFIER_INSTRUCTIONS = (
+    "You act as a command classifier.\n"
+    "Convert the user's request (in Polish) into exactly ONE of these strings:\n"
+    "add_event, list_events, remove_event, update_event, change_calendar, find_slot, search_mail, modify_mail, send_mail.\n"
+    "Return ONLY the string, with no punctuation, no explanation, no quotes.\n"
+    "If the request is unclear, return: clarification_needed\n"
+    "Examples:\n"
+    "Dodaj spotkanie na jutro o 15 lubtest jutro 15-16 -> add_event\n"
+    "Pokaż mi nadchodzące wydarzenia -> list_events\n"
+    "Usuń wydarzenie jutro o 12 -> remove_event\n"
+    "Przesuń wszystkie treningi w tym tygodniu o godzinę później -> update_event\n"
+    "Znajdź wolną godzinę w przyszłym tygodniu -> find_slot\n"
+    "Pokaż nieprzeczytane maile od Anny -> search_mail\n"
+    "Przenieś faktury z banku do folderu Faktury -> modify_mail\n"
+    "Napisz maila do jan@example.com, że spóźnię się 10 minut -> send_mail\n"
+    "Coś o wydarzeniu, ale nie wiem jak -> clarification_needed \n"
+    "Przełącz kalendarz na inny -> change_calendar ."
+)
+
+@functools.cache
+def classifier_config():
+    """Config of the classifier call, built on first use so google-genai is not imported at startup."""
+    from google.genai import types
+
+    return types.GenerateContentConfig(
+        system_instruction=CLASSIFIER_INSTRUCTIONS,
+        response_mime_type="text/plain"
+    )
 
 schema = {
     "type" : "string",
     "enum": COMMANDS
 }
 
-def choose_specified_model(user_prompt: str) -> str:
-    """Function which choose a specified ai model using gemini based on user input."""
-    
-    messages.append(
-        genai.types.Content(
-            role="user",
-            parts=[genai.types.Part.from_text(text=user_prompt)]
+def unified_header() -> str:
+    """Per-call part of the single-call instructions: current time and the user's calendars."""
+    return today_header() + calendars_header()
+
+def route_function_call(function_call):
+    """Run the calendar or mail action matching a function_call returned by Gemini."""
+    args = function_call.args
+
+    if function_call.name == "create_calendar_event":
+        create_event_api(args)
+    elif function_call.name == "get_event_interval":
+        list_events_api(
+            args["timeMin"], args["timeMax"], force_refresh=session.current().force_refresh,
+            calendar_ids=args.get("calendarIds"), all_calendars=args.get("allCalendars", False)
         )
-    )
+    elif function_call.name == "delete_event":
+        delete_events_api(delete_targets(args), args.get("deleteAll", False), session.current().force_refresh)
+    elif function_call.name == "update_event":
+        update_events_api(args, session.current().force_refresh)
+    elif function_call.name == "change_calendar":
+        summary = change_calendar_api(args["calendarId"])
+        if summary is not None:
+            print(f"📌 Zmieniono kalendarz na: {summary}")
+    elif function_call.name == "find_free_slot":
+        find_slot_api(
+            args["durationMinutes"], args["timeMin"], args["timeMax"],
+            calendar_ids=args.get("calendarIds"), all_calendars=args.get("allCalendars", False)
+        )
+    elif function_call.name == "search_emails":
+        search_emails_api(args)
+    elif function_call.name == "modify_emails":
+        modify_emails_api(args)
+    elif function_call.name == "send_email":
+        send_email_api(args)
+    else:
+        print(f"❌ Nieznana funkcja: {function_call.name}")
 
-    gemini_instructions = (
-        "You act as a command classifier.\n"
-        "Convert the user's request (in Polish) into exactly ONE of these strings:\n"
-        "add_event, list_events, remove_event, change_calendar.\n"
-        "Return ONLY the string, with no punctuation, no explanation, no quotes.\n"
-        "If the request is unclear, return: clarification_needed\n"
-        "Examples:\n"
-        "Dodaj spotkanie na jutro o 15 lubtest jutro 15-16 -> add_event\n"
-        "Pokaż mi nadchodzące wydarzenia -> list_events\n"
-        "Usuń wydarzenie jutro o 12 -> remove_event\n"
-        "Coś o wydarzeniu, ale nie wiem jak -> clarification_needed \n"
-        "Przełącz kalendarz na inny -> change_calendar ."
-    )
+async def route_function_call_async(function_call):
+    api = "gmail" if FUNCTION_INTENTS.get(function_call.name, "").endswith("_mail") else "calendar"
+    with tracing.span(f"{api}.{function_call.name}"):
+        await async_core.to_command_thread(route_function_call, function_call)
 
-    config = genai.types.GenerateContentConfig(
-        system_instruction=gemini_instructions,
-        response_mime_type="text/plain"
-    )
+def _warm_up():
+    """Bring the calendar list and the current calendar's event mirror up to date."""
+    with tracing.span("mirror.warm_up"):
+        calendar_cache.all_calendars()
+        if event_store.ENABLED:
+            event_store.ensure_fresh(session.current().calendar["id"])
 
-    response = client.models.generate_content(
-        model=MODEL_NAME,
-        contents=messages[-10:],  
-        config=config
-    )
+async def unified_dispatch_async(user_prompt: str):
+    """Classify the command and extract its arguments with a single Gemini call."""
+    history = session.current().history
+
+    history.add(user_prompt)
+
+    function_call = response_cache.get_function_call(user_prompt, "unified", MODEL_NAME)
 
-    result = response.text.strip()
+    if function_call is None:
+        header = await async_core.to_thread(unified_header)
+        config = tool_registry.config(UNIFIED_TOOLS, UNIFIED_RULES, header)
+
+        contents = history.contents()
+        with tracing.span("llm.generate_content", stage="unified", model=MODEL_NAME) as span:
+            response = await request_scheduler.generate_content_async(
+                model=MODEL_NAME,
+                contents=contents,
+                config=config
+            )
+            tracing.record_usage(span, response)
+        history.count_call("unified", contents, config, response)
+
+        ai_message = response.candidates[0].content.parts[0]
+
+        if not ai_message.function_call:
+            print("❓ Doprecyzuj swoje polecenie.")
+            return
+
+        function_call = ai_message.function_call
+        response_cache.put_function_call(user_prompt, "unified", MODEL_NAME, function_call)
+        print(f"🛠️ Wywołanie funkcji: {function_call.name}")
+    else:
+        print(f"♻️ Odpowiedź z pamięci podręcznej: {function_call.name}")
+
+    history.add(user_prompt, FUNCTION_INTENTS.get(function_call.name))
+    print(f"🧩 Argumenty: {function_call.args}")
+
+    await route_function_call_async(function_call)
+
+async def dispatch_async(user_prompt: str):
+    """Entry point for a user command, honouring DISPATCH_MODE.
+
+    While Gemini is answering, the event mirror of the current calendar is
+    synced on the I/O executor, so listing or deleting afterwards does not wait
+    for Calendar round trips of its own. Every request of the command shares
+    one deadline of request_scheduler.COMMAND_DEADLINE_SECONDS. A leading
+    "odśwież" makes the command sync the mirror first (alone, it only syncs).
+    """
+    user_prompt, refresh = date_resolver.split_refresh(user_prompt)
+    current = session.current()
+    if refresh and not user_prompt.strip():
+        await async_core.to_thread(_refresh)
+        return
+
+    current.force_refresh = refresh
+    try:
+        await _dispatch_async(user_prompt)
+    finally:
+        current.force_refresh = False
+
+def _refresh():
+    """Sync the mirror of the current calendar with the API right away."""
+    if not event_store.ENABLED:
+        print("ℹ️ Lokalna kopia kalendarza jest wyłączona, wydarzenia są zawsze pobierane na żywo.")
+        return
+    with request_scheduler.deadline(request_scheduler.COMMAND_DEADLINE_SECONDS):
+        event_store.ensure_fresh(session.current().calendar["id"], force_refresh=True)
+    print(f"🔄 Zsynchronizowano kalendarz: {session.current().calendar['summary']}")
+
+async def _dispatch_async(user_prompt: str):
+    with tracing.span("command", prompt=user_prompt, mode=DISPATCH_MODE), \
+            request_scheduler.deadline(request_scheduler.COMMAND_DEADLINE_SECONDS):
+        with tracing.span("local.resolve_command"):
+            local = date_resolver.resolve_command(user_prompt)
+        if local:
+            from google.genai import types
+
+            intent, args = local
+            session.current().history.add(user_prompt, intent)
+            print(f"⚡ Polecenie rozpoznane lokalnie: {intent}")
+            print(f"🧩 Argumenty: {args}")
+            await route_function_call_async(types.FunctionCall(name=LOCAL_FUNCTIONS[intent], args=args))
+            return
+
+        warm_up = asyncio.ensure_future(async_core.to_thread(_warm_up)) if WARM_UP_CALENDAR else None
+
+        try:
+            if DISPATCH_MODE == "unified":
+                from google.genai import errors
+
+                try:
+                    await unified_dispatch_async(user_prompt)
+                    return
+                except errors.APIError as e:
+                    print(f"⚠️ Tryb jednego wywołania nie powiódł się ({e}), używam klasyfikatora.")
+
+            await choose_specified_model_async(user_prompt)
+        finally:
+            if warm_up is not None:
+                # a failed warm-up only means the API functions sync (or go live) themselves
+                await asyncio.gather(warm_up, return_exceptions=True)
+
+async def choose_specified_model_async(user_prompt: str) -> str:
+    """Function which choose a specified ai model using gemini based on user input."""
+    history = session.current().history
+
+    history.add(user_prompt)
+
+    result = response_cache.get(user_prompt, "classifier", MODEL_NAME)
+
+    if result is None:
+        contents = history.contents()
+        with tracing.span("llm.generate_content", stage="classifier", model=MODEL_NAME) as span:
+            response = await request_scheduler.generate_content_async(
+                model=MODEL_NAME,
+                contents=contents,
+                config=classifier_config()
+            )
+            tracing.record_usage(span, response)
+        history.count_call("classifier", contents, classifier_config(), response)
+
+        result = response.text.strip()
+        if result in COMMANDS and result != "clarification_needed":
+            response_cache.put(user_prompt, "classifier", MODEL_NAME, result)
 
     if result == "add_event":
-        create_event_prompt(user_prompt)
+        await create_event_prompt_async(user_prompt)
     elif result == "list_events":
-        list_events_prompt(user_prompt)
+        await list_events_prompt_async(user_prompt)
     elif result == "remove_event":
-        delete_event_prompt(user_prompt)
+        await delete_event_prompt_async(user_prompt)
+    elif result == "update_event":
+        await update_event_prompt_async(user_prompt)
     elif result == "edit_event":
         print("✏️ Funkcja edytowania wydarzeń nie jest jeszcze zaimplementowana.")
     elif result == "change_calendar":
-        change_calendar_prompt(user_prompt)
+        await change_calendar_prompt_async(user_prompt)
+    elif result == "find_slot":
+        await find_slot_prompt_async(user_prompt)
+    elif result == "search_mail":
+        await search_emails_prompt_async(user_prompt)
+    elif result == "modify_mail":
+        await modify_emails_prompt_async(user_prompt)
+    elif result == "send_mail":
+        await send_email_prompt_async(user_prompt)
     elif result == "clarification_needed":
         print("❓ Doprecyzuj swoje polecenie.")
 
+# synchronous entry points, kept for main.py and other callers outside the event loop
+
+def unified_dispatch(user_prompt: str):
+    return async_core.run(unified_dispatch_async(user_prompt))
+
+def dispatch(user_prompt: str):
+    return async_core.run(dispatch_async(user_prompt))
+
+def choose_specified_model(user_prompt: str) -> str:
+    return async_core.run(choose_specified_model_async(user_prompt))
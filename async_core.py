@@ -0,0 +1,78 @@
+import os
+import asyncio
+import functools
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# threads for blocking work started from coroutines: googleapiclient requests and
+# SQLite; commands, which may wait on a question to the user, get threads of their own
+IO_WORKERS = int(os.getenv("HERMES_IO_WORKERS", "8"))
+
+_loop = None
+_loop_thread = None
+_loop_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="hermes-io")
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """The process-wide event loop, started on a daemon thread on first use.
+
+    One long-lived loop is shared by every command so the async Gemini client
+    keeps its connections instead of binding them to a loop per asyncio.run().
+    """
+    global _loop, _loop_thread
+
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            _loop_thread = threading.Thread(target=_loop.run_forever, name="hermes-loop", daemon=True)
+            _loop_thread.start()
+        return _loop
+
+def run(coroutine):
+    """Run a coroutine on the shared loop from synchronous code and return its result."""
+    loop = get_loop()
+    if threading.current_thread() is _loop_thread:
+        coroutine.close()
+        raise RuntimeError("async_core.run() called from the event loop; await the coroutine instead")
+    return asyncio.run_coroutine_threadsafe(coroutine, loop).result()
+
+async def to_thread(function, *args, **kwargs):
+    """Await a blocking call (Calendar API, SQLite, input()) run on the I/O executor.
+
+    The call runs in a copy of the caller's context, so tracing spans opened
+    in the worker thread nest under the awaiting coroutine's span.
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(_executor, functools.partial(context.run, function, *args, **kwargs))
+
+def _settle(future: asyncio.Future, result, error: BaseException | None):
+    if future.cancelled():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+async def to_command_thread(function, *args, **kwargs):
+    """Await a blocking command (an *_api function) run on a thread of its own.
+
+    A command may sit on a question such as "Usunąć? (T/N)" for minutes; on the
+    I/O executor every waiting client would take a worker the other sessions
+    need for their requests.
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+    context = contextvars.copy_context()
+
+    def command():
+        try:
+            result = context.run(function, *args, **kwargs)
+        except BaseException as e:
+            loop.call_soon_threadsafe(_settle, future, None, e)
+        else:
+            loop.call_soon_threadsafe(_settle, future, result, None)
+
+    threading.Thread(target=command, name="hermes-command", daemon=True).start()
+    return await future
@@ -0,0 +1,141 @@
+import io
+import sys
+import json
+import time
+import asyncio
+import threading
+
+import async_core
+import calendar_cache
+import session
+from ai_router import dispatch_async
+from conversation import ConversationHistory
+
+# commands dispatched at the same time; Gemini calls overlap, Calendar calls share async_core's I/O threads
+CONCURRENCY = 4
+
+# replies to the questions the API functions ask interactively
+CONFIRM_ANSWERS = {"yes": "t", "no": "n"}
+AMBIGUOUS_ANSWERS = {"first": "1", "all": "w", "skip": ""}
+
+# a command printing a line starting with one of these did not do what was asked
+FAILURE_MARKS = ("❌", "❓")
+
+def parse_line(line: str, index: int) -> dict | None:
+    """One command of the input: plain text, or a JSON object with "command" and optional
+    "id", "calendar", "confirm" and "ambiguous". Blank lines and # comments are skipped."""
+    line = line.strip()
+    if not line or line.startswith("#"):
+        return None
+
+    if line.startswith("{"):
+        command = json.loads(line)
+        if not isinstance(command, dict) or not isinstance(command.get("command"), str):
+            raise ValueError(f"wiersz {index}: brak pola \"command\"")
+        for field, allowed in (("confirm", CONFIRM_ANSWERS), ("ambiguous", AMBIGUOUS_ANSWERS)):
+            if field in command and (not isinstance(command[field], str) or command[field] not in allowed):
+                raise ValueError(
+                    f"wiersz {index}: niepoprawne pole \"{field}\": {command[field]!r} "
+                    f"(dozwolone: {', '.join(allowed)})"
+                )
+        return command
+
+    return {"command": line}
+
+def answers(confirm: str, ambiguous: str) -> dict:
+    """Session answers for a confirmation and an ambiguity policy; unknown colors fall back to the default."""
+    return {"confirm": CONFIRM_ANSWERS[confirm], "choose": AMBIGUOUS_ANSWERS[ambiguous], "color": "n"}
+
+async def run_command(index: int, command: dict, calendar: dict, confirm: str, ambiguous: str) -> dict:
+    """Dispatch one command in a session of its own and describe the outcome as a result record."""
+    buffer = io.StringIO()
+
+    current = session.Session(
+        calendar=calendar,
+        conversation=ConversationHistory(),
+        answers=answers(command.get("confirm", confirm), command.get("ambiguous", ambiguous)),
+        output=buffer
+    )
+    result = {"index": index, "id": command.get("id"), "command": command["command"]}
+    start = time.perf_counter()
+
+    with session.use(current):
+        try:
+            if command.get("calendar"):
+                current.calendar = await async_core.to_thread(calendar_cache.get_calendar, command["calendar"])
+                if current.calendar is None:
+                    raise LookupError(f"Nie znaleziono kalendarza: {command['calendar']}")
+
+            await dispatch_async(command["command"])
+
+            lines = buffer.getvalue().splitlines()
+            failed = any(line.startswith(FAILURE_MARKS) for line in lines)
+            result["status"] = "failed" if failed else "ok"
+        except Exception as e:
+            result["status"] = "error"
+            result["error"] = f"{type(e).__name__}: {e}"
+
+    result.update(
+        intent=current.history.latest_intent,
+        calendar=current.calendar["id"] if current.calendar else command.get("calendar"),
+        duration_ms=round((time.perf_counter() - start) * 1000, 1),
+        output=buffer.getvalue().splitlines()
+    )
+    return result
+
+def run(lines, output, concurrency: int = CONCURRENCY, confirm: str = "no", ambiguous: str = "skip") -> dict:
+    """Run every command of lines with at most concurrency in flight and write one JSON result per line.
+
+    Results are written to output as commands finish, so their order can
+    differ from the input; "index" is the command's line number. Returns the
+    counts of results by status.
+    """
+    loop = async_core.get_loop()
+    calendar = dict(session.default.calendar)
+    slots = threading.BoundedSemaphore(concurrency)
+    counts = {"ok": 0, "failed": 0, "error": 0}
+    write_lock = threading.Lock()
+
+    def emit(result: dict):
+        with write_lock:
+            counts[result["status"]] += 1
+            output.write(json.dumps(result, ensure_ascii=False) + "\n")
+            output.flush()
+
+    def finished(future):
+        try:
+            emit(future.result())
+        except Exception as e:
+            emit({"index": None, "status": "error", "error": f"{type(e).__name__}: {e}"})
+        finally:
+            slots.release()
+
+    start = time.perf_counter()
+    with session.redirect_stdout():
+        for index, line in enumerate(lines, start=1):
+            try:
+                command = parse_line(line, index)
+            except ValueError as e:
+                emit({"index": index, "command": line.strip(), "status": "error", "error": str(e)})
+                continue
+            if command is None:
+                continue
+
+            slots.acquire()
+            future = asyncio.run_coroutine_threadsafe(
+                run_command(index, command, calendar, confirm, ambiguous), loop
+            )
+            future.add_done_callback(finished)
+
+        # every slot back means every command has finished
+        for _ in range(concurrency):
+            slots.acquire()
+
+    elapsed = time.perf_counter() - start
+    total = sum(counts.values())
+    print(
+        f"📦 Przetworzono {total} poleceń w {elapsed:.1f} s ({total / elapsed if elapsed else 0:.1f}/s): "
+        f"{counts['ok']} ok, {counts['failed']} nieudanych, {counts['error']} błędów",
+        file=sys.stderr
+    )
+    return counts
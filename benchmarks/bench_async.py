@@ -0,0 +1,58 @@
+"""End-to-end latency of the async core: Calendar sync overlapped with the Gemini call, or not.
+
+Both Gemini and Calendar are stubs with fixed latencies. The event mirror is
+made stale before every command (as after a minute of idling), so listing
+needs a sync; with WARM_UP_CALENDAR the sync runs while Gemini is answering.
+
+    python benchmarks/bench_async.py [llm_latency_ms] [calendar_latency_ms] [iterations]
+"""
+import io
+import sys
+import time
+import statistics
+import contextlib
+
+from stubs import install
+
+import ai_router
+import ai_google_calendar
+import event_store
+
+def run(client, iterations: int) -> list[float]:
+    timings = []
+
+    for _ in range(iterations):
+        client.models.command = "list_events"
+        with event_store.lock:
+            event_store._db().execute("UPDATE sync_state SET synced_at = 0")
+
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            ai_router.dispatch("co mam w planach")
+        timings.append((time.perf_counter() - start) * 1000)
+
+    return timings
+
+def main():
+    llm_latency = float(sys.argv[1]) / 1000 if len(sys.argv) > 1 else 0.08
+    calendar_latency = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.04
+    iterations = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+
+    client, _ = install(genai_latency=llm_latency, calendar_latency=calendar_latency, events=50)
+    ai_google_calendar.change_calendar_api("primary")
+    ai_router.DISPATCH_MODE = "unified"
+
+    print(f"stubbed LLM latency: {llm_latency * 1000:.0f} ms, Calendar latency: {calendar_latency * 1000:.0f} ms")
+    results = {}
+    for warm_up in (False, True):
+        ai_router.WARM_UP_CALENDAR = warm_up
+        run(client, 1)
+        timings = run(client, iterations)
+        label = "overlapped" if warm_up else "sequential"
+        results[label] = statistics.mean(timings)
+        print(f"{label:<10} mean {results[label]:8.2f} ms/command   p95 {sorted(timings)[int(len(timings) * 0.95) - 1]:8.2f} ms")
+
+    print(f"saved      {results['sequential'] - results['overlapped']:8.2f} ms/command")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Bulk mutation benchmark: one events().insert/patch/delete per event vs batched requests.
+
+The Calendar service is a stub with a fixed round-trip latency, so the numbers
+show how many round trips each approach pays for N events.
+
+    python benchmarks/bench_batch.py [events] [calendar_latency_ms]
+"""
+import sys
+import time
+
+from stubs import install
+
+import calendar_batch
+import event_store
+
+CALENDAR_ID = "me@example.com"
+
+# the change applied to every event by the update runs
+MOVED = {"summary": "Trening (przeniesiony)"}
+
+def make_events(count: int) -> list[dict]:
+    return [
+        {
+            "summary": "Trening",
+            "start": {"dateTime": f"2025-09-{1 + i % 28:02d}T18:00:00+02:00", "timeZone": "Europe/Warsaw"},
+            "end": {"dateTime": f"2025-09-{1 + i % 28:02d}T19:00:00+02:00", "timeZone": "Europe/Warsaw"},
+        }
+        for i in range(count)
+    ]
+
+def timed(service, action) -> tuple[float, int, object]:
+    requests = service.requests
+    start = time.perf_counter()
+    result = action()
+    return (time.perf_counter() - start) * 1000, service.requests - requests, result
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 120
+    latency = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.03
+
+    _, service = install(calendar_latency=latency)
+    print(f"{count} events, stubbed Calendar latency: {latency * 1000:.0f} ms")
+
+    def insert_one_by_one():
+        created = []
+        for event in make_events(count):
+            created.append(service.events().insert(calendarId=CALENDAR_ID, body=event).execute())
+            event_store.upsert(CALENDAR_ID, created[-1])
+        return created
+
+    def update_one_by_one(events):
+        for event in events:
+            updated = service.events().patch(calendarId=CALENDAR_ID, eventId=event["id"], body=MOVED).execute()
+            event_store.upsert(CALENDAR_ID, updated)
+
+    def delete_one_by_one(events):
+        for event in events:
+            service.events().delete(calendarId=CALENDAR_ID, eventId=event["id"]).execute()
+            event_store.remove(CALENDAR_ID, event)
+
+    ms, requests, created = timed(service, insert_one_by_one)
+    print(f"create  one by one {ms:9.1f} ms  {requests:4d} round trips")
+    ms, requests, _ = timed(service, lambda: update_one_by_one(created))
+    print(f"update  one by one {ms:9.1f} ms  {requests:4d} round trips")
+    ms, requests, _ = timed(service, lambda: delete_one_by_one(created))
+    print(f"delete  one by one {ms:9.1f} ms  {requests:4d} round trips")
+
+    ms, requests, results = timed(service, lambda: calendar_batch.create_events(CALENDAR_ID, make_events(count)))
+    print(f"create  batched    {ms:9.1f} ms  {requests:4d} round trips  {sum(r['ok'] for r in results)} ok")
+    created = [result["result"] for result in results]
+    ms, requests, results = timed(
+        service, lambda: calendar_batch.update_events(CALENDAR_ID, [(event, MOVED) for event in created])
+    )
+    print(f"update  batched    {ms:9.1f} ms  {requests:4d} round trips  {sum(r['ok'] for r in results)} ok")
+    ms, requests, results = timed(service, lambda: calendar_batch.delete_events(CALENDAR_ID, created))
+    print(f"delete  batched    {ms:9.1f} ms  {requests:4d} round trips  {sum(r['ok'] for r in results)} ok")
+
+if __name__ == "__main__":
+    main()
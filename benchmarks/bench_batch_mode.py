@@ -0,0 +1,73 @@
+"""Batch mode benchmark: sustained commands per second at different concurrency limits.
+
+Every prompt of benchmarks/recorded_sessions.json is fed to batch_mode.run()
+as one JSONL stream, against the local Calendar server and the replayed Gemini
+client, with deletions confirmed and ambiguous matches resolved to the first.
+It first checks that such confirmed deletions of a name only resembling an
+event ("spotkanie z Anią" next to "Spotkanie z zespołem") delete nothing.
+
+    python benchmarks/bench_batch_mode.py [repeats] [llm_latency_ms] [calendar_latency_ms]
+"""
+import io
+import os
+import sys
+import json
+import time
+import contextlib
+
+from stubs import install_replay
+
+import batch_mode
+
+RECORDINGS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "recorded_sessions.json")
+
+# each shares only some words with an event of the calendar ("Spotkanie z zespołem", "Trening")
+PARTIAL_NAMES = [
+    "usuń spotkanie z Anią w tym tygodniu",
+    "usuń wszystkie spotkania z Anią z tego tygodnia",
+    "usuń trening siłowy jutro",
+]
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    llm_latency = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.04
+    calendar_latency = float(sys.argv[3]) / 1000 if len(sys.argv) > 3 else 0.02
+
+    client, server, sessions = install_replay(RECORDINGS, llm_latency, calendar_latency)
+    lines = [
+        json.dumps({"id": f"{repeat}-{command['intent']}", "command": command["prompt"]}, ensure_ascii=False)
+        for repeat in range(repeats)
+        for session in sessions
+        for command in session["commands"]
+    ]
+    print(f"{len(lines)} commands, latency: LLM {llm_latency * 1000:.0f} ms, Calendar {calendar_latency * 1000:.0f} ms")
+
+    # first run builds the service, loads the calendar list and fills the mirror
+    with contextlib.redirect_stderr(io.StringIO()):
+        batch_mode.run(lines[:5], io.StringIO(), 1, "yes", "first")
+
+    # nobody reviews a confirmed batch, so a half-matching name must not delete anything
+    deletions = server.requests["DELETE"] + server.requests["batch DELETE"]
+    output = io.StringIO()
+    with contextlib.redirect_stderr(io.StringIO()):
+        batch_mode.run(PARTIAL_NAMES, output, 1, "yes", "first")
+    deleted = server.requests["DELETE"] + server.requests["batch DELETE"] - deletions
+    print(f"partial names with --confirm yes: {deleted} events deleted, {'ok' if not deleted else 'MISMATCH'}")
+    if deleted:
+        sys.exit(1)
+
+    for concurrency in (1, 4, 8, 16):
+        output = io.StringIO()
+        start = time.perf_counter()
+        with contextlib.redirect_stderr(io.StringIO()):
+            counts = batch_mode.run(lines, output, concurrency, "yes", "first")
+        elapsed = time.perf_counter() - start
+
+        results = [json.loads(line) for line in output.getvalue().splitlines()]
+        durations = sorted(result["duration_ms"] for result in results)
+        print(f"concurrency {concurrency:2d}   {len(results) / elapsed:6.1f} commands/s   "
+              f"p50 {durations[len(durations) // 2]:6.1f} ms   "
+              f"ok {counts['ok']}, failed {counts['failed']}, errors {counts['error']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Micro-benchmark: per-command overhead of obtaining the Calendar service.
+
+Compares the old behaviour (read token.json and run discovery.build on every call)
+with the process-wide service pool in utils. Runs fully offline using a
+temporary, not yet expired token.json.
+
+    python benchmarks/bench_calendar_service.py [iterations]
+"""
+import os
+import sys
+import json
+import time
+import tempfile
+import datetime as dt
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from googleapiclient.discovery import build
+from google.oauth2.credentials import Credentials
+
+import utils
+
+# change_calendar_prompt used to call setup_calendar_service() three times per command
+CALLS_PER_COMMAND = 3
+
+def write_fake_token(path: str):
+    expiry = dt.datetime.now(dt.timezone.utc) + dt.timedelta(hours=1)
+    token = {
+        "token": "bench-access-token",
+        "refresh_token": "bench-refresh-token",
+        "client_id": "bench.apps.googleusercontent.com",
+        "client_secret": "bench-secret",
+        "scopes": utils.SCOPES,
+        "expiry": expiry.strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
+    }
+    with open(path, "w") as file:
+        json.dump(token, file)
+
+def old_setup_calendar_service():
+    """The pre-pool implementation, kept here as the baseline."""
+    creds = Credentials.from_authorized_user_file("token.json", utils.SCOPES)
+    return build("calendar", "v3", credentials=creds)
+
+def measure(label: str, setup, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for _ in range(CALLS_PER_COMMAND):
+            setup()
+    per_command = (time.perf_counter() - start) / iterations * 1000
+    print(f"{label:<28} {per_command:9.3f} ms/command")
+    return per_command
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        write_fake_token(os.path.join(tmp, "token.json"))
+        mtime = os.path.getmtime("token.json")
+
+        before = measure("build per call (before)", old_setup_calendar_service, iterations)
+        utils.reset_services()
+        after = measure("shared service pool (after)", utils.setup_calendar_service, iterations)
+
+        print(f"{'speedup':<28} {before / after:9.1f}x")
+        print(f"token.json rewritten: {os.path.getmtime('token.json') != mtime}")
+        utils.reset_services()
+
+if __name__ == "__main__":
+    main()
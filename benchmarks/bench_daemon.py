@@ -0,0 +1,161 @@
+"""Daemon benchmark: dispatch overhead of the socket, session isolation and shared throughput.
+
+Starts daemon.py on a temporary Unix socket in this process, against the local
+Calendar and Gmail servers and the replayed Gemini client, and measures:
+
+- a locally resolved command dispatched in process next to the same command
+  sent by hermes_client.Connection, i.e. what the socket and JSON lines add;
+- a whole hermes_client.py process per command next to importing main.py,
+  the least a fresh python main.py pays before its first command;
+- that sessions keep their own calendar and history;
+- that clients sitting on a question do not hold up another client's command;
+- recorded sessions replayed by 1 to 16 clients at once, each with its own
+  connection, questions answered through the protocol.
+
+    python benchmarks/bench_daemon.py [llm_latency_ms] [calendar_latency_ms]
+"""
+import io
+import os
+import sys
+import time
+import tempfile
+import statistics
+import subprocess
+import threading
+
+from stubs import install_replay
+
+import async_core
+import daemon
+import session
+from ai_router import dispatch
+from conversation import ConversationHistory
+from hermes_client import Connection
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RECORDINGS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "recorded_sessions.json")
+
+LOCAL_COMMAND = "pokaż wydarzenia na jutro"
+
+# an event to delete, and the locally resolved command that asks before deleting it
+HELD_SETUP = "dodaj przegląd kodu w środę o 14"
+HELD_COMMAND = "skasuj przegląd kodu"
+
+# a command waiting behind clients that sit on a question longer than this counts as held up
+HELD_UP_SECONDS = 5
+
+RUNS = 50
+
+def answer(question: str) -> str:
+    return "1" if question.startswith("Wybierz") else "t"
+
+def quiet(line: str):
+    pass
+
+def in_process(command: str) -> float:
+    current = session.Session(conversation=ConversationHistory(), output=io.StringIO())
+    start = time.perf_counter()
+    with session.use(current):
+        dispatch(command)
+    return time.perf_counter() - start
+
+def over_socket(connection: Connection, command: str) -> float:
+    start = time.perf_counter()
+    connection.command(command, answer, quiet)
+    return time.perf_counter() - start
+
+def wall_time(arguments: list[str]) -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, *arguments], cwd=ROOT, check=True, capture_output=True)
+    return time.perf_counter() - start
+
+def hold(address: str, asked: threading.Semaphore, release: threading.Event):
+    """Send HELD_COMMAND and sit on its question until released, then decline."""
+    connection = Connection(address)
+
+    def wait(question: str) -> str:
+        asked.release()
+        release.wait()
+        return "n"
+
+    connection.command(HELD_COMMAND, wait, quiet)
+    connection.close()
+
+def replay(address: str, commands: list[str], statuses: list[str]):
+    connection = Connection(address)
+    for command in commands:
+        statuses.append(connection.command(command, answer, quiet)["status"])
+    connection.close()
+
+def main():
+    llm_latency = float(sys.argv[1]) / 1000 if len(sys.argv) > 1 else 0.04
+    calendar_latency = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.02
+
+    _, _, sessions = install_replay(RECORDINGS, llm_latency, calendar_latency)
+    address = os.path.join(tempfile.mkdtemp(), "hermes.sock")
+
+    with session.redirect_stdout():
+        server = daemon.start(address)
+        connection = Connection(address)
+        print(f"daemon on {address}, latency: LLM {llm_latency * 1000:.0f} ms, Calendar {calendar_latency * 1000:.0f} ms")
+
+        # warm the calendar list, the mirror and the Calendar service first
+        over_socket(connection, LOCAL_COMMAND)
+        local = statistics.median(in_process(LOCAL_COMMAND) for _ in range(RUNS))
+        remote = statistics.median(over_socket(connection, LOCAL_COMMAND) for _ in range(RUNS))
+        print(f"'{LOCAL_COMMAND}': in process {local * 1000:.2f} ms, over the socket {remote * 1000:.2f} ms "
+              f"(+{(remote - local) * 1000:.2f} ms)")
+
+        client = statistics.median(
+            wall_time(["hermes_client.py", "--address", address, LOCAL_COMMAND]) for _ in range(5)
+        )
+        cold = statistics.median(wall_time(["-c", "import main"]) for _ in range(3))
+        print(f"hermes_client.py process per command: {client * 1000:.0f} ms   "
+              f"importing main.py alone: {cold * 1000:.0f} ms")
+
+        work, home = Connection(address, session="bench-work"), Connection(address)
+        work.command("przełącz na kalendarz praca", answer, quiet)
+        again = Connection(address, session="bench-work")
+        isolated = work.prompt != home.prompt and again.prompt == work.prompt
+        print(f"sessions: 'praca' kept by the named session and its reconnection, not by another "
+              f"connection: {'ok' if isolated else 'MISMATCH'}")
+        for other in (work, home, again):
+            other.close()
+
+        # more clients on a question than I/O workers, then a command from another client
+        over_socket(connection, HELD_SETUP)
+        asked, release = threading.Semaphore(0), threading.Event()
+        holders = [threading.Thread(target=hold, args=(address, asked, release))
+                   for _ in range(async_core.IO_WORKERS + 2)]
+        for holder in holders:
+            holder.start()
+        all_asked = all(asked.acquire(timeout=HELD_UP_SECONDS) for _ in holders)
+        took = []
+        probe = threading.Thread(target=lambda: took.append(over_socket(connection, LOCAL_COMMAND)), daemon=True)
+        probe.start()
+        probe.join(HELD_UP_SECONDS)
+        release.set()
+        for holder in holders:
+            holder.join()
+        probe.join()
+        print(f"{len(holders)} clients waiting on a question, '{LOCAL_COMMAND}' from another: "
+              f"{took[0] * 1000:.0f} ms, {'ok' if all_asked and took[0] < HELD_UP_SECONDS else 'MISMATCH'}")
+
+        commands = [command["prompt"] for recorded in sessions for command in recorded["commands"]]
+        for clients in (1, 4, 8, 16):
+            statuses = []
+            threads = [threading.Thread(target=replay, args=(address, commands, statuses)) for _ in range(clients)]
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - start
+            print(f"{clients:2d} clients   {len(statuses) / elapsed:6.1f} commands/s   "
+                  f"ok {statuses.count('ok')}, failed {statuses.count('failed')}, errors {statuses.count('error')}")
+
+        connection.close()
+        daemon.stop(server)
+
+if __name__ == "__main__":
+    main()
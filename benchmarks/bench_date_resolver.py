@@ -0,0 +1,71 @@
+"""Accuracy and latency benchmark for the local Polish date resolver.
+
+Runs every phrase of the labelled corpus in date_phrases.json through
+date_resolver.resolve_command, checks the result against the label and reports
+the fast-path hit rate together with the LLM latency it saves. Phrases labelled
+null must be left to Gemini. Exits with status 1 on any mismatch.
+
+    python benchmarks/bench_date_resolver.py [llm_latency_ms]
+"""
+import os
+import sys
+import json
+import time
+import datetime as dt
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import date_resolver
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "date_phrases.json")
+
+def check(phrase: dict, resolved) -> bool:
+    if phrase["expected"] is None:
+        return resolved is None
+    if resolved is None:
+        return False
+
+    intent, args = resolved
+    if intent != phrase["intent"]:
+        return False
+    if [args["timeMin"][:10], args["timeMax"][:10]] != phrase["expected"]:
+        return False
+    if not (args["timeMin"][11:19] == "00:00:00" and args["timeMax"][11:19] == "23:59:59"):
+        return False
+    return args.get("eventName") == phrase.get("eventName")
+
+def main():
+    llm_latency = float(sys.argv[1]) if len(sys.argv) > 1 else 800.0
+
+    with open(CORPUS, "r", encoding="utf-8") as file:
+        corpus = json.load(file)
+    today = dt.datetime.fromisoformat(corpus["today"])
+    phrases = corpus["phrases"]
+
+    failures, hits, elapsed = [], 0, 0.0
+    for phrase in phrases:
+        start = time.perf_counter()
+        resolved = date_resolver.resolve_command(phrase["text"], today)
+        elapsed += time.perf_counter() - start
+
+        hits += resolved is not None
+        if not check(phrase, resolved):
+            failures.append((phrase["text"], resolved))
+
+    resolvable = sum(phrase["expected"] is not None for phrase in phrases)
+    mean_us = elapsed / len(phrases) * 1e6
+
+    print(f"phrases:            {len(phrases)}")
+    print(f"fast-path hits:     {hits}/{len(phrases)} ({hits / len(phrases):.0%}), "
+          f"{hits}/{resolvable} of resolvable")
+    print(f"resolver latency:   {mean_us:.1f} µs/phrase")
+    print(f"LLM time saved:     {hits * llm_latency / 1000:.1f} s "
+          f"(assuming {llm_latency:.0f} ms per Gemini call)")
+
+    for text, resolved in failures:
+        print(f"MISMATCH: {text!r} -> {resolved}")
+
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Latency benchmark: single-call (unified) dispatch vs the two-stage classifier/extractor pipeline.
+
+Gemini is replaced by a stub that answers after a fixed delay, so the numbers
+show how many sequential LLM round trips each mode pays per command.
+
+    python benchmarks/bench_dispatch.py [llm_latency_ms] [iterations]
+"""
+import io
+import sys
+import time
+import statistics
+import contextlib
+
+from stubs import install
+
+import ai_router
+import ai_google_calendar
+
+COMMANDS = ["list_events", "add_event", "change_calendar"]
+
+def run(mode: str, client, iterations: int) -> list[float]:
+    ai_router.DISPATCH_MODE = mode
+    timings = []
+
+    for _ in range(iterations):
+        for command in COMMANDS:
+            client.models.command = command
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                ai_router.dispatch(f"polecenie {command}")
+            timings.append((time.perf_counter() - start) * 1000)
+
+    return timings
+
+def main():
+    latency = float(sys.argv[1]) / 1000 if len(sys.argv) > 1 else 0.05
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    client, _ = install(genai_latency=latency)
+    ai_google_calendar.change_calendar_api("primary")
+
+    print(f"stubbed LLM latency: {latency * 1000:.0f} ms")
+    results = {}
+    for mode in ("two_stage", "unified"):
+        run(mode, client, 1)
+        client.models.calls = 0
+        timings = run(mode, client, iterations)
+        results[mode] = statistics.mean(timings)
+        calls = client.models.calls / len(timings)
+        print(f"{mode:<10} mean {results[mode]:8.2f} ms/command   LLM calls/command {calls:.1f}")
+
+    print(f"saved      {results['two_stage'] - results['unified']:8.2f} ms/command")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Benchmark of the fuzzy event-name index at calendar scale.
+
+Builds an index over a synthetic calendar (default 50 000 events with Polish
+titles), then times ranked lookups for inflected and misspelled names and
+incremental add/remove updates.
+
+    python benchmarks/bench_event_index.py [events]
+"""
+import os
+import sys
+import time
+import random
+import statistics
+import datetime as dt
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.environ.setdefault("HERMES_EVENT_DB", ":memory:")
+
+from event_index import EventIndex
+
+NOUNS = [
+    "spotkanie", "trening", "wizyta", "rozmowa", "przegląd", "planowanie", "szkolenie", "warsztaty",
+    "kolacja", "obiad", "urodziny", "konsultacja", "prezentacja", "demo", "retrospektywa", "standup",
+    "egzamin", "zajęcia", "basen", "siłownia", "dentysta", "lekarz", "fryzjer", "przegląd auta",
+]
+QUALIFIERS = [
+    "z Anią", "z zespołem", "z klientem", "z zarządem", "u mamy", "projektu Hermes", "sprintu",
+    "kwartalny", "budżetu", "w biurze", "online", "z Kubą", "z Ewą", "działu HR", "marketingu",
+    "backendu", "frontendu", "roczny", "tygodniowy", "nr 2", "w Krakowie", "w Warszawie",
+]
+QUERIES = [
+    "spotkania z zespołem", "spotkanie z klientm", "trening", "treningu na basenie", "dentysty",
+    "urodzin u mamy", "retro sprintu", "prezentacje budżetu", "wizyte u lekarza", "siłowni",
+]
+
+def synthetic_events(count: int, rng: random.Random) -> list[dict]:
+    start = dt.datetime(2025, 1, 1, 8, 0)
+    events = []
+    for i in range(count):
+        title = f"{rng.choice(NOUNS)} {rng.choice(QUALIFIERS)}"
+        if rng.random() < 0.3:
+            title += f" {rng.randint(1, 500)}"
+        begin = start + dt.timedelta(hours=i)
+        events.append({
+            "id": f"event{i}",
+            "summary": title.capitalize(),
+            "start": {"dateTime": begin.isoformat() + "+01:00"},
+            "end": {"dateTime": (begin + dt.timedelta(hours=1)).isoformat() + "+01:00"},
+        })
+    return events
+
+def percentile(values: list[float], share: float) -> float:
+    return sorted(values)[min(len(values) - 1, int(len(values) * share))]
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    rng = random.Random(7)
+    events = synthetic_events(count, rng)
+
+    start = time.perf_counter()
+    index = EventIndex(events)
+    print(f"events indexed:     {len(index)} in {time.perf_counter() - start:.2f} s")
+
+    timings = []
+    for _ in range(50):
+        for query in QUERIES:
+            start = time.perf_counter()
+            index.search(query, limit=10)
+            timings.append((time.perf_counter() - start) * 1000)
+
+    print(f"search latency:     mean {statistics.mean(timings):.3f} ms, "
+          f"p50 {percentile(timings, 0.5):.3f} ms, p99 {percentile(timings, 0.99):.3f} ms")
+
+    updates = []
+    for i in range(1000):
+        event = dict(events[i], id=f"new{i}")
+        start = time.perf_counter()
+        index.add(event)
+        index.remove(event["id"])
+        updates.append((time.perf_counter() - start) * 1e6)
+    print(f"add + remove:       mean {statistics.mean(updates):.1f} µs")
+
+    for query in QUERIES[:3]:
+        best = ", ".join(f"{event['summary']} ({score:.2f})" for score, event in index.search(query, limit=3))
+        print(f"  {query!r}: {best}")
+
+if __name__ == "__main__":
+    main()
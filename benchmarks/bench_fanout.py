@@ -0,0 +1,82 @@
+"""Multi-calendar listing benchmark: one calendar after another vs the concurrent fan-out.
+
+Lists a month of events from every calendar of the local Calendar server,
+first calendar by calendar (what switching calendars amounts to), then with
+ai_google_calendar.iter_calendars_events(), both live from the API and
+through a cold event mirror. Reports the time to the first event and to the
+whole merged list.
+
+    python benchmarks/bench_fanout.py [calendars] [calendar_latency_ms] [repeats]
+"""
+import io
+import os
+import sys
+import time
+import statistics
+import contextlib
+import datetime as dt
+
+from stubs import install_replay
+
+import ai_google_calendar
+import event_store
+
+RECORDINGS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "recorded_sessions.json")
+
+def sequential(calendar_ids: list[str], time_min: str, time_max: str) -> tuple[float, float, int]:
+    start = time.perf_counter()
+    events = []
+    for calendar_id in calendar_ids:
+        events.extend(
+            (calendar_id, event)
+            for event in ai_google_calendar.iter_events(time_min, time_max, calendar_id=calendar_id)
+        )
+    # the earliest event is known only once every calendar was fetched
+    events.sort(key=ai_google_calendar._start_timestamp)
+    elapsed = time.perf_counter() - start
+    return elapsed, elapsed, len(events)
+
+def fanout(calendar_ids: list[str], time_min: str, time_max: str) -> tuple[float, float, int]:
+    start = time.perf_counter()
+    first = None
+    count = 0
+    for _ in ai_google_calendar.iter_calendars_events(calendar_ids, time_min, time_max):
+        first = first or time.perf_counter()
+        count += 1
+    return first - start, time.perf_counter() - start, count
+
+def main():
+    calendars = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    calendar_latency = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.08
+    repeats = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+
+    client, server, _ = install_replay(RECORDINGS, calendar_latency=calendar_latency, events=calendars * 200,
+                                       calendars=calendars)
+    calendar_ids = [calendar["id"] for calendar in server.state.calendars.values()]
+    today = dt.datetime.now(ai_google_calendar.TZ).replace(hour=0, minute=0, second=0, microsecond=0)
+    time_min, time_max = today.isoformat(), (today + dt.timedelta(days=30)).isoformat()
+
+    print(f"{calendars} calendars, {calendars * 200} events, Calendar latency {calendar_latency * 1000:.0f} ms, "
+          f"fan-out concurrency {ai_google_calendar.FANOUT_CONCURRENCY}")
+
+    for mirror in (False, True):
+        event_store.ENABLED = mirror
+        for name, strategy in (("one by one", sequential), ("fan-out", fanout)):
+            # warm-up: builds the Calendar clients of the worker threads
+            with contextlib.redirect_stdout(io.StringIO()):
+                strategy(calendar_ids, time_min, time_max)
+
+            firsts, totals = [], []
+            for _ in range(repeats):
+                if mirror:
+                    with event_store.lock:
+                        event_store._db().execute("DELETE FROM sync_state")
+                first, total, count = strategy(calendar_ids, time_min, time_max)
+                firsts.append(first * 1000)
+                totals.append(total * 1000)
+
+            print(f"{'cold mirror' if mirror else 'live API':12s} {name:11s} first event {statistics.median(firsts):7.1f} ms   "
+                  f"all {count} events {statistics.median(totals):7.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Free/busy benchmark: interval queries over hundreds of calendars and months-long windows.
+
+Merges synthetic busy times of many calendars into free_busy.BusyIntervals and
+times overlap checks and free-slot searches against a linear scan of the same
+intervals, then times free_busy.query_busy() against the local Calendar server
+for a week and for half a year, counting HTTP round trips.
+
+    python benchmarks/bench_free_busy.py [calendars] [days] [calendar_latency_ms]
+"""
+import os
+import sys
+import time
+import random
+import datetime as dt
+
+from stubs import install_replay
+
+import free_busy
+from free_busy import BusyIntervals
+
+RECORDINGS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "recorded_sessions.json")
+
+def synthetic_busy(calendars: int, days: int, start: float, rng: random.Random) -> list[tuple[float, float]]:
+    """A 30-90 minute event between 8:00 and 18:00 on about one day in thirty, per calendar."""
+    intervals = []
+    for _ in range(calendars):
+        for day in range(days):
+            if rng.random() < 1 / 30:
+                begin = start + day * 86400 + rng.randrange(8 * 3600, 18 * 3600, 900)
+                intervals.append((begin, begin + rng.choice((1800, 3600, 5400))))
+    return intervals
+
+def linear_overlaps(intervals, start: float, end: float) -> bool:
+    return any(busy_start < end and busy_end > start for busy_start, busy_end in intervals)
+
+def linear_free_slots(merged, window_start: float, window_end: float, duration: float, count: int):
+    slots, cursor = [], window_start
+    for busy_start, busy_end in merged:
+        if busy_end <= cursor:
+            continue
+        free_start = -(-cursor // 900) * 900
+        if free_start + duration <= min(busy_start, window_end):
+            slots.append((free_start, free_start + duration))
+            if len(slots) == count:
+                return slots
+        cursor = max(cursor, busy_end)
+        if cursor >= window_end:
+            return slots
+    free_start = -(-cursor // 900) * 900
+    if free_start + duration <= window_end:
+        slots.append((free_start, free_start + duration))
+    return slots
+
+def timed(function, queries) -> tuple[float, list]:
+    start = time.perf_counter()
+    results = [function(*query) for query in queries]
+    return (time.perf_counter() - start) / len(queries) * 1e6, results
+
+def main():
+    calendars = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 120
+    calendar_latency = float(sys.argv[3]) / 1000 if len(sys.argv) > 3 else 0.05
+    rng = random.Random(7)
+
+    origin = dt.datetime(2025, 9, 1, tzinfo=free_busy.TZ).timestamp()
+    raw = synthetic_busy(calendars, days, origin, rng)
+    raw += free_busy.off_hours(origin, origin + days * 86400)
+
+    start = time.perf_counter()
+    intervals = BusyIntervals(raw)
+    build_ms = (time.perf_counter() - start) * 1000
+    print(f"{calendars} calendars × {days} days: {len(raw)} busy intervals merged into {len(intervals)} "
+          f"in {build_ms:.1f} ms")
+
+    merged = list(intervals)
+    overlap_queries = [
+        (begin, begin + 3600)
+        for begin in (origin + rng.randrange(0, days * 86400, 900) for _ in range(2000))
+    ]
+    indexed_us, indexed = timed(intervals.overlaps, overlap_queries)
+    linear_us, linear = timed(lambda begin, end: linear_overlaps(raw, begin, end), overlap_queries[:100])
+    assert indexed[:100] == linear
+    print(f"overlap check     indexed {indexed_us:8.1f} µs   linear scan {linear_us:10.1f} µs   "
+          f"({linear_us / indexed_us:.0f}x)")
+
+    for duration in (15, 60, 180):
+        slot_queries = [
+            (begin, origin + days * 86400, duration * 60, 3)
+            for begin in (origin + rng.randrange(0, days * 86400 // 2, 900) for _ in range(500))
+        ]
+        indexed_us, indexed = timed(intervals.free_slots, slot_queries)
+        linear_us, linear = timed(lambda *query: linear_free_slots(merged, *query), slot_queries[:100])
+        assert indexed[:100] == linear
+        found = sum(bool(slots) for slots in indexed) / len(indexed)
+        print(f"free slots {duration:3d} min indexed {indexed_us:8.1f} µs   linear scan {linear_us:10.1f} µs   "
+              f"({linear_us / indexed_us:.0f}x, found in {found:.0%} of windows)")
+
+    client, server, _ = install_replay(RECORDINGS, calendar_latency=calendar_latency)
+    calendar_ids = ["me@example.com", "work@example.com", "home@example.com"]
+    today = dt.datetime.now(free_busy.TZ).replace(hour=0, minute=0, second=0, microsecond=0)
+    free_busy.query_busy(calendar_ids, today.isoformat(), (today + dt.timedelta(days=1)).isoformat())
+
+    print(f"\nquery_busy against the local server, {calendar_latency * 1000:.0f} ms per round trip:")
+    for window_days in (7, 182):
+        server.requests.clear()
+        start = time.perf_counter()
+        busy = free_busy.query_busy(calendar_ids, today.isoformat(), (today + dt.timedelta(days=window_days)).isoformat())
+        elapsed = (time.perf_counter() - start) * 1000
+        round_trips = sum(count for key, count in server.requests.items() if not key.startswith("batch "))
+        print(f"  {window_days:3d} days  {elapsed:7.1f} ms   {round_trips} round trip(s)   "
+              f"{sum(len(intervals) for intervals in busy.values())} busy intervals")
+
+if __name__ == "__main__":
+    main()
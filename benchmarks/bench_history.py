@@ -0,0 +1,55 @@
+"""History benchmark: prompt tokens and memory of the bounded conversation history over a long session.
+
+Runs many two-stage commands against the stubs and compares the history tokens
+sent per Gemini call with the old unbounded list, where every prompt function
+appended the prompt again and sent the last 10 entries.
+
+    python benchmarks/bench_history.py [commands]
+"""
+import io
+import sys
+import contextlib
+
+from stubs import install
+
+import ai_router
+import ai_google_calendar
+from conversation import history, estimate_tokens
+
+COMMANDS = ["list_events", "add_event", "change_calendar"]
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 600
+
+    client, _ = install(genai_latency=0)
+    ai_google_calendar.change_calendar_api("primary")
+    ai_router.DISPATCH_MODE = "two_stage"
+
+    legacy = []
+    legacy_tokens = 0
+    legacy_calls = 0
+
+    for i in range(count):
+        command = COMMANDS[i % len(COMMANDS)]
+        prompt = f"polecenie {command} numer {i}: proszę obsłuż to zgodnie z kalendarzem na ten tydzień"
+        client.models.command = command
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            ai_router.dispatch(prompt)
+
+        # classifier and extractor each appended the prompt and sent messages[-10:]
+        for _ in range(2):
+            legacy.append(prompt)
+            legacy_tokens += sum(estimate_tokens(text) for text in legacy[-10:])
+            legacy_calls += 1
+
+    stats = history.stats
+    print(f"commands: {count}, LLM calls: {stats['calls']}")
+    print(f"unbounded list   {legacy_tokens / legacy_calls:7.1f} history tokens/call   {len(legacy):5d} entries kept")
+    print(f"bounded history  {stats['history_tokens'] / stats['calls']:7.1f} history tokens/call   "
+          f"{len(history):5d} entries kept + {estimate_tokens(history.summary)} token summary")
+    for intent, counters in sorted(stats["by_intent"].items()):
+        print(f"  {intent:<16} {counters['calls']:5d} calls   {counters['tokens_sent'] / counters['calls']:7.1f} tokens/call")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Startup benchmark: `python -X importtime -c "import main"`, with a regression threshold.
+
+Imports main in fresh interpreters, reports the median total import time and
+the slowest top-level imports, and fails (exit code 1) when the median exceeds
+the budget or one of the heavy SDKs that are meant to load on first use is
+imported at startup.
+
+    python benchmarks/bench_import_time.py [budget_ms] [runs]
+"""
+import os
+import sys
+import statistics
+import subprocess
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# median `import main` time allowed before the benchmark reports a regression
+IMPORT_BUDGET_MS = 300
+
+# loaded lazily: google-genai by utils.get_genai_client(), the others by the Calendar service setup
+LAZY_MODULES = ["google.genai", "googleapiclient.discovery", "googleapiclient.errors", "httplib2", "google_auth_oauthlib", "google.oauth2"]
+
+def import_main() -> list[tuple[int, int, str]]:
+    """(self µs, cumulative µs, indented module name) for every module imported by `import main`."""
+    env = dict(os.environ, GEMINI_API_KEY=os.environ.get("GEMINI_API_KEY", "benchmark"))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line.removeprefix("import time:").split("|")
+        # the name is indented two spaces per nesting level, after the separator's own space
+        rows.append((int(self_us), int(cumulative_us), name.rstrip()[1:]))
+    return rows
+
+def main():
+    budget = float(sys.argv[1]) if len(sys.argv) > 1 else IMPORT_BUDGET_MS
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 7
+
+    import_main()  # warm the bytecode and OS file caches
+    samples = [import_main() for _ in range(runs)]
+    totals = [next(cumulative for _, cumulative, name in rows if name.strip() == "main") / 1000 for rows in samples]
+    median = statistics.median(totals)
+
+    rows = samples[totals.index(min(totals, key=lambda total: abs(total - median)))]
+    # children are printed before their parent: main's direct imports are the depth-1 rows
+    # between the previous top-level module and main itself
+    end = next(index for index, (_, _, name) in enumerate(rows) if name == "main")
+    start = max((index for index, (_, _, name) in enumerate(rows[:end]) if not name.startswith(" ")), default=-1) + 1
+    direct = sorted(
+        (cumulative, name.strip()) for _, cumulative, name in rows[start:end] if name.startswith("  ") and name[2] != " "
+    )[::-1]
+    print(f"import main: median {median:.1f} ms over {runs} runs (min {min(totals):.1f}, max {max(totals):.1f}), "
+          f"budget {budget:.0f} ms")
+    print("slowest imports of main:")
+    for cumulative, name in direct[:8]:
+        print(f"  {cumulative / 1000:7.1f} ms  {name}")
+
+    imported = {name.strip() for _, _, name in rows}
+    eager = [module for module in LAZY_MODULES if module in imported]
+
+    failed = False
+    if eager:
+        print(f"❌ imported at startup, should load on first use: {', '.join(eager)}")
+        failed = True
+    if median > budget:
+        print(f"❌ import time {median:.1f} ms exceeds the {budget:.0f} ms budget")
+        failed = True
+    if failed:
+        sys.exit(1)
+    print("✅ within budget")
+
+if __name__ == "__main__":
+    main()
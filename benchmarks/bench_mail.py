@@ -0,0 +1,123 @@
+"""Gmail benchmark: header index sync, local search and bulk changes.
+
+Runs the real Gmail client against benchmarks/gmail_server.py with a synthetic
+mailbox (default 20 000 messages) and measures:
+
+- the first full sync of the header index, and an incremental history sync
+  after new mail and label changes next to listing everything again;
+- a search while the index is rebuilt: answered live within a short command
+  deadline, with the listing left to the background;
+- filtered search on the index (first message and all of them) next to the
+  same search as a Gmail q query;
+- labelling messages with batchModify next to one modify call per message.
+
+    python benchmarks/bench_mail.py [messages] [latency_ms]
+"""
+import io
+import os
+import sys
+import time
+import contextlib
+import statistics
+
+from stubs import install_replay
+
+import ai_gmail
+import mail_store
+import request_scheduler
+import utils
+
+RECORDINGS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "recorded_sessions.json")
+
+SEARCHES = [
+    {"sender": "anna", "unread": True},
+    {"subject": "przegląd kodu"},
+    {"text": "faktur", "label_ids": ("Label_2",)},
+    {"recipient": "example.com", "after": time.time() - 7 * 86400},
+]
+
+MODIFIED = 200
+
+# command deadline of the search made while the index is rebuilt, far below a full listing
+SEARCH_DEADLINE_SECONDS = 5
+
+def round_trips(server) -> int:
+    return sum(count for kind, count in server.requests.items() if not kind.startswith("batch "))
+
+def timed_sync(server) -> tuple[float, int]:
+    server.requests.clear()
+    start = time.perf_counter()
+    mail_store.sync()
+    return time.perf_counter() - start, round_trips(server)
+
+def filters(search: dict) -> dict:
+    return {"sender": None, "recipient": None, "subject": None, "text": None, "unread": None,
+            "label_ids": (), "after": None, "before": None, **search}
+
+def timed_search(search: dict, index: bool) -> tuple[float, float, int]:
+    """Seconds to the first message and to the last, and the number of messages."""
+    mail_store.ENABLED = index
+    start = time.perf_counter()
+    first, found = None, 0
+    for _ in ai_gmail.iter_emails(filters(search), limit=ai_gmail.SEARCH_LIMIT):
+        found += 1
+        if first is None:
+            first = time.perf_counter() - start
+    mail_store.ENABLED = True
+    return first or 0.0, time.perf_counter() - start, found
+
+def main():
+    messages = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    latency = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.02
+
+    _, server, _ = install_replay(RECORDINGS, calendar_latency=latency, messages=messages)
+    gmail = server.gmail
+    print(f"{messages} messages, {latency * 1000:.0f} ms per request")
+
+    elapsed, trips = timed_sync(gmail)
+    print(f"full sync:          {elapsed:6.2f} s, {trips} round trips, {mail_store.count()} messages indexed")
+
+    gmail.state.deliver(50)
+    ids = [message_id for message_id in gmail.state.order[-500:-400]]
+    gmail.state.modify(ids, ["Label_1"], ["INBOX"])
+    elapsed, trips = timed_sync(gmail)
+    print(f"incremental sync:   {elapsed:6.2f} s, {trips} round trips (50 new, 100 relabelled)")
+
+    gmail.state.deliver(50)
+    with mail_store._lock:
+        mail_store._db().execute("DELETE FROM sync_state")
+        mail_store._db().commit()
+    gmail.requests.clear()
+    start = time.perf_counter()
+    with request_scheduler.deadline(SEARCH_DEADLINE_SECONDS), contextlib.redirect_stdout(io.StringIO()):
+        first, last, found = timed_search(SEARCHES[0], True)
+    print(f"search meanwhile:   first {first * 1000:.1f} ms, all {last * 1000:.1f} ms ({found} messages, live)")
+    mail_store.sync_in_background().join()
+    elapsed = time.perf_counter() - start
+    print(f"listing again:      {elapsed:6.2f} s, {round_trips(gmail)} round trips, in the background")
+
+    for search in SEARCHES:
+        local = [timed_search(search, True) for _ in range(5)]
+        live = timed_search(search, False)
+        print(f"search {search}:\n"
+              f"  index: first {statistics.median(run[0] for run in local) * 1000:7.2f} ms, "
+              f"all {statistics.median(run[1] for run in local) * 1000:7.2f} ms ({local[0][2]} messages)   "
+              f"live q: first {live[0] * 1000:7.1f} ms, all {live[1] * 1000:7.1f} ms ({live[2]} messages)")
+
+    ids = [message["id"] for message in mail_store.iter_messages(limit=MODIFIED)]
+    gmail.requests.clear()
+    start = time.perf_counter()
+    ai_gmail.modify_messages(ids, ["STARRED"], [])
+    batched = time.perf_counter() - start
+    print(f"batchModify:        {batched:6.2f} s, {round_trips(gmail)} round trips for {len(ids)} messages")
+
+    resource = utils.setup_gmail_service().users().messages()
+    gmail.requests.clear()
+    start = time.perf_counter()
+    for message_id in ids:
+        resource.modify(userId="me", id=message_id, body={"removeLabelIds": ["STARRED"]}).execute()
+    single = time.perf_counter() - start
+    print(f"one modify each:    {single:6.2f} s, {round_trips(gmail)} round trips ({single / batched:.0f}x slower)")
+
+if __name__ == "__main__":
+    main()
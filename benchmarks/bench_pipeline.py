@@ -0,0 +1,99 @@
+"""End-to-end pipeline benchmark: recorded sessions through the real dispatch -> *_prompt -> *_api path.
+
+Gemini is replaced by a client replaying benchmarks/recorded_sessions.json and
+Google Calendar by the local HTTP server from calendar_server.py, so everything
+else - googleapiclient, batch requests, the event mirror, the caches and the
+date resolver - runs unmodified. Confirmations are answered automatically.
+Reports p50/p95/p99 latency per command type and the session throughput.
+
+    python benchmarks/bench_pipeline.py [--repeats 5] [--events 500] [--llm-latency-ms 40]
+                                        [--calendar-latency-ms 20] [--mode two_stage|unified]
+"""
+import io
+import os
+import time
+import argparse
+import contextlib
+from unittest import mock
+from collections import defaultdict
+
+from stubs import install_replay
+
+import ai_router
+import ai_google_calendar
+from conversation import history
+
+RECORDINGS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "recorded_sessions.json")
+
+def answer(prompt: str = "") -> str:
+    """input() replacement: confirm deletions, pick the best match, keep the default color."""
+    if "numer" in prompt:
+        return "1"
+    if "kolor" in prompt:
+        return "n"
+    return "t"
+
+def percentile(values: list[float], share: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(share * len(ordered)))]
+
+def run_session(session: dict, timings: dict):
+    history.clear()
+    ai_google_calendar.change_calendar_api("primary")
+
+    for command in session["commands"]:
+        start = time.perf_counter()
+        ai_router.dispatch(command["prompt"])
+        timings[command["intent"]].append((time.perf_counter() - start) * 1000)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeats", type=int, default=5, help="passes over every recorded session")
+    parser.add_argument("--events", type=int, default=500, help="events generated on the Calendar server")
+    parser.add_argument("--llm-latency-ms", type=float, default=40)
+    parser.add_argument("--calendar-latency-ms", type=float, default=20)
+    parser.add_argument("--mode", choices=["two_stage", "unified"], default="two_stage")
+    parser.add_argument("--recordings", default=RECORDINGS)
+    options = parser.parse_args()
+
+    client, server, sessions = install_replay(
+        options.recordings, options.llm_latency_ms / 1000, options.calendar_latency_ms / 1000, options.events
+    )
+    ai_router.DISPATCH_MODE = options.mode
+
+    commands = sum(len(session["commands"]) for session in sessions)
+    print(f"{len(sessions)} sessions, {commands} commands x {options.repeats}, mode {options.mode}, "
+          f"{options.events} events, latency: LLM {options.llm_latency_ms:.0f} ms, "
+          f"Calendar {options.calendar_latency_ms:.0f} ms")
+
+    output = io.StringIO()
+    timings = defaultdict(list)
+    with mock.patch("builtins.input", answer), contextlib.redirect_stdout(output):
+        # first pass builds the service, loads the calendar list and fills the mirror
+        for session in sessions:
+            run_session(session, defaultdict(list))
+
+        llm_calls, http_requests = client.models.calls, server.requests.total()
+        start = time.perf_counter()
+        for _ in range(options.repeats):
+            for session in sessions:
+                run_session(session, timings)
+        elapsed = time.perf_counter() - start
+
+    failures = [line for line in output.getvalue().splitlines() if "❌" in line]
+    if failures:
+        print(f"⚠️ {len(failures)} commands reported errors, e.g. {failures[0]}")
+
+    print(f"\n{'command':<16}{'n':>5}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for intent, values in sorted(timings.items()):
+        print(f"{intent:<16}{len(values):>5}{percentile(values, 0.50):>10.1f}"
+              f"{percentile(values, 0.95):>10.1f}{percentile(values, 0.99):>10.1f}")
+
+    total = commands * options.repeats
+    print(f"\nthroughput {total / elapsed:.1f} commands/s, "
+          f"{len(sessions) * options.repeats / elapsed * 60:.1f} sessions/min")
+    print(f"per command: {(client.models.calls - llm_calls) / total:.2f} LLM calls, "
+          f"{(server.requests.total() - http_requests) / total:.2f} HTTP round trips")
+
+if __name__ == "__main__":
+    main()
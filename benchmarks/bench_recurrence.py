@@ -0,0 +1,138 @@
+"""Recurring events benchmark: masters expanded locally against instances from the API.
+
+Runs the real Calendar client against benchmarks/calendar_server.py with
+recurring events (default 40 series next to 500 single events) and measures:
+
+- time to the first and the last event and bytes of live listings (instances
+  expanded by the API, streamed page by page) over a month, a quarter and a
+  year, against the bytes of the same ranges listed as masters;
+- bytes of a full mirror sync as masters against every instance;
+- the expander cold and with its caches warm;
+- that mirror and live expansion list the same instances as the server
+  after some of them were cancelled and moved.
+
+    python benchmarks/bench_recurrence.py [series] [latency_ms]
+"""
+import os
+import sys
+import time
+import datetime as dt
+
+from stubs import install_replay
+
+import ai_google_calendar
+import event_store
+import recurrence
+import utils
+
+RECORDINGS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "recorded_sessions.json")
+
+RANGES = [("month", 31), ("quarter", 92), ("year", 365)]
+
+CALENDAR = "primary"
+
+def window(days: int) -> tuple[str, str]:
+    start = dt.datetime.combine(dt.date.today().replace(day=1), dt.time(0), event_store.TZ)
+    return start.isoformat(), (start + dt.timedelta(days=days)).isoformat()
+
+def timed_listing(server, days: int) -> tuple[float, float, int, int]:
+    """Seconds to the first and to the last event, bytes received and events of one live listing."""
+    time_min, time_max = window(days)
+    server.bytes_sent = 0
+    start = time.perf_counter()
+    events = ai_google_calendar._iter_live_events(CALENDAR, time_min, time_max, 250, None, prefetch=True)
+    count = 1 if next(events, None) is not None else 0
+    first = time.perf_counter() - start
+    count += sum(1 for _ in events)
+    return first, time.perf_counter() - start, server.bytes_sent, count
+
+def listed_bytes(server, single_events: bool, days: int | None = None) -> int:
+    """Bytes of listing a range, or a whole calendar the way a full sync does."""
+    resource = utils.setup_calendar_service().events()
+    time_min, time_max = window(days) if days else (None, None)
+    server.bytes_sent = 0
+    page_token = None
+    while True:
+        page = resource.list(calendarId=CALENDAR, singleEvents=single_events, maxResults=2500,
+                             timeMin=time_min, timeMax=time_max, pageToken=page_token).execute()
+        page_token = page.get("nextPageToken")
+        if not page_token:
+            return server.bytes_sent
+
+def clear_caches():
+    recurrence.parse_rule.cache_clear()
+    recurrence._counted.cache_clear()
+    recurrence._month.cache_clear()
+    recurrence._month_instances.cache_clear()
+
+def keys(events: list[dict]) -> set:
+    return {(event["id"], event["start"].get("dateTime") or event["start"].get("date")) for event in events}
+
+def main():
+    series = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    latency = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.02
+
+    _, server, _ = install_replay(RECORDINGS, calendar_latency=latency, series=series)
+    print(f"{series} recurring and 500 single events in 3 calendars, {latency * 1000:.0f} ms per request")
+
+    for name, days in RANGES:
+        first, total, received, count = timed_listing(server, days)
+        masters = listed_bytes(server, single_events=False, days=days)
+        print(f"{name:8} live: first event {first * 1000:6.1f} ms, all {total * 1000:7.1f} ms, "
+              f"{received / 1024:7.1f} KiB, {count} events   as masters: {masters / 1024:7.1f} KiB")
+
+    instances = listed_bytes(server, single_events=True)
+    masters = listed_bytes(server, single_events=False)
+    print(f"full sync: {masters / 1024:.1f} KiB as masters, {instances / 1024:.1f} KiB as instances "
+          f"({instances / masters:.1f}x)")
+
+    event_store.ensure_fresh(CALENDAR, force_refresh=True)
+    time_min, time_max = window(365)
+    clear_caches()
+    start = time.perf_counter()
+    expanded = event_store.list_events(CALENDAR, time_min, time_max)
+    cold = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(20):
+        event_store.list_events(CALENDAR, time_min, time_max)
+    warm = (time.perf_counter() - start) / 20
+    print(f"mirror year query: {cold * 1000:.2f} ms cold, {warm * 1000:.2f} ms with warm caches "
+          f"({len(expanded)} events)")
+
+    masters = [event for event in event_store.all_events(CALENDAR) if "recurrence" in event]
+    low, high = event_store.to_timestamp(time_min), event_store.to_timestamp(time_max)
+    clear_caches()
+    start = time.perf_counter()
+    count = sum(len(recurrence.instances(master, low, high)) for master in masters)
+    cold = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(20):
+        for master in masters:
+            recurrence.instances(master, low, high)
+    warm = (time.perf_counter() - start) / 20
+    print(f"expander alone:    {cold * 1000:.2f} ms cold, {warm * 1000:.2f} ms with warm caches "
+          f"({len(masters)} series, {count} instances)")
+
+    # cancel and move a few instances directly on the server, then compare all three views
+    resource = utils.setup_calendar_service().events()
+    recurring = [event for event in expanded if event.get("recurringEventId")]
+    for event in recurring[::15][:10]:
+        resource.delete(calendarId=CALENDAR, eventId=event["id"]).execute()
+    for event in recurring[7::15][:10]:
+        start = dt.datetime.fromisoformat(event["start"]["dateTime"]) + dt.timedelta(hours=2)
+        end = dt.datetime.fromisoformat(event["end"]["dateTime"]) + dt.timedelta(hours=2)
+        resource.patch(calendarId=CALENDAR, eventId=event["id"], body={
+            "start": {"dateTime": start.isoformat()}, "end": {"dateTime": end.isoformat()},
+        }).execute()
+
+    for name, days in RANGES:
+        time_min, time_max = window(days)
+        truth = keys(ai_google_calendar._fetch_events_page(CALENDAR, time_min, time_max, 2500, None, None)["items"])
+        mirror = keys(event_store.list_events(CALENDAR, time_min, time_max, force_refresh=True))
+        live = keys(ai_google_calendar._iter_live_events(CALENDAR, time_min, time_max, 250, None, prefetch=False))
+        status = "ok" if truth == mirror == live else \
+            f"MISMATCH (mirror {len(mirror ^ truth)}, live {len(live ^ truth)} differ)"
+        print(f"{name:8} after 10 cancelled and 10 moved instances: {len(truth)} events, {status}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Response cache benchmark: repeated prompts over a day, with and without the cache.
+
+Gemini is a stub with a fixed latency. A small set of prompts is repeated in
+random order, as when "pokaż wydarzenia na dziś" is asked many times a day,
+and every command goes through the two-stage classifier -> extractor path.
+The last part checks that cached relative-date answers do not outlive the date.
+
+    python benchmarks/bench_response_cache.py [commands] [llm_latency_ms]
+"""
+import io
+import os
+import sys
+import time
+import random
+import tempfile
+import contextlib
+import datetime as dt
+from unittest import mock
+
+from stubs import install
+
+import ai_router
+import ai_google_calendar
+import response_cache
+
+PROMPTS = [
+    ("list_events", "Pokaż wydarzenia na ten tydzień, proszę"),
+    ("list_events", "pokaż   wydarzenia na ten tydzień proszę!"),
+    ("list_events", "co mam w planach w ten weekend"),
+    ("add_event", "dodaj spotkanie z zespołem jutro"),
+    ("change_calendar", "przełącz na kalendarz praca"),
+]
+
+def run(client, count: int) -> tuple[float, int]:
+    rng = random.Random(7)
+    calls = client.models.calls
+    start = time.perf_counter()
+
+    for _ in range(count):
+        command, prompt = rng.choice(PROMPTS)
+        client.models.command = command
+        with contextlib.redirect_stdout(io.StringIO()):
+            ai_router.dispatch(prompt)
+
+    return (time.perf_counter() - start) * 1000 / count, client.models.calls - calls
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    latency = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.02
+
+    client, _ = install(genai_latency=latency)
+    ai_google_calendar.change_calendar_api("primary")
+    ai_router.DISPATCH_MODE = "two_stage"
+    response_cache.CACHE_FILE = os.path.join(tempfile.mkdtemp(), "response_cache.json")
+    print(f"{count} commands from {len(PROMPTS)} prompts, stubbed LLM latency: {latency * 1000:.0f} ms")
+
+    for enabled in (False, True):
+        response_cache.ENABLED = enabled
+        mean, calls = run(client, count)
+        label = "cache on" if enabled else "cache off"
+        print(f"{label:<10} mean {mean:7.2f} ms/command   LLM calls {calls:4d}")
+
+    print(f"stats: {response_cache.stats}")
+
+    tomorrow = dt.datetime.now(tz=response_cache.TZ) + dt.timedelta(days=1)
+    with mock.patch.object(response_cache.dt, "datetime", wraps=dt.datetime) as clock:
+        clock.now.return_value = tomorrow
+        misses = response_cache.stats["misses"]
+        response_cache.get(PROMPTS[0][1], "list_events", ai_router.MODEL_NAME)
+        served_stale = response_cache.stats["misses"] == misses
+    print(f"next day served from cache: {'YES (stale!)' if served_stale else 'no'}")
+    if served_stale:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Request scheduler benchmark: batch mode against APIs that fail and throttle.
+
+Every prompt of benchmarks/recorded_sessions.json is fed to batch_mode.run()
+while the local Calendar server and the replayed Gemini client answer a share
+of requests with 503 and requests over their quotas with 429. The same stream
+runs without the scheduler (one attempt, no rate limits, no fallback model)
+and with it (rate limits just under the quotas, retries, fallback). A few
+commands fail in both runs by design: repeated deletions find nothing left.
+
+    python benchmarks/bench_scheduler.py [repeats] [fault_rate] [calendar_quota] [gemini_quota]
+"""
+import io
+import os
+import sys
+import json
+import time
+import contextlib
+
+from stubs import install_replay
+
+import batch_mode
+import request_scheduler
+
+RECORDINGS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "recorded_sessions.json")
+
+CONCURRENCY = 8
+
+def configure(enabled: bool, calendar_quota: float, gemini_quota: float):
+    request_scheduler.reset()
+    request_scheduler.RATE_LIMIT_ENABLED = enabled
+    request_scheduler.MAX_ATTEMPTS = 5 if enabled else 1
+    request_scheduler.FALLBACK_MODELS = {"gemini-2.0-flash": "gemini-2.0-flash-lite"} if enabled else {}
+    request_scheduler.RATE_LIMITS = {
+        "calendar": (calendar_quota * 0.9, calendar_quota * 0.9),
+        "gemini": (gemini_quota * 0.9, gemini_quota * 0.9),
+    }
+    # a slower start than the defaults keeps the benchmark short
+    request_scheduler.BACKOFF_BASE_SECONDS = 0.05
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    fault_rate = float(sys.argv[2]) if len(sys.argv) > 2 else 0.05
+    calendar_quota = float(sys.argv[3]) if len(sys.argv) > 3 else 40
+    gemini_quota = float(sys.argv[4]) if len(sys.argv) > 4 else 20
+
+    client, server, sessions = install_replay(RECORDINGS, 0.04, 0.02, fault_rate=fault_rate,
+                                              calendar_quota=calendar_quota, gemini_quota=gemini_quota)
+    lines = [
+        json.dumps({"id": f"{repeat}-{command['intent']}", "command": command["prompt"]}, ensure_ascii=False)
+        for repeat in range(repeats)
+        for session in sessions
+        for command in session["commands"]
+    ]
+    print(f"{len(lines)} commands at concurrency {CONCURRENCY}, {fault_rate:.0%} of requests failing with 503, "
+          f"quotas: Calendar {calendar_quota:.0f}/s, Gemini {gemini_quota:.0f}/s per model")
+
+    # the warm-up builds the service, loads the calendar list and fills the mirror before faults start
+    server.fault_rate, client.models.fault_rate = 0.0, 0.0
+    configure(True, calendar_quota, gemini_quota)
+    with contextlib.redirect_stderr(io.StringIO()):
+        batch_mode.run(lines[:5], io.StringIO(), 1, "yes", "first")
+    server.fault_rate, client.models.fault_rate = fault_rate, fault_rate
+
+    for enabled in (False, True):
+        # both quotas start the run full
+        time.sleep(1.5)
+        configure(enabled, calendar_quota, gemini_quota)
+        server.requests.clear()
+        client.models.errors.clear()
+
+        output = io.StringIO()
+        start = time.perf_counter()
+        with contextlib.redirect_stderr(io.StringIO()):
+            counts = batch_mode.run(lines, output, CONCURRENCY, "yes", "first")
+        elapsed = time.perf_counter() - start
+
+        stats = request_scheduler.stats
+        print(f"{'scheduler' if enabled else 'no scheduler':12s} {len(lines) / elapsed:6.1f} commands/s   "
+              f"ok {counts['ok']}, failed {counts['failed']}, errors {counts['error']}   "
+              f"server 503/429: Calendar {server.requests['fault 503']}/{server.requests['quota 429']}, "
+              f"Gemini {client.models.errors.get(503, 0)}/{client.models.errors.get(429, 0)}   "
+              f"retries {stats['retries']}, fallbacks {stats['fallbacks']}, throttled {stats['throttled']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Benchmark: per-command cost of preparing Gemini tool configs.
+
+Compares re-reading the JSON declaration and rebuilding Tool and
+GenerateContentConfig on every command (the old behaviour) with the cached
+objects from tool_registry, and reports the one-off startup cost of loading
+and validating every declaration.
+
+    python benchmarks/bench_tool_registry.py [iterations]
+"""
+import os
+import sys
+import json
+import time
+
+import stubs  # noqa: F401  (sets up sys.path and a dummy API key)
+
+from google import genai
+
+import tool_registry
+from ai_google_calendar import CREATE_EVENT_RULES, today_header
+
+def old_config() -> genai.types.GenerateContentConfig:
+    with open(os.path.join(tool_registry.TOOLS_DIR, "google_event.json"), "r", encoding="utf-8") as file:
+        declaration = json.load(file)
+
+    tools = genai.types.Tool(function_declarations=[declaration])
+
+    return genai.types.GenerateContentConfig(
+        tools=[tools],
+        system_instruction=today_header() + CREATE_EVENT_RULES
+    )
+
+def new_config() -> genai.types.GenerateContentConfig:
+    return tool_registry.config(("create_calendar_event",), CREATE_EVENT_RULES, today_header())
+
+def measure(label: str, build, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        build()
+    per_command = (time.perf_counter() - start) / iterations * 1e6
+    print(f"{label:<30} {per_command:9.1f} µs/command")
+    return per_command
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    start = time.perf_counter()
+    tool_registry.load()
+    new_config()
+    print(f"{'registry startup (load + build)':<30} {(time.perf_counter() - start) * 1e6:9.1f} µs once")
+
+    before = measure("rebuild per command (before)", old_config, iterations)
+    after = measure("tool registry (after)", new_config, iterations)
+    print(f"{'saved':<30} {before - after:9.1f} µs/command ({before / after:.1f}x)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Tracing overhead benchmark: dispatch cost with tracing off and on, plus one sample breakdown.
+
+Gemini and Calendar are zero-latency stubs, so the per-command numbers are the
+local cost of Hermes itself and any difference is the tracing overhead.
+
+    python benchmarks/bench_tracing.py [commands]
+"""
+import io
+import os
+import sys
+import time
+import tempfile
+import contextlib
+
+from stubs import install
+
+import ai_router
+import ai_google_calendar
+import tracing
+
+COMMANDS = ["list_events", "add_event", "change_calendar"]
+
+def run(client, count: int) -> float:
+    start = time.perf_counter()
+    for i in range(count):
+        client.models.command = COMMANDS[i % len(COMMANDS)]
+        with contextlib.redirect_stdout(io.StringIO()):
+            ai_router.dispatch(f"polecenie {i}")
+    return (time.perf_counter() - start) * 1e6 / count
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 600
+
+    client, _ = install()
+    ai_google_calendar.change_calendar_api("primary")
+    run(client, 30)
+
+    tracing.configure(enabled=False)
+    disabled = run(client, count)
+
+    trace_file = os.path.join(tempfile.mkdtemp(), "trace.jsonl")
+    tracing.configure(trace_file=trace_file)
+    enabled = run(client, count)
+
+    start = time.perf_counter_ns()
+    tracing.configure(enabled=False)
+    for _ in range(100000):
+        with tracing.span("noop"):
+            pass
+    noop_ns = (time.perf_counter_ns() - start) / 100000
+
+    with open(trace_file, encoding="utf-8") as file:
+        spans = sum(1 for _ in file)
+
+    print(f"tracing off  {disabled:8.1f} µs/command   (disabled span: {noop_ns:.0f} ns)")
+    print(f"tracing on   {enabled:8.1f} µs/command   ({spans / count:.1f} spans/command written as JSONL)")
+
+    client.models.latency = 0.02
+    tracing.configure(enabled=True, trace_file="", profile=True)
+    client.models.command = "change_calendar"
+    print()
+    ai_router.dispatch("przełącz na kalendarz praca")
+
+if __name__ == "__main__":
+    main()
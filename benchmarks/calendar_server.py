@@ -0,0 +1,552 @@
+"""Local HTTP stand-in for the Google Calendar v3 endpoints Hermes uses.
+
+Implements events list/insert/get/patch/delete (with syncToken, timeMin/timeMax,
+q, orderBy, singleEvents and paging), events instances, calendarList list/get,
+calendars get, freebusy query and the multipart batch endpoint, over a generated
+in-memory dataset. Every HTTP round trip (a whole batch counts as one) waits a
+configurable latency first.
+
+Recurring events (RRULE lines only) are stored as masters; singleEvents=true
+expands them day by day, independently of Hermes' recurrence.py, and deleting
+or patching an instance id stores a cancelled or moved exception the way the
+API does.
+
+Faults can be injected: a share of requests answered 503, and a per-user quota
+of requests a second (every call of a batch counts) answered 429 rateLimitExceeded.
+
+    python benchmarks/calendar_server.py [--port 8765] [--events 500] [--latency-ms 80] [--calendars 3]
+                                         [--fault-rate 0.1] [--quota 10] [--series 20]
+
+calendar_discovery_doc(url) turns the packaged discovery document into one
+pointing at the server, so the real googleapiclient client talks to it.
+"""
+import json
+import time
+import email
+import random
+import calendar
+import argparse
+import threading
+import datetime as dt
+from collections import Counter
+from urllib.parse import urlsplit, parse_qs, unquote
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from zoneinfo import ZoneInfo
+
+from googleapiclient.discovery_cache import get_static_doc
+
+TZ_OFFSET = "+02:00"
+
+CALENDARS = [
+    {"id": "me@example.com", "summary": "Hermes", "backgroundColor": "#9fc6e7", "primary": True},
+    {"id": "work@example.com", "summary": "Praca", "backgroundColor": "#f83a22"},
+    {"id": "home@example.com", "summary": "Dom", "backgroundColor": "#7bd148"},
+]
+
+EVENT_NAMES = [
+    "Standup", "Spotkanie z zespołem", "Trening", "Lunch", "Dentysta",
+    "Planowanie sprintu", "Basen", "Kurs angielskiego", "Rozmowa z klientem", "Kino",
+]
+
+# (summary, rule, hour) of generated recurring events
+RECURRING = [
+    ("Poranny standup", "RRULE:FREQ=DAILY;BYDAY=MO,TU,WE,TH,FR", 9),
+    ("Joga", "RRULE:FREQ=WEEKLY;BYDAY=MO,WE", 18),
+    ("Basen z dziećmi", "RRULE:FREQ=WEEKLY;INTERVAL=2;BYDAY=SA", 10),
+    ("Retrospektywa", "RRULE:FREQ=MONTHLY;BYDAY=-1FR", 15),
+    ("Lekcja hiszpańskiego", "RRULE:FREQ=WEEKLY;BYDAY=TU,TH;COUNT=20", 17),
+    ("Przegląd budżetu", "RRULE:FREQ=MONTHLY;BYMONTHDAY=15", 11),
+    ("Bieganie", "RRULE:FREQ=DAILY;INTERVAL=2", 7),
+    ("Urodziny Ani", "RRULE:FREQ=YEARLY", 12),
+]
+
+SERIES_TZ = "Europe/Warsaw"
+
+# series listed with singleEvents=true and no time range are expanded this many days around today
+EXPANSION_DAYS = 365
+
+class CalendarState:
+    """Calendars and events of the fake account; seq numbers every change for syncToken."""
+
+    def __init__(self, events: int = 500, anchor: dt.date | None = None, calendars: int = len(CALENDARS),
+                 series: int = 0):
+        self.lock = threading.Lock()
+        self.seq = 0
+        # calendars beyond the three named ones are team calendars
+        extra = [
+            {"id": f"team{i}@example.com", "summary": f"Zespół {i}", "backgroundColor": "#a47ae2"}
+            for i in range(1, calendars - len(CALENDARS) + 1)
+        ]
+        self.calendars = {calendar["id"]: calendar for calendar in CALENDARS + extra}
+        self.events = {calendar_id: {} for calendar_id in self.calendars}
+
+        # events spread over eight weeks, starting a week before the anchor's Monday
+        anchor = anchor or dt.date.today()
+        first_day = anchor - dt.timedelta(days=anchor.weekday() + 7)
+        calendar_ids = list(self.calendars)
+        for i in range(events):
+            day = first_day + dt.timedelta(days=i * 56 // max(events, 1))
+            start = dt.datetime.combine(day, dt.time(8 + i % 10))
+            self.insert(calendar_ids[i % len(calendar_ids)], {
+                "summary": EVENT_NAMES[i % len(EVENT_NAMES)],
+                "start": {"dateTime": start.isoformat() + TZ_OFFSET},
+                "end": {"dateTime": (start + dt.timedelta(hours=1)).isoformat() + TZ_OFFSET},
+            })
+
+        # recurring events started during the eight weeks before the first generated day
+        zone = ZoneInfo(SERIES_TZ)
+        for i in range(series):
+            summary, rule, hour = RECURRING[i % len(RECURRING)]
+            start = dt.datetime.combine(first_day - dt.timedelta(days=(i * 7) % 56), dt.time(hour), zone)
+            self.insert(calendar_ids[i % len(calendar_ids)], {
+                "summary": summary if i < len(RECURRING) else f"{summary} {i // len(RECURRING) + 1}",
+                "start": {"dateTime": start.isoformat(), "timeZone": SERIES_TZ},
+                "end": {"dateTime": (start + dt.timedelta(hours=1)).isoformat(), "timeZone": SERIES_TZ},
+                "recurrence": [rule],
+            })
+
+    def calendar_id(self, calendar_id: str) -> str:
+        if calendar_id == "primary":
+            return CALENDARS[0]["id"]
+        return calendar_id
+
+    def insert(self, calendar_id: str, body: dict) -> dict:
+        self.seq += 1
+        event_id = body.get("id") or f"evt{self.seq}"
+        event = dict(
+            body, id=event_id, status="confirmed", seq=self.seq,
+            htmlLink=f"http://calendar.local/event?eid={event_id}",
+        )
+        self.events[calendar_id][event_id] = event
+        return event
+
+    def _expand(self, calendar_id: str, events: list[dict], time_min: dt.datetime, time_max: dt.datetime,
+                keep_cancelled: bool = False) -> list[dict]:
+        """Events as singleEvents=true lists them: every series replaced by its instances in the range."""
+        expanded = []
+        for event in events:
+            if "recurrence" not in event or event["status"] == "cancelled":
+                if event["status"] != "cancelled" or keep_cancelled:
+                    expanded.append(event)
+                continue
+            moved = {
+                _instant(other["originalStartTime"]) for other in self.events[calendar_id].values()
+                if other.get("recurringEventId") == event["id"]
+            }
+            expanded.extend(
+                instance for instance in _instances(event, time_min, time_max)
+                if _instant(instance["originalStartTime"]) not in moved
+            )
+        return expanded
+
+    def _instance(self, calendar_id: str, event_id: str) -> dict | None:
+        """The instance of a stored series an id like "<series id>_20250901T070000Z" names, if it has one."""
+        master_id, _, suffix = event_id.rpartition("_")
+        master = self.events[calendar_id].get(master_id)
+        if master is None or "recurrence" not in master or master["status"] == "cancelled" or not suffix.endswith("Z"):
+            return None
+        moment = dt.datetime.strptime(suffix, "%Y%m%dT%H%M%SZ").replace(tzinfo=dt.timezone.utc)
+        for instance in _instances(master, moment, moment + dt.timedelta(seconds=1)):
+            if instance["id"] == event_id:
+                return instance
+        return None
+
+    def list(self, calendar_id: str, query: dict) -> dict:
+        page_size = min(int(query.get("maxResults", 250)), 2500)
+        offset = int(query.get("pageToken", 0))
+        sync_token = query.get("syncToken")
+        single_events = query.get("singleEvents") == "true"
+
+        if query.get("orderBy") == "startTime" and not single_events:
+            return _error(400, "The requested ordering is not available for the particular query.", "invalid")
+
+        events = list(self.events[calendar_id].values())
+        today = dt.datetime.now(dt.timezone.utc)
+        time_min = _instant(query["timeMin"]) if "timeMin" in query else today - dt.timedelta(days=EXPANSION_DAYS)
+        time_max = _instant(query["timeMax"]) if "timeMax" in query else today + dt.timedelta(days=EXPANSION_DAYS)
+
+        if sync_token is not None:
+            if not sync_token.isdigit() or int(sync_token) > self.seq:
+                return _error(410, "Sync token is no longer valid, a full sync is required.", "fullSyncRequired")
+            events = [event for event in events if event["seq"] > int(sync_token)]
+            if single_events:
+                events = self._expand(calendar_id, events, time_min, time_max, keep_cancelled=True)
+        else:
+            if single_events:
+                events = self._expand(calendar_id, events, time_min, time_max, query.get("showDeleted") == "true")
+            elif query.get("showDeleted") != "true":
+                # cancelled instances of a series are listed anyway, as the API does
+                events = [event for event in events if event["status"] != "cancelled" or "recurringEventId" in event]
+            if "timeMin" in query:
+                events = [event for event in events if _end(event) > time_min]
+            if "timeMax" in query:
+                events = [event for event in events if _start(event) < time_max]
+            if "q" in query:
+                text = query["q"].lower()
+                events = [event for event in events if text in event.get("summary", "").lower()]
+            if query.get("orderBy") == "startTime":
+                events.sort(key=_start)
+
+        page = {"kind": "calendar#events", "items": [_public(event) for event in events[offset:offset + page_size]]}
+        if offset + page_size < len(events):
+            page["nextPageToken"] = str(offset + page_size)
+        else:
+            page["nextSyncToken"] = str(self.seq)
+        return 200, page
+
+    def free_busy(self, body: dict) -> tuple[int, dict]:
+        time_min, time_max = _instant(body["timeMin"]), _instant(body["timeMax"])
+        calendars = {}
+
+        for item in body.get("items", []):
+            calendar_id = self.calendar_id(item["id"])
+            if calendar_id not in self.calendars:
+                calendars[item["id"]] = {"busy": [], "errors": [{"domain": "global", "reason": "notFound"}]}
+                continue
+            events = self._expand(calendar_id, list(self.events[calendar_id].values()), time_min, time_max)
+            busy = sorted(
+                (max(_instant(event["start"]), time_min), min(_instant(event["end"]), time_max))
+                for event in events
+                if event.get("transparency") != "transparent"
+                and _instant(event["end"]) > time_min and _instant(event["start"]) < time_max
+            )
+            calendars[item["id"]] = {"busy": [{"start": start.isoformat(), "end": end.isoformat()} for start, end in busy]}
+
+        return 200, {"kind": "calendar#freeBusy", "timeMin": body["timeMin"], "timeMax": body["timeMax"],
+                     "calendars": calendars}
+
+    def handle(self, method: str, path: str, query: dict, body: dict | None) -> tuple[int, dict | None]:
+        """Answer one Calendar v3 request; path is relative to /calendar/v3/."""
+        parts = [unquote(part) for part in path.strip("/").split("/")]
+
+        with self.lock:
+            if parts[:2] == ["users", "me"] and parts[2:3] == ["calendarList"]:
+                if len(parts) == 3 and method == "GET":
+                    return 200, {"kind": "calendar#calendarList", "items": list(self.calendars.values())}
+                if len(parts) == 4 and method == "GET":
+                    return self._calendar(parts[3])
+
+            if parts == ["freeBusy"] and method == "POST":
+                return self.free_busy(body or {})
+
+            if parts[0] != "calendars" or len(parts) < 2:
+                return _error(404, "Not Found")
+
+            calendar_id = self.calendar_id(parts[1])
+            if calendar_id not in self.calendars:
+                return _error(404, "Not Found")
+
+            if len(parts) == 2 and method == "GET":
+                return self._calendar(calendar_id)
+            if parts[2:3] != ["events"]:
+                return _error(404, "Not Found")
+
+            if len(parts) == 3:
+                if method == "GET":
+                    return self.list(calendar_id, query)
+                if method == "POST":
+                    return 200, _public(self.insert(calendar_id, body or {}))
+                return _error(405, "Method Not Allowed")
+
+            event = self.events[calendar_id].get(parts[3]) or self._instance(calendar_id, parts[3])
+            if event is None:
+                return _error(404, "Not Found")
+            if event["status"] == "cancelled":
+                return _error(410, "Resource has been deleted", "deleted")
+
+            if parts[4:] == ["instances"] and method == "GET" and "recurrence" in event:
+                query = dict(query, singleEvents="true")
+                status, page = self.list(calendar_id, query)
+                if status == 200:
+                    page["items"] = [item for item in page["items"] if item.get("recurringEventId") == event["id"]]
+                return status, page
+
+            if method == "GET":
+                return 200, _public(event)
+            if method in ("PATCH", "PUT"):
+                self.seq += 1
+                # a changed instance becomes an exception stored next to its series
+                event = self.events[calendar_id].setdefault(event["id"], event)
+                event.update(body or {}, seq=self.seq)
+                return 200, _public(event)
+            if method == "DELETE":
+                self.seq += 1
+                # a tombstone, so incremental syncs see the deletion; a deleted instance stays an exception
+                tombstone = {"id": event["id"], "status": "cancelled", "seq": self.seq}
+                if "recurringEventId" in event:
+                    tombstone.update(recurringEventId=event["recurringEventId"],
+                                     originalStartTime=event["originalStartTime"])
+                self.events[calendar_id][event["id"]] = tombstone
+                return 204, None
+            return _error(405, "Method Not Allowed")
+
+    def _calendar(self, calendar_id: str) -> tuple[int, dict]:
+        calendar = self.calendars.get(self.calendar_id(calendar_id))
+        if calendar is None:
+            return _error(404, "Not Found")
+        return 200, calendar
+
+def _instant(value) -> dt.datetime:
+    if isinstance(value, dict):
+        value = value.get("dateTime") or value["date"] + "T00:00:00" + TZ_OFFSET
+    return dt.datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+def _start(event: dict) -> dt.datetime:
+    return _instant(event.get("start") or event["originalStartTime"])
+
+def _end(event: dict) -> dt.datetime:
+    """End of an event; a series ends with its last instance, which may never come."""
+    if "recurrence" in event:
+        rule = _rule(event)
+        if "COUNT" not in rule and "UNTIL" not in rule:
+            return dt.datetime.max.replace(tzinfo=dt.timezone.utc)
+        last = list(_instances(event, _start(event), dt.datetime.max.replace(tzinfo=dt.timezone.utc) - dt.timedelta(days=1)))
+        return _instant(last[-1]["end"]) if last else _start(event)
+    return _instant(event.get("end") or event["originalStartTime"])
+
+def _rule(master: dict) -> dict:
+    line = next(line for line in master["recurrence"] if line.startswith("RRULE:"))
+    return dict(part.split("=", 1) for part in line.removeprefix("RRULE:").split(";"))
+
+def _picked(rule: dict, day: dt.date, first: dt.date) -> bool:
+    """Whether a rule picks a day, decided for that day alone."""
+    interval = int(rule.get("INTERVAL", 1))
+    length = calendar.monthrange(day.year, day.month)[1]
+
+    if rule["FREQ"] == "DAILY":
+        period = (day - first).days
+    elif rule["FREQ"] == "WEEKLY":
+        period = ((day - dt.timedelta(days=day.weekday())) - (first - dt.timedelta(days=first.weekday()))).days // 7
+    elif rule["FREQ"] == "MONTHLY":
+        period = (day.year - first.year) * 12 + day.month - first.month
+    else:
+        period = day.year - first.year
+    if period % interval:
+        return False
+
+    if "BYMONTH" in rule and day.month not in [int(month) for month in rule["BYMONTH"].split(",")]:
+        return False
+    if "BYMONTHDAY" in rule and not any(
+        day.day == (number if number > 0 else length + number + 1)
+        for number in (int(value) for value in rule["BYMONTHDAY"].split(","))
+    ):
+        return False
+    if "BYDAY" in rule:
+        codes = ["MO", "TU", "WE", "TH", "FR", "SA", "SU"]
+        for value in rule["BYDAY"].split(","):
+            if codes.index(value[-2:]) != day.weekday():
+                continue
+            ordinal = int(value[:-2] or 0)
+            if not ordinal:
+                return True
+            if rule["FREQ"] == "YEARLY" and "BYMONTH" not in rule:
+                position, total = (day.timetuple().tm_yday - 1) // 7 + 1, 365 + calendar.isleap(day.year)
+                from_end = -((total - day.timetuple().tm_yday) // 7 + 1)
+            else:
+                position, from_end = (day.day - 1) // 7 + 1, -((length - day.day) // 7 + 1)
+            if ordinal in (position, from_end):
+                return True
+        return False
+
+    if rule["FREQ"] == "WEEKLY":
+        return day.weekday() == first.weekday()
+    if rule["FREQ"] == "MONTHLY" and "BYMONTHDAY" not in rule:
+        return day.day == first.day
+    if rule["FREQ"] == "YEARLY":
+        return "BYMONTHDAY" in rule or (day.day == first.day and ("BYMONTH" in rule or day.month == first.month))
+    return True
+
+def _instances(master: dict, time_min: dt.datetime, time_max: dt.datetime):
+    """Instances of a series overlapping [time_min, time_max), walking the days from its start."""
+    zone = ZoneInfo(master["start"].get("timeZone", SERIES_TZ))
+    start = _instant(master["start"]).astimezone(zone)
+    duration = _instant(master["end"]) - _instant(master["start"])
+    rule = _rule(master)
+    count = int(rule["COUNT"]) if "COUNT" in rule else None
+    until = None
+    if "UNTIL" in rule:
+        value = rule["UNTIL"]
+        until = (dt.datetime.strptime(value, "%Y%m%dT%H%M%SZ").replace(tzinfo=dt.timezone.utc) if value.endswith("Z")
+                 else dt.datetime.strptime(value[:8], "%Y%m%d").replace(tzinfo=zone) + dt.timedelta(days=1))
+
+    first, produced, day = start.date(), 0, start.date()
+    base = {key: value for key, value in master.items() if key not in ("recurrence", "id")}
+    while True:
+        moment = dt.datetime.combine(day, start.time().replace(tzinfo=None), zone)
+        if moment >= time_max or (count is not None and produced >= count) or (until and moment > until):
+            return
+        if day == first or _picked(rule, day, first):
+            produced += 1
+            if moment + duration > time_min:
+                utc = moment.astimezone(dt.timezone.utc)
+                field = {"dateTime": moment.isoformat(), "timeZone": zone.key}
+                yield dict(
+                    base, id=f"{master['id']}_{utc:%Y%m%dT%H%M%SZ}", start=field,
+                    end={"dateTime": (moment + duration).astimezone(zone).isoformat(), "timeZone": zone.key},
+                    recurringEventId=master["id"], originalStartTime=field,
+                )
+        day += dt.timedelta(days=1)
+
+def _public(event: dict) -> dict:
+    return {key: value for key, value in event.items() if key != "seq"}
+
+def _error(status: int, message: str, reason: str = "notFound") -> tuple[int, dict]:
+    return status, {"error": {"code": status, "message": message, "errors": [{"reason": reason, "message": message}]}}
+
+_REASONS = {
+    200: "OK", 204: "No Content", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 410: "Gone",
+    429: "Too Many Requests", 503: "Service Unavailable",
+}
+
+class Quota:
+    """Requests a second allowed to the fake user; a token bucket that refuses instead of waiting."""
+
+    def __init__(self, rate: float, burst: float | None = None):
+        self.rate = rate
+        self.capacity = burst or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+class CalendarHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self._answer()
+
+    do_POST = do_PATCH = do_PUT = do_DELETE = do_GET
+
+    def log_message(self, format, *args):
+        pass
+
+    def _answer(self):
+        server = self.server
+        length = int(self.headers.get("Content-Length", 0))
+        raw_body = self.rfile.read(length) if length else b""
+
+        time.sleep(server.latency)
+        url = urlsplit(self.path)
+
+        if server.fault_rate and server.random.random() < server.fault_rate:
+            server.requests["fault 503"] += 1
+            self._send(503, json.dumps(_error(503, "Backend Error", "backendError")[1]).encode())
+            return
+
+        if url.path.startswith("/batch"):
+            server.requests["batch"] += 1
+            content_type, payload = self._batch(raw_body)
+            self._send(200, payload, content_type)
+            return
+
+        server.requests[self.command] += 1
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        body = json.loads(raw_body) if raw_body else None
+        status, result = server.answer(self.command, url.path.removeprefix(server.prefix), query, body)
+        self._send(status, json.dumps(result).encode() if result is not None else b"")
+
+    def _batch(self, raw_body: bytes) -> tuple[str, bytes]:
+        """Run every part of a multipart/mixed batch and answer them in one multipart response."""
+        message = email.message_from_bytes(
+            b"Content-Type: " + self.headers["Content-Type"].encode() + b"\r\n\r\n" + raw_body
+        )
+        boundary = "batch_hermes_benchmark"
+        chunks = []
+
+        for part in message.get_payload():
+            head, _, body = part.get_payload().replace("\r\n", "\n").partition("\n\n")
+            method, target, _ = head.split("\n", 1)[0].split(" ", 2)
+            url = urlsplit(target)
+            query = {key: values[0] for key, values in parse_qs(url.query).items()}
+
+            self.server.requests[f"batch {method}"] += 1
+            status, result = self.server.answer(
+                method, url.path.removeprefix(self.server.prefix), query, json.loads(body) if body.strip() else None
+            )
+            content = json.dumps(result) if result is not None else ""
+            chunks.append(
+                f"--{boundary}\r\nContent-Type: application/http\r\n"
+                f"Content-ID: <response-{part['Content-ID'].strip('<>')}>\r\n\r\n"
+                f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+                f"Content-Type: application/json; charset=UTF-8\r\nContent-Length: {len(content.encode())}\r\n\r\n"
+                f"{content}\r\n"
+            )
+
+        payload = "".join(chunks) + f"--{boundary}--\r\n"
+        return f"multipart/mixed; boundary={boundary}", payload.encode()
+
+    def _send(self, status: int, payload: bytes, content_type: str = "application/json; charset=UTF-8"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+        self.server.bytes_sent += len(payload)
+
+class CalendarServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    # API paths are handed to the state relative to this prefix
+    prefix = "/calendar/v3/"
+
+    def __init__(self, port: int = 0, events: int = 500, latency: float = 0.0, anchor: dt.date | None = None,
+                 calendars: int = len(CALENDARS), fault_rate: float = 0.0, quota: float | None = None,
+                 series: int = 0):
+        super().__init__(("127.0.0.1", port), CalendarHandler)
+        self.state = CalendarState(events, anchor, calendars, series)
+        self.latency = latency
+        self.requests = Counter()
+        self.bytes_sent = 0
+        self.fault_rate = fault_rate
+        self.quota = Quota(quota) if quota else None
+        self.random = random.Random(7)
+
+    def answer(self, method: str, path: str, query: dict, body: dict | None) -> tuple[int, dict | None]:
+        """One API call, refused with 429 rateLimitExceeded when it exceeds the quota."""
+        if self.quota is not None and not self.quota.allow():
+            self.requests["quota 429"] += 1
+            return _error(429, "Rate Limit Exceeded", "rateLimitExceeded")
+        return self.state.handle(method, path, query, body)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/"
+
+    def start(self) -> "CalendarServer":
+        threading.Thread(target=self.serve_forever, name="calendar-server", daemon=True).start()
+        return self
+
+def calendar_discovery_doc(url: str) -> dict:
+    """The packaged Calendar v3 discovery document with every endpoint moved to url."""
+    doc = json.loads(get_static_doc("calendar", "v3"))
+    doc["rootUrl"] = url
+    doc["baseUrl"] = url + doc["servicePath"]
+    return doc
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Google Calendar v3 stand-in")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--events", type=int, default=500, help="generated events across all calendars")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="delay before every HTTP response")
+    parser.add_argument("--calendars", type=int, default=len(CALENDARS), help="calendars on the calendar list")
+    parser.add_argument("--fault-rate", type=float, default=0.0, help="share of requests answered 503")
+    parser.add_argument("--quota", type=float, help="API calls a second before answering 429")
+    parser.add_argument("--series", type=int, default=0, help="generated recurring events across all calendars")
+    options = parser.parse_args()
+
+    server = CalendarServer(options.port, options.events, options.latency_ms / 1000, calendars=options.calendars,
+                            fault_rate=options.fault_rate, quota=options.quota, series=options.series)
+    print(f"Calendar v3 stand-in on {server.url} ({options.events} events)")
+    server.serve_forever()
+
+if __name__ == "__main__":
+    main()
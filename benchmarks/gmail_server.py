@@ -0,0 +1,300 @@
+"""Local HTTP stand-in for the Gmail v1 endpoints Hermes uses.
+
+Implements users.getProfile, messages list (with a subset of the search
+syntax: from:, to:, subject:, label:, in:, is:unread/read/starred, after:,
+before: and plain words), get (format=metadata), send, modify and
+batchModify, labels list/create and history.list, over a generated mailbox.
+Every change is recorded in the history, so incremental syncs see it. HTTP
+handling, batch requests, latency and fault injection are those of
+calendar_server.py.
+
+    python benchmarks/gmail_server.py [--port 8766] [--messages 100000] [--latency-ms 80]
+
+gmail_discovery_doc(url) points the packaged discovery document at the server.
+"""
+import re
+import json
+import time
+import base64
+import argparse
+import threading
+import datetime as dt
+from email import message_from_bytes
+from urllib.parse import unquote
+
+from googleapiclient.discovery_cache import get_static_doc
+
+from calendar_server import CalendarServer, _error
+
+ADDRESS = "me@example.com"
+
+SYSTEM_LABELS = ["INBOX", "SENT", "UNREAD", "STARRED", "IMPORTANT", "SPAM", "TRASH", "DRAFT"]
+USER_LABELS = ["Praca", "Faktury", "Newslettery"]
+
+SENDERS = [
+    "Anna Nowak <anna.nowak@example.com>", "Jan Kowalski <jan.kowalski@example.com>",
+    "Allegro <powiadomienia@allegro.example>", "GitHub <noreply@github.example>",
+    "Bank Polski <powiadomienia@bank.example>", "Marta Wiśniewska <marta@firma.example>",
+    "Zespół HR <hr@firma.example>", "Piotr Zieliński <piotr.zielinski@example.com>",
+]
+
+SUBJECTS = [
+    ("Faktura za usługi", "W załączniku przesyłamy fakturę za bieżący miesiąc."),
+    ("Spotkanie w czwartek", "Czy pasuje Ci czwartek o 10? Mogę też po południu."),
+    ("Raport tygodniowy", "Podsumowanie postępów zespołu w tym tygodniu."),
+    ("Potwierdzenie zamówienia", "Dziękujemy za zakupy, Twoje zamówienie zostało przyjęte."),
+    ("Newsletter: nowości", "Sprawdź, co nowego przygotowaliśmy w tym miesiącu."),
+    ("Przegląd kodu", "Poprosiłem Cię o przegląd zmian w repozytorium."),
+    ("Wyjazd służbowy", "Bilety i hotel są zarezerwowane, szczegóły poniżej."),
+    ("Zaproszenie na konferencję", "Zapraszamy na doroczną konferencję branżową."),
+]
+
+# labels some messages get, by sender
+SENDER_LABELS = {2: "Faktury", 4: "Faktury", 5: "Praca", 6: "Praca", 3: "Newslettery"}
+
+_QUERY_TERM = re.compile(r'(?:(\w+):)?("[^"]*"|\S+)')
+
+class GmailState:
+    """Messages, labels and history of the fake mailbox; historyId numbers every change."""
+
+    def __init__(self, messages: int = 1000, now: float | None = None):
+        self.lock = threading.Lock()
+        self.history_id = 1000
+        # history before this id has been discarded; older startHistoryIds get 404
+        self.history_floor = self.history_id
+        self.history = []
+        self.labels = {label: {"id": label, "name": label, "type": "system"} for label in SYSTEM_LABELS}
+        for number, name in enumerate(USER_LABELS, start=1):
+            self.labels[f"Label_{number}"] = {"id": f"Label_{number}", "name": name, "type": "user"}
+        self.messages = {}
+        # ids oldest first; listings walk it backwards
+        self.order = []
+        self._listing = None
+
+        # one message every ten minutes back from now, every fifth one unread among the newest
+        now = now or time.time()
+        for i in range(messages, 0, -1):
+            self._add(self._generate(i, now - i * 600, unread=i < messages // 5 and i % 5 == 0))
+
+    def _label_id(self, name: str) -> str | None:
+        for label in self.labels.values():
+            if label["id"].lower() == name.lower() or label["name"].lower() == name.lower():
+                return label["id"]
+        return None
+
+    def _generate(self, i: int, timestamp: float, unread: bool = False) -> dict:
+        sender = i % len(SENDERS)
+        # a different stride, so every sender writes about every subject
+        subject, snippet = SUBJECTS[i * 3 // len(SENDERS) % len(SUBJECTS)]
+        labels = ["INBOX"] + (["UNREAD"] if unread else [])
+        if sender in SENDER_LABELS and i % 3 == 0:
+            labels.append(self._label_id(SENDER_LABELS[sender]))
+        return {
+            "from": SENDERS[sender], "to": ADDRESS, "subject": subject, "snippet": snippet,
+            "labelIds": labels, "internalDate": str(int(timestamp * 1000)),
+        }
+
+    def _add(self, fields: dict) -> dict:
+        self.history_id += 1
+        message_id = f"{self.history_id:012x}"
+        message = dict(fields, id=message_id, threadId=message_id, historyId=str(self.history_id))
+        self.messages[message_id] = message
+        self.order.append(message_id)
+        self._listing = None
+        self._record(messagesAdded=[{"message": _summary(message)}])
+        return message
+
+    def _record(self, **changes):
+        self.history.append(dict(changes, id=str(self.history_id)))
+
+    def deliver(self, count: int) -> list[dict]:
+        """New unread messages arriving now, e.g. between two syncs of a benchmark."""
+        with self.lock:
+            now = time.time()
+            return [self._add(self._generate(len(self.order) + i, now, unread=True)) for i in range(count)]
+
+    def modify(self, message_ids: list[str], added=(), removed=()):
+        for message_id in message_ids:
+            message = self.messages.get(message_id)
+            if message is None:
+                continue
+            self.history_id += 1
+            message["historyId"] = str(self.history_id)
+            new_added = [label for label in added if label not in message["labelIds"]]
+            new_removed = [label for label in removed if label in message["labelIds"]]
+            message["labelIds"] = [label for label in message["labelIds"] if label not in removed] + new_added
+            changes = {}
+            if new_added:
+                changes["labelsAdded"] = [{"message": _summary(message), "labelIds": new_added}]
+            if new_removed:
+                changes["labelsRemoved"] = [{"message": _summary(message), "labelIds": new_removed}]
+            self._record(**changes)
+        self._listing = None
+
+    def delete(self, message_id: str):
+        with self.lock:
+            message = self.messages.pop(message_id)
+            self.history_id += 1
+            self._listing = None
+            self._record(messagesDeleted=[{"message": _summary(message)}])
+
+    def _matches(self, message: dict, query: str) -> bool:
+        for field, value in _QUERY_TERM.findall(query):
+            value = value.strip('"').lower()
+            field = field.lower()
+            if field in ("from", "to", "subject"):
+                if value not in message[field].lower():
+                    return False
+            elif field in ("label", "in"):
+                label_id = self._label_id(value)
+                if label_id not in message["labelIds"]:
+                    return False
+            elif field == "is":
+                flags = {"unread": "UNREAD" in message["labelIds"], "read": "UNREAD" not in message["labelIds"],
+                         "starred": "STARRED" in message["labelIds"]}
+                if not flags.get(value, False):
+                    return False
+            elif field in ("after", "before"):
+                # Gmail takes both dates and seconds since the epoch
+                moment = (float(value) if value.isdigit() else dt.datetime.strptime(value, "%Y/%m/%d").timestamp()) * 1000
+                internal = int(message["internalDate"])
+                if (internal < moment) if field == "after" else (internal >= moment):
+                    return False
+            elif value not in " ".join((message["from"], message["to"], message["subject"], message["snippet"])).lower():
+                return False
+        return True
+
+    def list(self, query: dict) -> tuple[int, dict]:
+        page_size = min(int(query.get("maxResults", 100)), 500)
+        offset = int(query.get("pageToken", 0))
+        hidden = () if query.get("includeSpamTrash") == "true" else ("SPAM", "TRASH")
+
+        if self._listing is None:
+            self._listing = [
+                message_id for message_id in reversed(self.order)
+                if message_id in self.messages and not set(hidden) & set(self.messages[message_id]["labelIds"])
+            ]
+        ids = self._listing
+        if "q" in query or "labelIds" in query:
+            label_id = query.get("labelIds")
+            ids = [
+                message_id for message_id in ids
+                if self._matches(self.messages[message_id], query.get("q", ""))
+                and (label_id is None or label_id in self.messages[message_id]["labelIds"])
+            ]
+
+        page = {"messages": [_summary(self.messages[message_id], labels=False) for message_id in ids[offset:offset + page_size]],
+                "resultSizeEstimate": len(ids)}
+        if offset + page_size < len(ids):
+            page["nextPageToken"] = str(offset + page_size)
+        return 200, page
+
+    def history_list(self, query: dict) -> tuple[int, dict]:
+        start = int(query["startHistoryId"])
+        if start < self.history_floor:
+            return _error(404, "Requested entity was not found.")
+
+        page_size = min(int(query.get("maxResults", 100)), 500)
+        offset = int(query.get("pageToken", 0))
+        records = [record for record in self.history if int(record["id"]) > start]
+
+        page = {"history": records[offset:offset + page_size], "historyId": str(self.history_id)}
+        if offset + page_size < len(records):
+            page["nextPageToken"] = str(offset + page_size)
+        return 200, page
+
+    def send(self, body: dict) -> tuple[int, dict]:
+        raw = message_from_bytes(base64.urlsafe_b64decode(body["raw"] + "=" * (-len(body["raw"]) % 4)))
+        text = raw.get_payload(decode=True) or b""
+        message = self._add({
+            "from": ADDRESS, "to": raw["To"] or "", "subject": raw["Subject"] or "",
+            "snippet": text.decode("utf-8", "replace")[:100], "labelIds": ["SENT"],
+            "internalDate": str(int(time.time() * 1000)),
+        })
+        return 200, _summary(message)
+
+    def handle(self, method: str, path: str, query: dict, body: dict | None) -> tuple[int, dict | None]:
+        """Answer one Gmail v1 request; path is relative to /gmail/v1/."""
+        parts = [unquote(part) for part in path.strip("/").split("/")]
+        if parts[:2] != ["users", "me"] or len(parts) < 3:
+            return _error(404, "Not Found")
+
+        with self.lock:
+            resource, rest = parts[2], parts[3:]
+
+            if resource == "profile" and method == "GET":
+                return 200, {"emailAddress": ADDRESS, "messagesTotal": len(self.messages),
+                             "threadsTotal": len(self.messages), "historyId": str(self.history_id)}
+
+            if resource == "labels" and not rest:
+                if method == "GET":
+                    return 200, {"labels": list(self.labels.values())}
+                if method == "POST":
+                    label_id = f"Label_{len(self.labels) + 1}"
+                    self.labels[label_id] = {"id": label_id, "name": body["name"], "type": "user"}
+                    return 200, self.labels[label_id]
+
+            if resource == "history" and method == "GET":
+                return self.history_list(query)
+
+            if resource != "messages":
+                return _error(404, "Not Found")
+
+            if not rest and method == "GET":
+                return self.list(query)
+            if rest == ["batchModify"] and method == "POST":
+                self.modify(body.get("ids", []), body.get("addLabelIds", []), body.get("removeLabelIds", []))
+                return 204, None
+            if rest == ["send"] and method == "POST":
+                return self.send(body)
+
+            message = self.messages.get(rest[0]) if rest else None
+            if message is None:
+                return _error(404, "Requested entity was not found.")
+            if len(rest) == 1 and method == "GET":
+                return 200, _metadata(message)
+            if rest[1:] == ["modify"] and method == "POST":
+                self.modify([message["id"]], body.get("addLabelIds", []), body.get("removeLabelIds", []))
+                return 200, _summary(message)
+            return _error(405, "Method Not Allowed")
+
+def _summary(message: dict, labels: bool = True) -> dict:
+    summary = {"id": message["id"], "threadId": message["threadId"]}
+    if labels:
+        summary["labelIds"] = list(message["labelIds"])
+    return summary
+
+def _metadata(message: dict) -> dict:
+    headers = [{"name": "From", "value": message["from"]}, {"name": "To", "value": message["to"]},
+               {"name": "Subject", "value": message["subject"]}]
+    return dict(_summary(message), snippet=message["snippet"], historyId=message["historyId"],
+                internalDate=message["internalDate"], sizeEstimate=2048, payload={"headers": headers})
+
+class GmailServer(CalendarServer):
+    prefix = "/gmail/v1/"
+
+    def __init__(self, port: int = 0, messages: int = 1000, latency: float = 0.0, fault_rate: float = 0.0,
+                 quota: float | None = None):
+        super().__init__(port, events=0, latency=latency, fault_rate=fault_rate, quota=quota)
+        self.state = GmailState(messages)
+
+def gmail_discovery_doc(url: str) -> dict:
+    """The packaged Gmail v1 discovery document with every endpoint moved to url."""
+    doc = json.loads(get_static_doc("gmail", "v1"))
+    doc["rootUrl"] = url
+    doc["baseUrl"] = url + doc["servicePath"]
+    return doc
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Gmail v1 stand-in")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--messages", type=int, default=1000, help="generated messages in the mailbox")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="delay before every HTTP response")
+    options = parser.parse_args()
+
+    server = GmailServer(options.port, options.messages, options.latency_ms / 1000)
+    print(f"Gmail v1 stand-in on {server.url} ({options.messages} messages)")
+    server.serve_forever()
+
+if __name__ == "__main__":
+    main()
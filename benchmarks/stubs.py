@@ -0,0 +1,393 @@
+"""Offline stand-ins for the Gemini client and the Google Calendar service used by the benchmarks."""
+import os
+import re
+import sys
+import json
+import time
+import types
+import random
+import asyncio
+import threading
+import collections
+import datetime as dt
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+os.environ.setdefault("HERMES_EVENT_DB", ":memory:")
+os.environ.setdefault("HERMES_MAIL_DB", ":memory:")
+# repeated benchmark prompts would otherwise be answered from the response cache
+os.environ.setdefault("HERMES_RESPONSE_CACHE_ENABLED", "0")
+# benchmarks measure the code, not the client-side rate limits
+os.environ.setdefault("HERMES_RATE_LIMIT_ENABLED", "0")
+
+from google import genai
+
+TZ_OFFSET = "+02:00"
+
+def function_call_response(name: str, args: dict) -> genai.types.GenerateContentResponse:
+    part = genai.types.Part(function_call=genai.types.FunctionCall(name=name, args=args))
+    return genai.types.GenerateContentResponse(
+        candidates=[genai.types.Candidate(content=genai.types.Content(role="model", parts=[part]))]
+    )
+
+def text_response(text: str) -> genai.types.GenerateContentResponse:
+    return genai.types.GenerateContentResponse(
+        candidates=[genai.types.Candidate(
+            content=genai.types.Content(role="model", parts=[genai.types.Part(text=text)])
+        )]
+    )
+
+# command -> (classifier answer, extractor function_call name, extractor args)
+SCRIPTED_COMMANDS = {
+    "list_events": ("list_events", "get_event_interval", {
+        "timeMin": f"2025-09-01T00:00:00{TZ_OFFSET}",
+        "timeMax": f"2025-09-07T23:59:00{TZ_OFFSET}",
+    }),
+    "add_event": ("add_event", "create_calendar_event", {
+        "summary": "Spotkanie",
+        "start": {"dateTime": f"2025-09-02T10:00:00{TZ_OFFSET}", "timeZone": "Europe/Warsaw"},
+        "end": {"dateTime": f"2025-09-02T11:00:00{TZ_OFFSET}", "timeZone": "Europe/Warsaw"},
+    }),
+    "change_calendar": ("change_calendar", "change_calendar", {"calendarId": "work@example.com"}),
+}
+
+class FakeModels:
+    """Answers generate_content like Gemini would for the scripted command, after a fixed latency."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.command = "list_events"
+        self.calls = 0
+
+    def generate_content(self, model, contents, config=None, **kwargs):
+        time.sleep(self.latency)
+        return self.answer(config)
+
+    def answer(self, config):
+        self.calls += 1
+
+        label, name, args = SCRIPTED_COMMANDS[self.command]
+        tools = config.tools if config is not None else None
+
+        if not tools:
+            if "classifier" in (config.system_instruction or ""):
+                return text_response(label)
+            return text_response(args["calendarId"])
+        return function_call_response(name, dict(args))
+
+class FakeAsyncModels:
+    """client.aio.models: the same scripted answers, awaiting the latency instead of blocking."""
+
+    def __init__(self, models: FakeModels):
+        self.models = models
+
+    async def generate_content(self, model, contents, config=None, **kwargs):
+        await asyncio.sleep(self.models.latency)
+        return self.models.answer(config)
+
+class FakeGenaiClient:
+    def __init__(self, latency: float = 0.0):
+        self.models = FakeModels(latency)
+        self.aio = types.SimpleNamespace(models=FakeAsyncModels(self.models))
+
+_ISO_DATE = re.compile(r"^\d{4}-\d{2}-\d{2}")
+
+def _shift_dates(value, days: int):
+    """Move every ISO date in recorded arguments by whole days, keeping the rest of the string."""
+    if isinstance(value, dict):
+        return {key: _shift_dates(item, days) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_shift_dates(item, days) for item in value]
+    if isinstance(value, str) and _ISO_DATE.match(value):
+        day = dt.date.fromisoformat(value[:10]) + dt.timedelta(days=days)
+        return day.isoformat() + value[10:]
+    return value
+
+def load_recordings(path: str) -> tuple[list[dict], int]:
+    """Sessions of a recording file and the whole-week shift moving their dates to the current week.
+
+    Shifting by weeks keeps "w środę" on a Wednesday, so recorded answers stay
+    consistent with the locally resolved dates and the generated server data.
+    """
+    with open(path, encoding="utf-8") as file:
+        recording = json.load(file)
+
+    recorded_on = dt.date.fromisoformat(recording["recorded_on"])
+    return recording["sessions"], (dt.date.today() - recorded_on).days // 7 * 7
+
+class ReplayModels:
+    """Answers generate_content with the recorded Gemini response for the newest user turn."""
+
+    def __init__(self, sessions: list[dict], shift_days: int = 0, latency: float = 0.0):
+        self.latency = latency
+        self.calls = 0
+        self.recordings = {
+            command["prompt"]: command
+            for session in sessions
+            for command in session["commands"]
+        }
+        self.shift_days = shift_days
+
+    def generate_content(self, model, contents, config=None, **kwargs):
+        time.sleep(self.latency)
+        return self.answer(contents, config)
+
+    def answer(self, contents, config):
+        self.calls += 1
+
+        prompt = contents if isinstance(contents, str) else contents[-1].parts[0].text
+        command = self.recordings.get(prompt)
+        if command is None:
+            raise LookupError(f"no recorded Gemini answer for {prompt!r}")
+
+        function_call = command.get("function_call")
+        if function_call is None:
+            raise LookupError(f"{prompt!r} was recorded as resolved locally, but reached Gemini")
+
+        instruction = (config.system_instruction or "") if config is not None else ""
+        if config is not None and config.tools:
+            response = function_call_response(function_call["name"], _shift_dates(function_call["args"], self.shift_days))
+        elif "classifier" in instruction:
+            response = text_response(command["intent"])
+        elif "calendar name" in instruction:
+            response = text_response(function_call["args"].get("calendarId", "not_found"))
+        else:
+            response = text_response("no_color")
+
+        if isinstance(contents, str):
+            prompt_tokens = len(contents) // 4
+        else:
+            prompt_tokens = sum(len(part.text or "") for content in contents for part in content.parts) // 4
+        output_tokens = command.get("output_tokens", 20)
+        response.usage_metadata = genai.types.GenerateContentResponseUsageMetadata(
+            prompt_token_count=prompt_tokens,
+            candidates_token_count=output_tokens,
+            total_token_count=prompt_tokens + output_tokens,
+        )
+        return response
+
+class ReplayAsyncModels(FakeAsyncModels):
+    async def generate_content(self, model, contents, config=None, **kwargs):
+        await asyncio.sleep(self.models.latency)
+        return self.models.answer(contents, config)
+
+class ReplayGenaiClient:
+    """genai.Client stand-in replaying a recording file instead of calling Gemini."""
+
+    def __init__(self, sessions: list[dict], shift_days: int = 0, latency: float = 0.0):
+        self.models = ReplayModels(sessions, shift_days, latency)
+        self.aio = types.SimpleNamespace(models=ReplayAsyncModels(self.models))
+
+class FaultyModels:
+    """Wraps models so that a share of calls fails with 503 and calls over a per-model quota with 429."""
+
+    def __init__(self, models, fault_rate: float = 0.0, quota: float | None = None, seed: int = 7):
+        from calendar_server import Quota
+
+        self.models = models
+        self.fault_rate = fault_rate
+        self.quotas = collections.defaultdict(lambda: Quota(quota))
+        self.quota = quota
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.errors = {}
+
+    def check(self, model: str):
+        with self.lock:
+            if self.fault_rate and self.random.random() < self.fault_rate:
+                self.errors[503] = self.errors.get(503, 0) + 1
+                raise genai.errors.ServerError(503, {"error": {"code": 503, "message": "The model is overloaded.",
+                                                               "status": "UNAVAILABLE"}})
+            if self.quota and not self.quotas[model].allow():
+                self.errors[429] = self.errors.get(429, 0) + 1
+                raise genai.errors.ClientError(429, {"error": {"code": 429, "message": "Resource exhausted.",
+                                                               "status": "RESOURCE_EXHAUSTED"}})
+
+    def generate_content(self, model, contents, config=None, **kwargs):
+        self.check(model)
+        return self.models.generate_content(model=model, contents=contents, config=config, **kwargs)
+
+class FaultyAsyncModels:
+    def __init__(self, faulty: FaultyModels, models):
+        self.faulty = faulty
+        self.models = models
+
+    async def generate_content(self, model, contents, config=None, **kwargs):
+        self.faulty.check(model)
+        return await self.models.generate_content(model=model, contents=contents, config=config, **kwargs)
+
+class FaultyGenaiClient:
+    """genai.Client stand-in injecting Gemini's overload and quota errors into another stand-in."""
+
+    def __init__(self, client, fault_rate: float = 0.0, quota: float | None = None):
+        self.models = FaultyModels(client.models, fault_rate, quota)
+        self.aio = types.SimpleNamespace(models=FaultyAsyncModels(self.models, client.aio.models))
+
+class _Request:
+    def __init__(self, service, result):
+        self.service = service
+        self.result = result
+
+    def execute(self, **kwargs):
+        time.sleep(self.service.latency)
+        self.service.requests += 1
+        return self.result
+
+class _Events:
+    def __init__(self, service):
+        self.service = service
+
+    def list(self, maxResults=250, pageToken=None, **kwargs):
+        offset = int(pageToken or 0)
+        page = {"items": self.service.items[offset:offset + maxResults]}
+        if offset + maxResults < len(self.service.items):
+            page["nextPageToken"] = str(offset + maxResults)
+        return _Request(self.service, page)
+
+    def insert(self, calendarId, body, **kwargs):
+        self.service.created += 1
+        event_id = f"created{self.service.created}"
+        event = dict(body, id=event_id, htmlLink=f"https://calendar.local/{event_id}")
+        self.service.items.append(event)
+        return _Request(self.service, event)
+
+    def delete(self, calendarId, eventId, **kwargs):
+        self.service.items = [event for event in self.service.items if event["id"] != eventId]
+        return _Request(self.service, "")
+
+    def patch(self, calendarId, eventId, body, **kwargs):
+        for event in self.service.items:
+            if event["id"] == eventId:
+                event.update(body)
+                return _Request(self.service, dict(event))
+        return _Request(self.service, dict(body, id=eventId))
+
+class _Batch:
+    """new_batch_http_request(): every added request answered in a single round trip."""
+
+    def __init__(self, service, callback):
+        self.service = service
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, request_id=None):
+        self.requests.append((request_id, request))
+
+    def execute(self):
+        time.sleep(self.service.latency)
+        self.service.requests += 1
+        for request_id, request in self.requests:
+            self.callback(request_id, request.result, None)
+
+class _CalendarList:
+    def __init__(self, service):
+        self.service = service
+
+    def list(self, **kwargs):
+        return _Request(self.service, {"items": self.service.calendars})
+
+    def get(self, calendarId, **kwargs):
+        return _Request(self.service, self.service.calendars[0])
+
+def _instant(value: str) -> dt.datetime:
+    return dt.datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+class _FreeBusy:
+    def __init__(self, service):
+        self.service = service
+
+    def query(self, body, **kwargs):
+        time_min, time_max = _instant(body["timeMin"]), _instant(body["timeMax"])
+        busy = [
+            {"start": event["start"]["dateTime"], "end": event["end"]["dateTime"]}
+            for event in self.service.items
+            if "dateTime" in event["start"]
+            and _instant(event["end"]["dateTime"]) > time_min and _instant(event["start"]["dateTime"]) < time_max
+        ]
+        return _Request(self.service, {"calendars": {item["id"]: {"busy": busy} for item in body["items"]}})
+
+class FakeCalendarService:
+    """In-memory replacement of the discovery-built Calendar v3 client."""
+
+    def __init__(self, latency: float = 0.0, events: int = 5):
+        self.latency = latency
+        self.requests = 0
+        self.created = 0
+        self.calendars = [
+            {"id": "me@example.com", "summary": "Hermes", "backgroundColor": "#9fc6e7", "primary": True},
+            {"id": "work@example.com", "summary": "Praca", "backgroundColor": "#f83a22"},
+        ]
+        start = dt.datetime(2025, 9, 1, 8, 0)
+        self.items = [
+            {
+                "id": f"event{i}",
+                "summary": f"Spotkanie {i}",
+                "start": {"dateTime": (start + dt.timedelta(hours=i)).isoformat() + TZ_OFFSET},
+                "end": {"dateTime": (start + dt.timedelta(hours=i + 1)).isoformat() + TZ_OFFSET},
+            }
+            for i in range(events)
+        ]
+
+    def events(self):
+        return _Events(self)
+
+    def calendarList(self):
+        return _CalendarList(self)
+
+    def freebusy(self):
+        return _FreeBusy(self)
+
+    def new_batch_http_request(self, callback=None):
+        return _Batch(self, callback)
+
+def install(genai_latency: float = 0.0, calendar_latency: float = 0.0, events: int = 5):
+    """Point every module that talks to Gemini or Calendar at the stand-ins."""
+    import ai_google_calendar
+    import calendar_batch
+    import calendar_cache
+    import event_store
+    import utils
+
+    client = FakeGenaiClient(genai_latency)
+    service = FakeCalendarService(calendar_latency, events)
+
+    utils._genai_client = client
+    ai_google_calendar.setup_calendar_service = lambda: service
+    calendar_batch.setup_calendar_service = lambda: service
+    calendar_cache.setup_calendar_service = lambda: service
+    event_store.setup_calendar_service = lambda: service
+
+    return client, service
+
+def install_replay(recordings: str, genai_latency: float = 0.0, calendar_latency: float = 0.0, events: int = 500,
+                   calendars: int = 3, fault_rate: float = 0.0, calendar_quota: float | None = None,
+                   gemini_quota: float | None = None, messages: int = 1000, series: int = 0):
+    """Run the real Calendar and Gmail clients against calendar_server.py and gmail_server.py, and
+    Gemini from recorded sessions.
+
+    Unlike install(), googleapiclient, httplib2 and batch requests stay in the
+    path; only credentials and the discovery documents' endpoints are replaced.
+    With fault_rate or a quota, the Calendar server and Gemini answer a share
+    of requests with 503 and requests over the quota (calls a second) with 429.
+    The Gmail server is server.gmail.
+    """
+    from google.auth.credentials import AnonymousCredentials
+
+    import utils
+    from calendar_server import CalendarServer, calendar_discovery_doc
+    from gmail_server import GmailServer, gmail_discovery_doc
+
+    server = CalendarServer(events=events, latency=calendar_latency, calendars=calendars, fault_rate=fault_rate,
+                            quota=calendar_quota, series=series).start()
+    utils._discovery_docs[("calendar", "v3")] = calendar_discovery_doc(server.url)
+    server.gmail = GmailServer(messages=messages, latency=calendar_latency).start()
+    utils._discovery_docs[("gmail", "v1")] = gmail_discovery_doc(server.gmail.url)
+    utils._creds = AnonymousCredentials()
+
+    sessions, shift_days = load_recordings(recordings)
+    client = ReplayGenaiClient(sessions, shift_days, genai_latency)
+    if fault_rate or gemini_quota:
+        client = FaultyGenaiClient(client, fault_rate, gemini_quota)
+    utils._genai_client = client
+
+    return client, server, sessions
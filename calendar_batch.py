@@ -0,0 +1,121 @@
+import time
+
+import event_store
+import request_scheduler
+from utils import setup_calendar_service
+
+# the Calendar API accepts at most 50 calls in one batch request
+BATCH_LIMIT = 50
+
+def _error_message(exception: Exception) -> str:
+    code = request_scheduler.status(exception)
+    if code is not None and hasattr(exception, "reason"):
+        return f"HTTP {code}: {exception.reason}"
+    return str(exception)
+
+def execute(service, requests: list[tuple[object, object]], api: str = "calendar",
+            limit: int = BATCH_LIMIT) -> list[dict]:
+    """Send (item, HttpRequest) pairs of any Google API service in batches of limit calls.
+
+    Returns one {"item", "ok", "result", "error"} dict per pair, in order. A
+    failed item does not stop the others; a failed batch marks only the items
+    it had not answered yet as failed. Calls answered with a retryable error
+    (e.g. 429 rateLimitExceeded) are sent again in a smaller batch after a backoff;
+    inserts only when the error shows they were not carried out.
+    """
+    results = []
+
+    for offset in range(0, len(requests), limit):
+        chunk = requests[offset:offset + limit]
+        answers = {}
+        pending = list(range(len(chunk)))
+
+        for attempt in range(request_scheduler.MAX_ATTEMPTS):
+            def callback(request_id, response, exception, answers=answers):
+                answers[int(request_id)] = (response, exception)
+
+            batch = service.new_batch_http_request(callback=callback)
+            for index in pending:
+                batch.add(chunk[index][1], request_id=str(index))
+
+            try:
+                batch.execute()
+            except Exception as e:
+                for index in pending:
+                    answers.setdefault(index, (None, e))
+                break
+
+            pending = [
+                index for index in pending
+                if answers.get(index, (None, None))[1] is not None
+                and request_scheduler.is_retryable_request(chunk[index][1].method, answers[index][1])
+            ]
+            if not pending:
+                break
+            delay = request_scheduler.retry_delay(
+                api, answers[pending[0]][1], attempt, request_scheduler.MAX_ATTEMPTS,
+                lambda error: request_scheduler.is_retryable_request(chunk[pending[0]][1].method, error)
+            )
+            if delay is None:
+                break
+            for index in pending:
+                del answers[index]
+            time.sleep(delay)
+
+        for index, (item, _) in enumerate(chunk):
+            response, exception = answers.get(index, (None, RuntimeError("brak odpowiedzi w paczce")))
+            results.append({
+                "item": item,
+                "ok": exception is None,
+                "result": response,
+                "error": None if exception is None else _error_message(exception),
+            })
+
+    return results
+
+def create_events(calendar_id: str, events: list[dict]) -> list[dict]:
+    """Insert many events with batched events().insert calls and mirror the created ones."""
+    service = setup_calendar_service()
+    requests = [(event, service.events().insert(calendarId=calendar_id, body=event)) for event in events]
+
+    results = execute(service, requests)
+    for result in results:
+        if result["ok"]:
+            event_store.upsert(calendar_id, result["result"])
+    return results
+
+def delete_events(calendar_id: str, events: list[dict]) -> list[dict]:
+    """Delete many events with batched events().delete calls.
+
+    An event that is already gone (404/410) counts as deleted.
+    """
+    service = setup_calendar_service()
+    requests = [(event, service.events().delete(calendarId=calendar_id, eventId=event["id"])) for event in events]
+
+    results = execute(service, requests)
+    for result in results:
+        if not result["ok"] and result["error"].startswith(("HTTP 404", "HTTP 410")):
+            result["ok"], result["error"] = True, None
+        if result["ok"]:
+            event_store.remove(calendar_id, result["item"])
+    return results
+
+def update_events(calendar_id: str, changes: list[tuple[dict, dict]]) -> list[dict]:
+    """Patch many events, given as (event, changed fields), with batched events().patch calls."""
+    service = setup_calendar_service()
+    requests = [
+        (event, service.events().patch(calendarId=calendar_id, eventId=event["id"], body=body))
+        for event, body in changes
+    ]
+
+    results = execute(service, requests)
+    for result in results:
+        if result["ok"]:
+            event_store.upsert(calendar_id, result["result"])
+    return results
+
+def query_free_busy(bodies: list[dict]) -> list[dict]:
+    """Run many freebusy().query requests, given as request bodies, in batched round trips."""
+    service = setup_calendar_service()
+    requests = [(body, service.freebusy().query(body=body)) for body in bodies]
+    return execute(service, requests)
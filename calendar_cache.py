@@ -0,0 +1,132 @@
+import sys
+import time
+import threading
+
+from utils import setup_calendar_service, hex_to_rgb
+
+CACHE_TTL_SECONDS = 600
+
+PROMPT_SUFFIX = " 💬 Wpisz swoje polecenie: "
+
+ANSI_RESET = "\033[0m"
+
+_calendars = {}
+_loaded_at = None
+_lock = threading.Lock()
+_refresh_thread = None
+
+def _build_entry(calendar: dict) -> dict:
+    """Keep only the fields needed by the REPL and precompute the colored prompt prefix."""
+    summary = calendar.get("summary", calendar["id"])
+    bg_color = calendar.get("backgroundColor")
+
+    if bg_color:
+        r, g, b = hex_to_rgb(bg_color)
+        ansi_prefix = f"\033[38;2;{r};{g};{b}m[{summary}] {ANSI_RESET}"
+    else:
+        ansi_prefix = f"[{summary}] "
+
+    return {
+        "id": calendar["id"],
+        "summary": summary,
+        "backgroundColor": bg_color,
+        "primary": calendar.get("primary", False),
+        "ansi_prefix": ansi_prefix,
+    }
+
+def refresh():
+    """Reload metadata of all calendars with a single paginated calendarList().list()."""
+    global _calendars, _loaded_at
+
+    service = setup_calendar_service()
+    calendars = {}
+    page_token = None
+
+    while True:
+        result = service.calendarList().list(
+            pageToken=page_token,
+            fields="items(id,summary,backgroundColor,primary),nextPageToken"
+        ).execute()
+
+        for calendar in result.get("items", []):
+            entry = _build_entry(calendar)
+            calendars[entry["id"]] = entry
+            if entry["primary"]:
+                calendars["primary"] = entry
+
+        page_token = result.get("nextPageToken")
+        if not page_token:
+            break
+
+    with _lock:
+        _calendars = calendars
+        _loaded_at = time.monotonic()
+
+def _refresh_in_background():
+    global _refresh_thread
+
+    def run():
+        try:
+            refresh()
+        except Exception as e:
+            print(f"⚠️ Nie udało się odświeżyć listy kalendarzy: {e}")
+
+    with _lock:
+        if _refresh_thread is not None and _refresh_thread.is_alive():
+            return
+        _refresh_thread = threading.Thread(target=run, daemon=True)
+        _refresh_thread.start()
+
+def is_stale() -> bool:
+    return _loaded_at is None or time.monotonic() - _loaded_at > CACHE_TTL_SECONDS
+
+def invalidate():
+    """Mark the cache as stale; the next read triggers a background refresh."""
+    global _loaded_at
+
+    with _lock:
+        if _calendars:
+            _loaded_at = float("-inf")
+
+def get_calendar(calendar_id: str) -> dict | None:
+    """Return cached metadata for a calendar id ("primary" is accepted as an alias).
+
+    Only the very first read, or a read of an unknown id, blocks on the network.
+    Stale entries are served immediately while a refresh runs in the background.
+    """
+    if not _calendars or calendar_id not in _calendars:
+        refresh()
+    elif is_stale():
+        _refresh_in_background()
+
+    return _calendars.get(calendar_id)
+
+def all_calendars() -> list[dict]:
+    """Return metadata of every calendar on the user's calendar list."""
+    if not _calendars:
+        refresh()
+    elif is_stale():
+        _refresh_in_background()
+
+    return [entry for key, entry in _calendars.items() if key != "primary"]
+
+def prompt(calendar_id: str) -> str:
+    """Render the REPL prompt for a calendar without any I/O once the cache is warm."""
+    entry = _calendars.get(calendar_id) or get_calendar(calendar_id)
+
+    if is_stale():
+        _refresh_in_background()
+
+    if entry is None:
+        return f"[{calendar_id}]{PROMPT_SUFFIX}"
+    return f"{entry['ansi_prefix']}{PROMPT_SUFFIX}"
+
+def label(calendar_id: str) -> str:
+    """The "[name] " tag of a calendar, in the calendar's color when stdout is a terminal."""
+    entry = _calendars.get(calendar_id) or get_calendar(calendar_id)
+
+    if entry is None:
+        return f"[{calendar_id}] "
+    if sys.stdout.isatty():
+        return entry["ansi_prefix"]
+    return f"[{entry['summary']}] "
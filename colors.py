@@ -0,0 +1,132 @@
+import os
+import json
+import threading
+from collections import OrderedDict
+
+from utils import fold_text
+
+# canonical name, Google Calendar colorId, Google's own name, Polish stems and synonyms
+COLORS = [
+    ("red", "11", "tomato", ["czerwon", "czerwien", "karmazyn", "pomidor"]),
+    ("green", "2", "sage", ["zielon", "zielen", "szalwi"]),
+    ("blue", "9", "blueberry", ["niebiesk", "granat", "modr", "chabr", "borowk"]),
+    ("purple", "3", "grape", ["fiolet", "purpur", "winogron", "sliwk", "violet"]),
+    ("yellow", "5", "banana", ["zolt", "zolc", "banan", "cytryn"]),
+    ("orange", "6", "tangerine", ["pomarancz", "mandaryn", "oranz"]),
+    ("turquoise", "7", "peacock", ["turkus", "morsk", "cyjan", "cyan", "teal"]),
+    ("gray", "8", "graphite", ["szar", "grafit", "popiel", "grey", "srebrn"]),
+    ("light blue", "1", "lavender", ["jasnoniebiesk", "blekit", "lawend", "jasny niebiesk", "jasnoblekit"]),
+    ("light green", "10", "basil", ["jasnozielon", "jasny zielon", "bazyli", "limonk", "mietow"]),
+    ("pink", "4", "flamingo", ["rozow", "flaming", "malinow", "fuksj", "magent"]),
+]
+
+COLOR_MAP = {name: color_id for name, color_id, _, _ in COLORS}
+
+DEFAULT_COLOR = "blue"
+
+# the mapping as it is spelled out in the event extraction instructions
+COLOR_RULES = "".join(f'- {name} → "{color_id}"\n' for name, color_id, _, _ in COLORS)
+
+COLOR_NAMES = ", ".join(COLOR_MAP)
+
+# folded full names -> canonical name, used for exact and edit-distance matching
+_KNOWN_NAMES = {}
+for _name, _, _google_name, _ in COLORS:
+    _KNOWN_NAMES[_name] = _name
+    _KNOWN_NAMES[_name.replace(" ", "")] = _name
+    _KNOWN_NAMES[_google_name] = _name
+_KNOWN_NAMES["grey"] = "gray"
+_KNOWN_NAMES["light grey"] = "gray"
+_KNOWN_NAMES["violet"] = "purple"
+_KNOWN_NAMES["roz"] = "pink"
+
+# Polish adjective stems, longest first so "jasnoniebiesk" wins over "niebiesk"
+_STEMS = sorted(
+    ((stem, name) for name, _, _, stems in COLORS for stem in stems),
+    key=lambda item: -len(item[0])
+)
+
+CACHE_FILE = os.getenv("HERMES_COLOR_CACHE", "color_cache.json")
+
+CACHE_SIZE = 256
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def _edit_distance(a: str, b: str) -> int:
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, start=1):
+        current = [i]
+        for j, char_b in enumerate(b, start=1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        previous = current
+    return previous[-1]
+
+def normalize_color(text: str) -> str | None:
+    """Map a color given in Polish or English (synonyms, typos) to a COLOR_MAP name without any LLM."""
+    text = " ".join(fold_text(text).replace("-", " ").split())
+    if not text:
+        return None
+
+    if text in _KNOWN_NAMES:
+        return _KNOWN_NAMES[text]
+
+    for stem, name in _STEMS:
+        if text.replace(" ", "").startswith(stem.replace(" ", "")):
+            return name
+
+    best, best_distance = None, 3
+    for known, name in _KNOWN_NAMES.items():
+        distance = _edit_distance(text, known)
+        if distance < best_distance and distance <= max(1, len(known) // 3):
+            best, best_distance = name, distance
+    return best
+
+def _load_cache() -> OrderedDict:
+    global _cache
+
+    if _cache is None:
+        _cache = OrderedDict()
+        if os.path.exists(CACHE_FILE):
+            try:
+                with open(CACHE_FILE, "r", encoding="utf-8") as file:
+                    _cache.update(json.load(file))
+            except (OSError, ValueError):
+                pass
+    return _cache
+
+def _save_cache():
+    with open(CACHE_FILE, "w", encoding="utf-8") as file:
+        json.dump(_cache, file, ensure_ascii=False)
+
+def resolve_color(text: str, ask_llm) -> str | None:
+    """Resolve a user color to a COLOR_MAP name, or None if it is not supported.
+
+    Local rules are tried first, then the persistent LRU cache of earlier LLM
+    answers; only unknown inputs reach ask_llm(text), which must return a
+    COLOR_MAP name or "no_color". Resolved colors are cached for later
+    sessions; "no_color" is not, as it may come from a bad or empty reply.
+    """
+    local = normalize_color(text)
+    if local:
+        return local
+
+    key = " ".join(fold_text(text).split())
+
+    with _cache_lock:
+        cache = _load_cache()
+        if key in cache:
+            cache.move_to_end(key)
+            return cache[key]
+
+    answer = ask_llm(text).strip().lower()
+    if answer not in COLOR_MAP:
+        return None
+
+    with _cache_lock:
+        cache[key] = answer
+        while len(cache) > CACHE_SIZE:
+            cache.popitem(last=False)
+        _save_cache()
+
+    return answer
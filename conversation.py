@@ -0,0 +1,131 @@
+import threading
+from collections import deque
+
+# turns kept verbatim; older ones are folded into the summary entry
+MAX_TURNS = 20
+
+# default prompt budget for the history part of one request
+TOKEN_BUDGET = 120
+
+# upper bound for the summary of older turns
+SUMMARY_TOKENS = 40
+
+SUMMARY_PREFIX = "Wcześniejsze polecenia użytkownika (skrót): "
+
+def estimate_tokens(text: str) -> int:
+    """Cheap offline token estimate (~4 characters per token for Gemini tokenizers)."""
+    return max(1, (len(text) + 3) // 4)
+
+class ConversationHistory:
+    """Bounded, token-aware history of user turns.
+
+    Turns live in a ring buffer of MAX_TURNS entries, each tagged with the
+    intent it was handled by, so extractors can ask for their own turns only.
+    Turns falling out of the ring are optionally folded into one compact
+    summary entry of at most SUMMARY_TOKENS, keeping memory constant however
+    long the session runs.
+    """
+
+    def __init__(self, max_turns: int = MAX_TURNS, token_budget: int = TOKEN_BUDGET, summarize: bool = True):
+        self.token_budget = token_budget
+        self.summarize = summarize
+        self.summary = ""
+        self.stats = {"calls": 0, "tokens_sent": 0, "history_tokens": 0, "by_intent": {}}
+        self._turns = deque(maxlen=max_turns)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._turns)
+
+    def add(self, text: str, intent: str | None = None):
+        """Record a user turn; repeating the latest turn only updates its intent tag.
+
+        This lets the classifier and the extractor of one command both call add()
+        without storing the prompt twice.
+        """
+        with self._lock:
+            if self._turns and self._turns[-1]["text"] == text:
+                if intent is not None:
+                    self._turns[-1]["intent"] = intent
+                return
+
+            if len(self._turns) == self._turns.maxlen:
+                self._fold(self._turns[0]["text"])
+
+            self._turns.append({"text": text, "intent": intent, "tokens": estimate_tokens(text)})
+
+    @property
+    def latest_intent(self) -> str | None:
+        """Intent the newest turn was handled by, None before classification."""
+        with self._lock:
+            return self._turns[-1]["intent"] if self._turns else None
+
+    def _fold(self, text: str):
+        if not self.summarize:
+            return
+        summary = f"{self.summary}; {text}" if self.summary else text
+        # keep the most recent part when the summary outgrows its budget
+        max_chars = SUMMARY_TOKENS * 4
+        if len(summary) > max_chars:
+            summary = "…" + summary[-(max_chars - 1):]
+        self.summary = summary
+
+    def contents(self, intent: str | None = None, token_budget: int | None = None) -> list:
+        """Newest turns (of one intent, or all) that fit the token budget, oldest first.
+
+        The latest turn is always included, whatever its intent or size.
+        """
+        budget = self.token_budget if token_budget is None else token_budget
+
+        with self._lock:
+            turns = list(self._turns)
+            summary = self.summary
+
+        selected = []
+        used = 0
+        for position, turn in enumerate(reversed(turns)):
+            if position > 0 and intent is not None and turn["intent"] != intent:
+                continue
+            if position > 0 and used + turn["tokens"] > budget:
+                break
+            selected.append(turn["text"])
+            used += turn["tokens"]
+
+        if summary and used + estimate_tokens(summary) <= budget:
+            selected.append(SUMMARY_PREFIX + summary)
+
+        from google.genai import types
+
+        return [
+            types.Content(role="user", parts=[types.Part.from_text(text=text)])
+            for text in reversed(selected)
+        ]
+
+    def count_call(self, intent: str, contents: list, config=None, response=None):
+        """Add one Gemini call to the sent-token counters.
+
+        Gemini's own prompt_token_count is used when the response carries usage
+        metadata; otherwise the prompt is estimated locally.
+        """
+        history_tokens = sum(estimate_tokens(part.text or "") for content in contents for part in content.parts)
+        instruction = getattr(config, "system_instruction", None) or ""
+        tokens = history_tokens + (estimate_tokens(instruction) if instruction else 0)
+
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None and usage.prompt_token_count:
+            tokens = usage.prompt_token_count
+
+        with self._lock:
+            self.stats["calls"] += 1
+            self.stats["tokens_sent"] += tokens
+            self.stats["history_tokens"] += history_tokens
+            by_intent = self.stats["by_intent"].setdefault(intent, {"calls": 0, "tokens_sent": 0})
+            by_intent["calls"] += 1
+            by_intent["tokens_sent"] += tokens
+
+    def clear(self):
+        with self._lock:
+            self._turns.clear()
+            self.summary = ""
+
+history = ConversationHistory()
@@ -0,0 +1,256 @@
+"""Long-running Hermes process serving commands to hermes_client.py over a local socket.
+
+The Gemini and Google clients, the calendar list, the response cache, the
+event mirror and the rate limits stay warm between commands and are shared
+by every connection. Each connection has a session of its own (current
+calendar and conversation history), or a named one kept across connections.
+
+The protocol is JSON lines. The client opens with {"session": name or null,
+"tty": bool} and gets {"prompt": ...}. On a TCP port, which only loopback
+addresses may use, the opening message must also carry the "token" written
+to hermes_client.TOKEN_FILE. Then, for every {"command": text}, the
+daemon sends {"output": line} for each printed line and {"ask": question} for
+each question, answered with {"answer": text or null}, and ends with
+{"status": "ok" | "failed" | "error", "duration_ms": ..., "prompt": ...}.
+"""
+import io
+import os
+import hmac
+import json
+import time
+import socket
+import secrets
+import ipaddress
+import threading
+import socketserver
+from collections import OrderedDict
+
+import async_core
+import batch_mode
+import calendar_cache
+import event_store
+import request_scheduler
+import response_cache
+import session
+import utils
+from ai_router import dispatch_async
+from conversation import ConversationHistory
+from hermes_client import DEFAULT_ADDRESS, TOKEN_FILE, parse_address
+
+# named sessions kept for clients that reconnect; the least recently used ones are forgotten beyond this
+MAX_SESSIONS = 256
+
+# a question unanswered for this long cancels its command, so it does not hold its thread forever
+ASK_TIMEOUT_SECONDS = 300
+
+_sessions = OrderedDict()
+_sessions_lock = threading.Lock()
+
+def _new_session() -> tuple[session.Session, threading.Lock]:
+    """A session starting in the daemon's calendar, and the lock running its commands one at a time."""
+    current = session.Session(calendar=dict(session.default.calendar), conversation=ConversationHistory())
+    return current, threading.Lock()
+
+def _named_session(name: str) -> tuple[session.Session, threading.Lock]:
+    with _sessions_lock:
+        entry = _sessions.pop(name, None) or _new_session()
+        _sessions[name] = entry
+        while len(_sessions) > MAX_SESSIONS:
+            _sessions.popitem(last=False)
+        return entry
+
+async def _dispatch(current: session.Session, command: str):
+    with session.use(current):
+        await dispatch_async(command)
+
+class _Output(io.TextIOBase):
+    """print() of a command, sent to its client line by line."""
+
+    def __init__(self, handler: "_Handler", tty: bool):
+        self.handler = handler
+        self.tty = tty
+        self.pending = ""
+        self.failed = False
+        self.lock = threading.Lock()
+
+    def write(self, text: str) -> int:
+        with self.lock:
+            *lines, self.pending = (self.pending + text).split("\n")
+        for line in lines:
+            self.failed |= line.startswith(batch_mode.FAILURE_MARKS)
+            self.handler.send({"output": line})
+        return len(text)
+
+    def finish(self):
+        """Send a last line printed without a newline."""
+        with self.lock:
+            line, self.pending = self.pending, ""
+        if line:
+            self.write(line + "\n")
+
+    def isatty(self) -> bool:
+        return self.tty
+
+class _Handler(socketserver.StreamRequestHandler):
+    """One client connection: its session, and its commands run one after another."""
+
+    def setup(self):
+        super().setup()
+        self.send_lock = threading.Lock()
+        self.closed = False
+        self.output = None
+
+    def send(self, message: dict):
+        # output of a command whose client went away is dropped; its questions end it instead
+        if self.closed:
+            return
+        try:
+            with self.send_lock:
+                self.wfile.write((json.dumps(message, ensure_ascii=False) + "\n").encode())
+                self.wfile.flush()
+        except OSError:
+            self.closed = True
+
+    def ask(self, question: str) -> str:
+        """Session.prompt of the connection: ask the client and wait for its answer."""
+        self.output.finish()
+        self.send({"ask": question})
+        try:
+            self.connection.settimeout(ASK_TIMEOUT_SECONDS)
+            line = self.rfile.readline()
+        except OSError:
+            line = b""
+        finally:
+            self.connection.settimeout(None)
+
+        answer = json.loads(line).get("answer") if line.strip() else None
+        if answer is None:
+            raise EOFError("Brak odpowiedzi klienta.")
+        return answer
+
+    def run(self, current: session.Session, command: str, tty: bool) -> dict:
+        self.output = _Output(self, tty)
+        current.output, current.prompt = self.output, self.ask
+        status = "ok"
+        start = time.perf_counter()
+
+        try:
+            async_core.run(_dispatch(current, command))
+        except request_scheduler.DeadlineExceeded as e:
+            status = "failed"
+            self.output.write(f"⏱️ Polecenie przekroczyło limit czasu: {e}\n")
+        except EOFError:
+            status = "error"
+            self.output.write("❎ Polecenie przerwane: brak odpowiedzi na pytanie.\n")
+        except Exception as e:
+            status = "error"
+            self.output.write(f"❌ Nie udało się wykonać polecenia: {e}\n")
+        finally:
+            self.output.finish()
+            current.output, current.prompt = None, None
+
+        return {
+            "status": "failed" if status == "ok" and self.output.failed else status,
+            "duration_ms": round((time.perf_counter() - start) * 1000, 1),
+            "prompt": calendar_cache.prompt(current.calendar["id"]),
+        }
+
+    def handle(self):
+        current, lock, tty = None, None, False
+        token = getattr(self.server, "token", None)
+
+        for line in self.rfile:
+            try:
+                message = json.loads(line)
+            except ValueError as e:
+                self.send({"status": "error", "error": f"Niepoprawny JSON: {e}"})
+                continue
+
+            if token is not None:
+                if not hmac.compare_digest(str(message.get("token", "")), token):
+                    self.send({"status": "error", "error": "Nieprawidłowy token demona."})
+                    return
+                token = None
+
+            if current is None or "session" in message:
+                current, lock = _named_session(message["session"]) if message.get("session") else _new_session()
+                tty = bool(message.get("tty", tty))
+            if "command" not in message:
+                self.send({"prompt": calendar_cache.prompt(current.calendar["id"])})
+                continue
+
+            with lock:
+                self.send(self.run(current, str(message["command"]), tty))
+
+def _remove_stale_socket(path: str):
+    """Delete a socket file left by a daemon that did not shut down cleanly; refuse to replace a live one."""
+    if not os.path.exists(path):
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except OSError:
+        os.remove(path)
+    else:
+        raise RuntimeError(f"Demon Hermesa już nasłuchuje na {path}")
+    finally:
+        probe.close()
+
+def _write_token() -> str:
+    """A new secret for TCP clients, in TOKEN_FILE readable by its owner only."""
+    token = secrets.token_urlsafe(32)
+    descriptor = os.open(TOKEN_FILE, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(descriptor, "w", encoding="utf-8") as file:
+        file.write(token)
+    os.chmod(TOKEN_FILE, 0o600)
+    return token
+
+def start(address: str = DEFAULT_ADDRESS) -> socketserver.BaseServer:
+    """Listen on a Unix socket path (readable by the owner only) or a loopback "host:port", serving on a
+    background thread. TCP clients must send the token written to TOKEN_FILE."""
+    family, target = parse_address(address)
+
+    if family == socket.AF_INET:
+        if not ipaddress.ip_address(socket.gethostbyname(target[0])).is_loopback:
+            raise ValueError(f"Demon Hermesa nasłuchuje tylko na adresach lokalnych, nie na {target[0]}")
+        server = socketserver.ThreadingTCPServer(target, _Handler, bind_and_activate=False)
+        server.allow_reuse_address = True
+        server.server_bind()
+        server.token = _write_token()
+    else:
+        _remove_stale_socket(target)
+        server = socketserver.ThreadingUnixStreamServer(target, _Handler, bind_and_activate=False)
+        server.server_bind()
+        os.chmod(target, 0o600)
+    server.daemon_threads = True
+    server.server_activate()
+
+    threading.Thread(target=server.serve_forever, name="hermes-daemon", daemon=True).start()
+    return server
+
+def stop(server: socketserver.BaseServer):
+    server.shutdown()
+    server.server_close()
+    if isinstance(server.server_address, str) and os.path.exists(server.server_address):
+        os.remove(server.server_address)
+
+def run(address: str = DEFAULT_ADDRESS):
+    """Warm everything up, then serve commands until interrupted."""
+    with session.redirect_stdout():
+        utils.get_genai_client()
+        calendar_cache.all_calendars()
+        if event_store.ENABLED:
+            event_store.ensure_fresh(session.default.calendar["id"])
+
+        server = start(address)
+        print(f"🛰️ Hermes nasłuchuje na {address} (klient: python hermes_client.py)")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            stop(server)
+
+    stats = response_cache.stats
+    print(f"♻️ Pamięć podręczna odpowiedzi: {stats['hits']} trafień, {stats['misses']} chybień")
+    print("👋 Demon zatrzymany.")
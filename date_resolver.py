@@ -0,0 +1,263 @@
+import re
+import datetime as dt
+from zoneinfo import ZoneInfo
+
+from utils import fold_text
+
+TZ = ZoneInfo("Europe/Warsaw")
+
+MONTHS = {
+    "stycznia": 1, "styczen": 1,
+    "lutego": 2, "luty": 2,
+    "marca": 3, "marzec": 3,
+    "kwietnia": 4, "kwiecien": 4,
+    "maja": 5, "maj": 5,
+    "czerwca": 6, "czerwiec": 6,
+    "lipca": 7, "lipiec": 7,
+    "sierpnia": 8, "sierpien": 8,
+    "wrzesnia": 9, "wrzesien": 9,
+    "pazdziernika": 10, "pazdziernik": 10,
+    "listopada": 11, "listopad": 11,
+    "grudnia": 12, "grudzien": 12,
+}
+
+# "w maju": a whole month, which no rule below resolves, so such phrases go to Gemini
+MONTH_LOCATIVES = {
+    "styczniu": 1, "lutym": 2, "marcu": 3, "kwietniu": 4, "maju": 5, "czerwcu": 6,
+    "lipcu": 7, "sierpniu": 8, "wrzesniu": 9, "pazdzierniku": 10, "listopadzie": 11, "grudniu": 12,
+}
+
+WEEKDAYS = {
+    "poniedzialek": 0, "wtorek": 1, "srode": 2, "sroda": 2, "czwartek": 3,
+    "piatek": 4, "sobote": 5, "sobota": 5, "niedziele": 6, "niedziela": 6,
+}
+
+RELATIVE_DAYS = {"dzisiaj": 0, "dzis": 0, "jutro": 1, "pojutrze": 2, "wczoraj": -1}
+
+_MONTH = "|".join(sorted(MONTHS, key=len, reverse=True))
+_WEEKDAY = "|".join(sorted(WEEKDAYS, key=len, reverse=True))
+
+# a single calendar day: "1 wrzesnia [2025]", "01.09[.2025]", "2025-09-01"
+_DAY = (
+    rf"(?:(?P<{{p}}d>\d{{{{1,2}}}})\s+(?P<{{p}}m>{_MONTH})(?:\s+(?P<{{p}}y>\d{{{{4}}}}))?"
+    rf"|(?P<{{p}}dd>\d{{{{1,2}}}})\.(?P<{{p}}mm>\d{{{{1,2}}}})(?:\.(?P<{{p}}yy>\d{{{{4}}}}))?"
+    rf"|(?P<{{p}}iy>\d{{{{4}}}})-(?P<{{p}}im>\d{{{{2}}}})-(?P<{{p}}id>\d{{{{2}}}}))"
+)
+
+_PATTERNS = [
+    ("range_same_month", re.compile(
+        rf"\bod\s+(?P<d1>\d{{1,2}})\s+do\s+(?P<d2>\d{{1,2}})\s+(?P<m>{_MONTH})(?:\s+(?P<y>\d{{4}}))?\b"
+    )),
+    ("range", re.compile(rf"\bod\s+{_DAY.format(p='a')}\s+do\s+{_DAY.format(p='b')}(?!\S)")),
+    ("relative_day", re.compile(r"\b(?P<word>dzisiaj|dzis|jutro|pojutrze|wczoraj)\b")),
+    ("this_week", re.compile(r"\b(?:ten|tym|tego|biezacy|biezacym)\s+tygodni(?:u|a|em)?\b|\bten\s+tydzien\b")),
+    ("next_week", re.compile(
+        r"\b(?:przyszly|przyszlym|przyszlego|nastepny|nastepnym|nastepnego)\s+(?:tydzien|tygodni(?:u|a|em)?)\b"
+    )),
+    ("this_month", re.compile(r"\b(?:ten|tym|tego|biezacy|biezacym)\s+miesi(?:ac|acu|aca)\b")),
+    ("next_month", re.compile(
+        r"\b(?:przyszly|przyszlym|przyszlego|nastepny|nastepnym|nastepnego)\s+miesi(?:ac|acu|aca)\b"
+    )),
+    ("weekday", re.compile(rf"\b(?:w|we)\s+(?P<wd>{_WEEKDAY})\b")),
+    ("single_day", re.compile(rf"(?<!\S){_DAY.format(p='s')}(?!\S)")),
+]
+
+# words that mean the phrase carries more time information than the rules above understand,
+# month names included: outside "1 maja"-style dates they name a whole month
+_UNSURE = re.compile(
+    r"\d|\b(?:za|po|przed|okolo|rano|wieczor\w*|poludni\w*|godz\w*|weekend\w*|rok\w*|roku"
+    r"|dni|dnia|tydzien|tygodni\w*|miesi\w*|kwarta\w*|ostatni\w*|poprzedni\w*|zeszl\w*"
+    rf"|{'|'.join(sorted({*MONTHS, *MONTH_LOCATIVES}, key=len, reverse=True))})\b"
+)
+
+LIST_VERBS = re.compile(
+    r"^(?:pokaz|wyswietl|wypisz|wylistuj|sprawdz|jakie|co\s+mam|lista|plan|wydarzenia)\b"
+)
+
+DELETE_VERBS = re.compile(r"^(?:usun|skasuj|wykasuj|anuluj)\b")
+
+_LIST_FILLER = {
+    "pokaz", "wyswietl", "wypisz", "wylistuj", "sprawdz", "jakie", "co", "mam", "lista", "plan",
+    "mi", "moje", "wszystkie", "wydarzenia", "wydarzen", "spotkania", "spotkan", "kalendarz",
+    "w", "we", "na", "z", "i", "sa", "jest", "zaplanowane", "nadchodzace", "planowane", "prosze",
+}
+
+_DELETE_FILLER = {"usun", "skasuj", "wykasuj", "anuluj", "wydarzenie", "prosze", "mi", "moje"}
+
+# "usuń wszystkie ..." removes every match instead of asking for one
+_DELETE_ALL = {"wszystkie", "wszystkich", "kazde", "kazdy"}
+
+# "ze wszystkich kalendarzy" lists every calendar instead of the current one
+_ALL_CALENDARS = re.compile(
+    r"\b(?:(?:ze|z|we|w)\s+)?wszystkich\s+kalendarz(?:y|ach)\b|\bwszystkie\s+kalendarze\b"
+)
+
+_NAME_TAIL = re.compile(r"(?:\s+(?:w|we|na|z|ze|od|do|o|u|dla))+$", re.IGNORECASE)
+
+# leftovers such as "to" or "go" are not event names
+MIN_NAME_LETTERS = 3
+
+# commands about e-mail are never calendar commands, whatever dates they mention
+_MAIL_WORDS = re.compile(r"\b(?:e-?mail\w*|mail\w*|wiadomos\w*|poczt\w*|skrzynk\w*|folder\w*|etykiet\w*)")
+
+# "odśwież [i] pokaż ..." syncs the event mirror before the command instead of trusting a recent copy
+_REFRESH = re.compile(r"^\s*od[sś]wie[zż]\b[\s,:;.!-]*(?:i\s+)?", re.IGNORECASE)
+
+def split_refresh(text: str) -> tuple[str, bool]:
+    """The command without a leading "odśwież", and whether it had one."""
+    match = _REFRESH.match(text)
+    return (text[match.end():], True) if match else (text, False)
+
+def normalize(text: str) -> str:
+    """Lowercase, fold Polish diacritics and collapse whitespace."""
+    return " ".join(re.sub(r"[,;!?]", " ", fold_text(text)).split()).rstrip(".")
+
+def _now(today: dt.datetime | None) -> dt.datetime:
+    return today.astimezone(TZ) if today else dt.datetime.now(tz=TZ)
+
+def _day(groups: dict, prefix: str, today: dt.date) -> dt.date:
+    if groups.get(prefix + "d"):
+        day, month, year = groups[prefix + "d"], MONTHS[groups[prefix + "m"]], groups[prefix + "y"]
+    elif groups.get(prefix + "dd"):
+        day, month, year = groups[prefix + "dd"], int(groups[prefix + "mm"]), groups[prefix + "yy"]
+    else:
+        day, month, year = groups[prefix + "id"], int(groups[prefix + "im"]), groups[prefix + "iy"]
+    return dt.date(int(year) if year else today.year, month, int(day))
+
+def _month_bounds(year: int, month: int) -> tuple[dt.date, dt.date]:
+    first = dt.date(year, month, 1)
+    next_first = dt.date(year + month // 12, month % 12 + 1, 1)
+    return first, next_first - dt.timedelta(days=1)
+
+def _interval(kind: str, groups: dict, today: dt.date) -> tuple[dt.date, dt.date]:
+    if kind == "relative_day":
+        day = today + dt.timedelta(days=RELATIVE_DAYS[groups["word"]])
+        return day, day
+    if kind in ("this_week", "next_week"):
+        monday = today - dt.timedelta(days=today.weekday())
+        if kind == "next_week":
+            monday += dt.timedelta(days=7)
+        return monday, monday + dt.timedelta(days=6)
+    if kind == "this_month":
+        return _month_bounds(today.year, today.month)
+    if kind == "next_month":
+        return _month_bounds(today.year + today.month // 12, today.month % 12 + 1)
+    if kind == "weekday":
+        day = today + dt.timedelta(days=(WEEKDAYS[groups["wd"]] - today.weekday()) % 7)
+        return day, day
+    if kind == "range_same_month":
+        year = int(groups["y"]) if groups["y"] else today.year
+        month = MONTHS[groups["m"]]
+        return dt.date(year, month, int(groups["d1"])), dt.date(year, month, int(groups["d2"]))
+    if kind == "range":
+        start, end = _day(groups, "a", today), _day(groups, "b", today)
+        if end < start and not (groups.get("by") or groups.get("byy") or groups.get("biy")):
+            end = end.replace(year=end.year + 1)
+        return start, end
+    day = _day(groups, "s", today)
+    return day, day
+
+def _find(text: str, today: dt.date) -> tuple[tuple[dt.date, dt.date], str] | None:
+    """Find exactly one date expression; return its interval and the text without it."""
+    for kind, pattern in _PATTERNS:
+        found = list(pattern.finditer(text))
+        if not found:
+            continue
+        if len(found) > 1:
+            return None
+        match = found[0]
+        try:
+            interval = _interval(kind, match.groupdict(), today)
+        except (ValueError, KeyError):
+            return None
+        if interval[1] < interval[0]:
+            return None
+        rest = " ".join((text[:match.start()] + " " + text[match.end():]).split())
+        # a second, different date expression means the phrase is not a simple one
+        if _UNSURE.search(rest) or any(p.search(rest) for _, p in _PATTERNS):
+            return None
+        return interval, rest
+    return None
+
+def _as_args(interval: tuple[dt.date, dt.date]) -> dict:
+    start = dt.datetime.combine(interval[0], dt.time(0, 0), tzinfo=TZ)
+    end = dt.datetime.combine(interval[1], dt.time(23, 59, 59), tzinfo=TZ)
+    return {"timeMin": start.isoformat(), "timeMax": end.isoformat()}
+
+def resolve_interval(text: str, today: dt.datetime | None = None) -> dict | None:
+    """Resolve a list-events phrase to {"timeMin", "timeMax"}, or None when Gemini is needed.
+
+    A phrase naming all calendars adds "allCalendars": True.
+    """
+    normalized = normalize(text)
+    all_calendars = _ALL_CALENDARS.search(normalized)
+    if all_calendars:
+        normalized = " ".join((normalized[:all_calendars.start()] + " " + normalized[all_calendars.end():]).split())
+
+    found = _find(normalized, _now(today).date())
+    if found is None:
+        return None
+
+    interval, rest = found
+    if any(word not in _LIST_FILLER for word in rest.split()):
+        return None
+
+    if all_calendars:
+        return {**_as_args(interval), "allCalendars": True}
+    return _as_args(interval)
+
+def resolve_delete(text: str, today: dt.datetime | None = None) -> dict | None:
+    """Resolve "usuń <name> <date>" to delete_event args, or None when Gemini is needed.
+
+    Without a date the current week is searched, as in the extraction prompt.
+    """
+    original = " ".join(re.sub(r"[,;!?]", " ", text).split()).rstrip(".")
+    normalized = normalize(original)
+    if not DELETE_VERBS.match(normalized) or len(normalized) != len(original):
+        return None
+
+    now = _now(today).date()
+    found = _find(normalized, now)
+
+    if found is None:
+        if _UNSURE.search(normalized) or any(p.search(normalized) for _, p in _PATTERNS):
+            return None
+        interval, span = _interval("this_week", {}, now), (len(normalized), len(normalized))
+    else:
+        interval = found[0]
+        match = next(m for _, p in _PATTERNS for m in p.finditer(normalized))
+        span = match.span()
+        if normalized[span[1]:].strip():
+            return None
+
+    # normalize() keeps character positions for single-space text, so slice the original
+    words = original[:span[0]].split()
+    delete_all = False
+    while words and normalize(words[0]) in _DELETE_FILLER | _DELETE_ALL:
+        delete_all = delete_all or normalize(words[0]) in _DELETE_ALL
+        words.pop(0)
+    name = _NAME_TAIL.sub("", " ".join(words)).strip(" '\"„”")
+
+    if len(normalize(name).replace(" ", "")) < MIN_NAME_LETTERS:
+        return None
+
+    if delete_all:
+        return {"eventName": name, **_as_args(interval), "deleteAll": True}
+    return {"eventName": name, **_as_args(interval)}
+
+def resolve_command(text: str, today: dt.datetime | None = None) -> tuple[str, dict] | None:
+    """Recognise unambiguous list/delete commands locally, without any LLM call."""
+    normalized = normalize(text)
+    if _MAIL_WORDS.search(normalized):
+        return None
+
+    if LIST_VERBS.match(normalized):
+        args = resolve_interval(text, today)
+        if args:
+            return "list_events", args
+    elif DELETE_VERBS.match(normalized):
+        args = resolve_delete(text, today)
+        if args:
+            return "remove_event", args
+
+    return None
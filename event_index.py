@@ -0,0 +1,335 @@
+import re
+import math
+import heapq
+from bisect import bisect_left, insort
+from collections import defaultdict
+
+import event_store
+import tracing
+from utils import fold_text
+
+# minimum trigram similarity (Dice) between a query word and a title word
+MIN_WORD_SIMILARITY = 0.45
+
+# share of the significant query words a title must match to be returned
+MIN_COVERAGE = 0.5
+
+# shorter words ("z", "na", "u") carry no meaning for name lookups
+MIN_WORD_LENGTH = 3
+
+# similarity every word needs in a strict match, which decides what "delete all" may delete
+STRICT_WORD_SIMILARITY = 0.6
+
+_indexes = {}
+
+# changes are delivered while event_store holds its lock, so the index shares it
+_lock = event_store.lock
+
+def normalize_summary(text: str) -> str:
+    """Fold case and diacritics and keep only letters and digits."""
+    return " ".join(re.sub(r"[^\w]+", " ", fold_text(text)).split())
+
+def trigrams(word: str) -> frozenset[str]:
+    """Trigrams of a word padded like pg_trgm, so the stem weighs more than the ending."""
+    padded = f"  {word} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+def _significant(words: list[str]) -> list[str]:
+    long_words = [word for word in words if len(word) >= MIN_WORD_LENGTH]
+    return long_words or words
+
+def similarity(first: str, second: str) -> float:
+    """Trigram similarity (Dice) of two words."""
+    first, second = trigrams(first), trigrams(second)
+    return 2 * len(first & second) / (len(first) + len(second))
+
+def matches_strictly(query: str, summary: str) -> bool:
+    """Whether a summary names what query does, not just something sharing a word with it.
+
+    Either one contains the other as whole words, or every significant word
+    of one of them closely matches a word of the other, so inflections and
+    small typos pass ("zajęcia jogi" and "Joga") but "spotkania standup" and
+    "Spotkanie z klientem" do not.
+    """
+    query, summary = normalize_summary(query), normalize_summary(summary)
+    if not query or not summary:
+        return False
+    if f" {query} " in f" {summary} " or f" {summary} " in f" {query} ":
+        return True
+
+    query_words, title_words = _significant(query.split()), _significant(summary.split())
+
+    def covered(words: list[str], others: list[str]) -> bool:
+        return all(max(similarity(word, other) for other in others) >= STRICT_WORD_SIMILARITY for word in words)
+
+    return covered(query_words, title_words) or covered(title_words, query_words)
+
+class EventIndex:
+    """In-memory two-level index over event summaries with ranked fuzzy lookup.
+
+    Title words go into a trigram index over the vocabulary, which stays small
+    even for huge calendars, so typos and Polish inflections ("spotkania" vs
+    "spotkanie") are resolved against distinct words only. Every word then
+    points to the titles containing it. Events sharing a normalized title
+    (e.g. moved instances of a series) share one document, kept sorted by
+    start time. A recurring event is indexed once, as its master; expand
+    (master, time_min, time_max) turns it into the instances of a searched
+    interval.
+    """
+
+    def __init__(self, events=(), expand=None):
+        self._word_ids = {}
+        self._word_grams = {}
+        self._gram_words = defaultdict(set)
+        self._word_docs = defaultdict(set)
+        self._doc_by_text = {}
+        self._doc_words = {}
+        self._doc_events = defaultdict(list)
+        self._doc_span = defaultdict(float)
+        self._doc_series = defaultdict(dict)
+        self._events = {}
+        self._next_id = 0
+        self._expand = expand
+
+        for event in events:
+            self.add(event)
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    def _word_id(self, word: str) -> int:
+        word_id = self._word_ids.get(word)
+        if word_id is None:
+            word_id = self._word_ids[word] = self._next_id
+            self._next_id += 1
+            grams = self._word_grams[word_id] = trigrams(word)
+            for gram in grams:
+                self._gram_words[gram].add(word_id)
+        return word_id
+
+    def _drop_word(self, word: str):
+        word_id = self._word_ids.pop(word)
+        del self._word_docs[word_id]
+        for gram in self._word_grams.pop(word_id):
+            words = self._gram_words[gram]
+            words.discard(word_id)
+            if not words:
+                del self._gram_words[gram]
+
+    def add(self, event: dict):
+        """Index a new event or re-index a changed one."""
+        if event["id"] in self._events:
+            self.remove(event["id"])
+
+        text = normalize_summary(event.get("summary", ""))
+        doc = self._doc_by_text.get(text)
+
+        if doc is None:
+            doc = self._doc_by_text[text] = self._next_id
+            self._next_id += 1
+            word_ids = frozenset(self._word_id(word) for word in text.split())
+            self._doc_words[doc] = word_ids
+            for word_id in word_ids:
+                self._word_docs[word_id].add(doc)
+
+        start = event["start"].get("dateTime", event["start"].get("date"))
+        end = event.get("end", event["start"])
+        end = end.get("dateTime", end.get("date"))
+        start, end = event_store.to_timestamp(start), event_store.to_timestamp(end)
+
+        if "recurrence" in event:
+            self._doc_series[doc][event["id"]] = event
+        else:
+            insort(self._doc_events[doc], (start, event["id"]))
+            self._doc_span[doc] = max(self._doc_span[doc], end - start)
+        self._events[event["id"]] = (doc, start, end, event, text)
+
+    def remove(self, event_id: str):
+        entry = self._events.pop(event_id, None)
+        if entry is None:
+            return
+
+        doc, start, event, text = entry[0], entry[1], entry[3], entry[4]
+        if "recurrence" in event:
+            del self._doc_series[doc][event_id]
+        else:
+            doc_events = self._doc_events[doc]
+            del doc_events[bisect_left(doc_events, (start, event_id))]
+
+        if not self._doc_events.get(doc) and not self._doc_series.get(doc):
+            self._doc_events.pop(doc, None)
+            self._doc_series.pop(doc, None)
+            self._doc_span.pop(doc, None)
+            del self._doc_by_text[text]
+            for word_id in self._doc_words.pop(doc):
+                docs = self._word_docs[word_id]
+                docs.discard(doc)
+                if not docs:
+                    word = next(word for word in text.split() if self._word_ids.get(word) == word_id)
+                    self._drop_word(word)
+
+    def similar_words(self, word: str) -> dict[int, float]:
+        """Vocabulary words resembling word, with their trigram similarity."""
+        exact = self._word_ids.get(word)
+        if exact is not None and len(word) < MIN_WORD_LENGTH:
+            return {exact: 1.0}
+
+        grams = trigrams(word)
+        # a word reaching MIN_WORD_SIMILARITY shares at least this many trigrams with the query
+        needed = max(1, math.ceil(MIN_WORD_SIMILARITY * len(grams) / (2 - MIN_WORD_SIMILARITY)))
+        rarest = sorted(grams, key=lambda gram: len(self._gram_words.get(gram, ())))
+        candidates = set().union(*(self._gram_words.get(gram, ()) for gram in rarest[:len(grams) - needed + 1]))
+
+        similar = {}
+        for word_id in candidates:
+            word_grams = self._word_grams[word_id]
+            similarity = 2 * len(grams & word_grams) / (len(grams) + len(word_grams))
+            if similarity >= MIN_WORD_SIMILARITY:
+                similar[word_id] = similarity
+        return similar
+
+    def search(self, query: str, limit: int | None = 10, time_min: float | None = None,
+               time_max: float | None = None) -> list[tuple[float, dict]]:
+        """Rank events whose summary resembles query, best match first."""
+        return self.expand(self.candidates(query, limit, time_min, time_max), limit, time_min, time_max)
+
+    def candidates(self, query: str, limit: int | None = 10, time_min: float | None = None,
+                   time_max: float | None = None) -> list[tuple[float, list[tuple[float, dict]], list[dict]]]:
+        """Titles resembling query, best first, as (score, their single events in the interval, their series).
+
+        Titles are ranked by how many query words they match, then by the mean
+        word similarity. Every query word is resolved to its similar vocabulary
+        words; combinations of those are visited best-first, each one being a
+        single set intersection, and the search stops as soon as limit single
+        events in the interval are found (a series may have no instance there).
+        Only this step reads the index; expand() may then run without its lock.
+        """
+        words = _significant(normalize_summary(query).split())
+        if not words:
+            return []
+
+        # per query word: (similarity, titles) options, best first, ending with "not matched"
+        options = []
+        for word in words:
+            similar = sorted(self.similar_words(word).items(), key=lambda item: -item[1])
+            options.append([(similarity, self._word_docs[word_id]) for word_id, similarity in similar] + [(0.0, None)])
+
+        needed = max(1, math.ceil(MIN_COVERAGE * len(words)))
+
+        def key(combination):
+            chosen = [options[i][j] for i, j in enumerate(combination)]
+            matched = sum(docs is not None for _, docs in chosen)
+            return (-matched, -sum(similarity for similarity, _ in chosen) / len(words)), chosen
+
+        start = (0,) * len(words)
+        heap = [(key(start)[0], start)]
+        visited = {start}
+        seen_docs = set()
+        results = []
+        found = 0
+
+        while heap:
+            (negative_matched, negative_score), combination = heapq.heappop(heap)
+            if -negative_matched < needed:
+                break
+            if limit is not None and found >= limit:
+                break
+
+            for i in range(len(words)):
+                if combination[i] + 1 < len(options[i]):
+                    neighbour = combination[:i] + (combination[i] + 1,) + combination[i + 1:]
+                    if neighbour not in visited:
+                        visited.add(neighbour)
+                        heapq.heappush(heap, (key(neighbour)[0], neighbour))
+
+            doc_sets = sorted((docs for _, docs in key(combination)[1] if docs is not None), key=len)
+            docs = doc_sets[0].intersection(*doc_sets[1:]) - seen_docs
+            if not docs:
+                continue
+            seen_docs |= docs
+
+            # among equally similar titles prefer the ones without extra words
+            for doc in sorted(docs, key=lambda doc: len(self._doc_words[doc])):
+                singles, series = self._window(doc, time_min, time_max)
+                results.append((-negative_score, singles, series))
+                found += len(singles)
+                if limit is not None and found >= limit:
+                    break
+
+        return results
+
+    def expand(self, candidates: list, limit: int | None = 10, time_min: float | None = None,
+               time_max: float | None = None) -> list[tuple[float, dict]]:
+        """(score, event) of candidates, their series expanded into the instances of the interval."""
+        results = []
+        for score, singles, series in candidates:
+            events = list(singles)
+            for master in series:
+                for instance in self._expand(master, time_min, time_max):
+                    start = instance["start"]
+                    events.append((event_store.to_timestamp(start.get("dateTime", start.get("date"))), instance))
+            if series:
+                events.sort(key=lambda item: item[0])
+            results.extend((score, event) for _, event in events)
+            if limit is not None and len(results) >= limit:
+                break
+        return results[:limit]
+
+    def _window(self, doc: int, time_min: float | None, time_max: float | None) -> tuple[list[tuple[float, dict]], list[dict]]:
+        """Events of a document overlapping [time_min, time_max), found by bisecting start times, and its
+        series still to expand. Without an interval or expand, the masters themselves are returned as events.
+        """
+        doc_events = self._doc_events.get(doc, [])
+        low = 0 if time_min is None else bisect_left(doc_events, (time_min - self._doc_span.get(doc, 0.0),))
+        high = len(doc_events) if time_max is None else bisect_left(doc_events, (time_max,))
+
+        found = [
+            (start, self._events[event_id][3]) for start, event_id in doc_events[low:high]
+            if time_min is None or self._events[event_id][2] > time_min
+        ]
+        series = list(self._doc_series.get(doc, {}).values())
+        if series and (self._expand is None or time_min is None or time_max is None):
+            found.extend((self._events[master["id"]][1], master) for master in series)
+            found.sort(key=lambda item: item[0])
+            series = []
+        return found, series
+
+def _on_change(calendar_id: str, event_id: str | None, event: dict | None):
+    with _lock:
+        index = _indexes.get(calendar_id)
+        if index is None:
+            return
+        if event_id is None:
+            del _indexes[calendar_id]
+        elif event is None:
+            index.remove(event_id)
+        else:
+            index.add(event)
+
+event_store.listeners.append(_on_change)
+
+def for_calendar(calendar_id: str) -> EventIndex:
+    """Index of every mirrored event of a calendar, built on first use and kept up to date."""
+    with _lock:
+        index = _indexes.get(calendar_id)
+        if index is None:
+            index = _indexes[calendar_id] = EventIndex(
+                event_store.all_events(calendar_id),
+                lambda master, time_min, time_max: event_store.instances(calendar_id, master, time_min, time_max)
+            )
+        return index
+
+def search(calendar_id: str, query: str, time_min: str, time_max: str, limit: int | None = 10,
+           force_refresh: bool = False) -> list[dict]:
+    """Ranked fuzzy name lookup in the mirror of a calendar, limited to an interval."""
+    event_store.ensure_fresh(calendar_id, force_refresh)
+
+    low, high = event_store.to_timestamp(time_min), event_store.to_timestamp(time_max)
+    with tracing.span("index.search", query=query):
+        # series may be expanded by the API, so only ranking holds the mirror lock
+        with _lock:
+            index = for_calendar(calendar_id)
+            candidates = index.candidates(query, limit, low, high)
+        results = index.expand(candidates, limit, low, high)
+
+    return [event for _, event in results]
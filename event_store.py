@@ -0,0 +1,332 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+import datetime as dt
+from zoneinfo import ZoneInfo
+
+import recurrence
+import request_scheduler
+import tracing
+from utils import setup_calendar_service
+
+TZ = ZoneInfo("Europe/Warsaw")
+
+DB_FILE = os.getenv("HERMES_EVENT_DB", "events.db")
+
+# set HERMES_EVENT_MIRROR=0 to always query the Calendar API live
+ENABLED = os.getenv("HERMES_EVENT_MIRROR", "1") != "0"
+
+# reads never see data older than this many seconds; an older mirror is
+# brought up to date with an incremental syncToken request before answering
+MAX_STALENESS_SECONDS = 60
+
+SYNC_PAGE_SIZE = 2500
+
+# version 2 mirrors recurring events as masters (singleEvents=False) rather than as instances
+SCHEMA_VERSION = 2
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    calendar_id TEXT NOT NULL,
+    event_id TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    summary_norm TEXT NOT NULL,
+    start_ts REAL NOT NULL,
+    end_ts REAL NOT NULL,
+    body TEXT NOT NULL,
+    PRIMARY KEY (calendar_id, event_id)
+);
+CREATE INDEX IF NOT EXISTS events_by_start ON events (calendar_id, start_ts);
+CREATE INDEX IF NOT EXISTS events_by_summary ON events (calendar_id, summary_norm);
+CREATE TABLE IF NOT EXISTS sync_state (
+    calendar_id TEXT PRIMARY KEY,
+    sync_token TEXT,
+    synced_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS series (
+    calendar_id TEXT NOT NULL,
+    event_id TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    summary_norm TEXT NOT NULL,
+    start_ts REAL NOT NULL,
+    until_ts REAL NOT NULL,
+    body TEXT NOT NULL,
+    PRIMARY KEY (calendar_id, event_id)
+);
+CREATE INDEX IF NOT EXISTS series_by_start ON series (calendar_id, start_ts);
+CREATE TABLE IF NOT EXISTS exceptions (
+    calendar_id TEXT NOT NULL,
+    event_id TEXT NOT NULL,
+    original_ts REAL NOT NULL,
+    PRIMARY KEY (calendar_id, event_id, original_ts)
+);
+"""
+
+_connection = None
+
+# guards the database; listeners are called while it is held, so modules keeping
+# state derived from the mirror (event_index) take it to read that state too
+lock = threading.RLock()
+
+# one sync per calendar at a time; different calendars sync in parallel and take
+# the lock only to read their state and to apply what they downloaded
+_sync_locks = {}
+
+# callbacks called as listener(calendar_id, event_id, event) for every change; event is
+# None for a removal, event_id and event are both None when the calendar is re-synced
+listeners = []
+
+def _notify(calendar_id: str, event_id: str | None, event: dict | None):
+    for listener in listeners:
+        listener(calendar_id, event_id, event)
+
+def _db() -> sqlite3.Connection:
+    global _connection
+
+    if _connection is None:
+        _connection = sqlite3.connect(DB_FILE, check_same_thread=False)
+        if _connection.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+            # a mirror of expanded instances is dropped and synced again from scratch
+            _connection.executescript("DROP TABLE IF EXISTS events; DROP TABLE IF EXISTS sync_state;")
+        _connection.executescript(_SCHEMA)
+        _connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    return _connection
+
+def to_timestamp(value: str) -> float:
+    """Convert an RFC 3339 date-time or an all-day "YYYY-MM-DD" date to epoch seconds."""
+    if len(value) == 10:
+        return dt.datetime.combine(dt.date.fromisoformat(value), dt.time(0, 0), tzinfo=TZ).timestamp()
+    return dt.datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
+def _row(calendar_id: str, event: dict) -> tuple:
+    start = event["start"].get("dateTime", event["start"].get("date"))
+    end = event.get("end", event["start"])
+    end = end.get("dateTime", end.get("date"))
+    summary = event.get("summary", "")
+
+    return (
+        calendar_id, event["id"], summary, summary.strip().lower(),
+        to_timestamp(start), to_timestamp(end), json.dumps(event, ensure_ascii=False),
+    )
+
+def _series_row(calendar_id: str, event: dict) -> tuple:
+    summary = event.get("summary", "")
+    start, until = recurrence.span(event)
+
+    return (
+        calendar_id, event["id"], summary, summary.strip().lower(),
+        start, until, json.dumps(event, ensure_ascii=False),
+    )
+
+def _apply(db: sqlite3.Connection, calendar_id: str, event: dict):
+    """Store, replace or delete one event as listed with singleEvents=False.
+
+    Recurring events go to series as one master. A moved or cancelled instance
+    of a series becomes an exception, so expansion skips its original start;
+    a moved one is also stored as an event of its own.
+    """
+    event_id = event["id"]
+    db.execute("DELETE FROM events WHERE calendar_id = ? AND event_id = ?", (calendar_id, event_id))
+    db.execute("DELETE FROM series WHERE calendar_id = ? AND event_id = ?", (calendar_id, event_id))
+
+    if event.get("recurringEventId"):
+        db.execute("INSERT OR IGNORE INTO exceptions VALUES (?, ?, ?)",
+                   (calendar_id, event["recurringEventId"], recurrence.original_timestamp(event)))
+
+    if event.get("status") == "cancelled" or "start" not in event:
+        if not event.get("recurringEventId"):
+            # a deleted series takes its exceptions and moved instances ("<id>_<start>") with it
+            db.execute("DELETE FROM exceptions WHERE calendar_id = ? AND event_id = ?", (calendar_id, event_id))
+            prefix = event_id.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "\\_%"
+            moved = db.execute(
+                "SELECT event_id FROM events WHERE calendar_id = ? AND event_id LIKE ? ESCAPE '\\'", (calendar_id, prefix)
+            ).fetchall()
+            for (moved_id,) in moved:
+                db.execute("DELETE FROM events WHERE calendar_id = ? AND event_id = ?", (calendar_id, moved_id))
+                _notify(calendar_id, moved_id, None)
+        _notify(calendar_id, event_id, None)
+    elif "recurrence" in event:
+        db.execute("INSERT OR REPLACE INTO series VALUES (?, ?, ?, ?, ?, ?, ?)", _series_row(calendar_id, event))
+        _notify(calendar_id, event_id, event)
+    else:
+        db.execute("INSERT OR REPLACE INTO events VALUES (?, ?, ?, ?, ?, ?, ?)", _row(calendar_id, event))
+        _notify(calendar_id, event_id, event)
+
+def upsert(calendar_id: str, event: dict):
+    """Store or replace one event, e.g. right after it was created through the API."""
+    with lock:
+        db = _db()
+        _apply(db, calendar_id, event)
+        db.commit()
+
+def remove(calendar_id: str, event: dict):
+    """Forget an event deleted through the API; a deleted instance becomes an exception of its series."""
+    with lock:
+        db = _db()
+        _apply(db, calendar_id, dict(event, status="cancelled"))
+        db.commit()
+
+def _sync_lock(calendar_id: str) -> threading.RLock:
+    with lock:
+        return _sync_locks.setdefault(calendar_id, threading.RLock())
+
+def _apply_items(db: sqlite3.Connection, calendar_id: str, items: list[dict]):
+    for event in items:
+        _apply(db, calendar_id, event)
+
+@tracing.traced("mirror.sync")
+def sync(calendar_id: str):
+    """Bring the mirror of one calendar up to date.
+
+    The first call downloads every event page by page; later calls only fetch
+    what changed since the stored syncToken. An expired token (HTTP 410) falls
+    back to a new full sync. Pages are applied in one transaction once all of
+    them arrived, so other calendars can be read and synced meanwhile.
+    Recurring events arrive as one master each and are expanded when read.
+    """
+    service = setup_calendar_service()
+
+    with _sync_lock(calendar_id):
+        with lock:
+            state = _db().execute("SELECT sync_token FROM sync_state WHERE calendar_id = ?", (calendar_id,)).fetchone()
+        sync_token = state[0] if state else None
+
+        items = []
+        page_token = None
+        while True:
+            try:
+                result = service.events().list(
+                    calendarId=calendar_id,
+                    singleEvents=False,
+                    maxResults=SYNC_PAGE_SIZE,
+                    syncToken=sync_token,
+                    pageToken=page_token
+                ).execute()
+            except Exception as e:
+                if request_scheduler.status(e) != 410 or sync_token is None:
+                    raise
+                with lock:
+                    db = _db()
+                    db.execute("DELETE FROM sync_state WHERE calendar_id = ?", (calendar_id,))
+                    db.commit()
+                return sync(calendar_id)
+
+            items.extend(result.get("items", []))
+
+            page_token = result.get("nextPageToken")
+            if not page_token:
+                break
+
+        with lock:
+            db = _db()
+            if sync_token is None:
+                for table in ("events", "series", "exceptions"):
+                    db.execute(f"DELETE FROM {table} WHERE calendar_id = ?", (calendar_id,))
+                _notify(calendar_id, None, None)
+
+            _apply_items(db, calendar_id, items)
+            db.execute(
+                "INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?)",
+                (calendar_id, result.get("nextSyncToken"), time.time())
+            )
+            db.commit()
+
+def ensure_fresh(calendar_id: str, force_refresh: bool = False):
+    """Sync when the mirror is older than MAX_STALENESS_SECONDS or a live refresh is forced.
+
+    The check and the sync share the calendar's sync lock, so a reader racing
+    a background warm-up waits for it instead of syncing a second time.
+    """
+    with _sync_lock(calendar_id):
+        with lock:
+            state = _db().execute("SELECT synced_at FROM sync_state WHERE calendar_id = ?", (calendar_id,)).fetchone()
+
+        if force_refresh or state is None or time.time() - state[0] > MAX_STALENESS_SECONDS:
+            sync(calendar_id)
+
+def _remote_instances(calendar_id: str, master: dict, time_min: float, time_max: float) -> list[dict]:
+    """Instances of a series from the API, for rules recurrence.py does not expand."""
+    service = setup_calendar_service()
+    items, page_token = [], None
+
+    while True:
+        with tracing.span("mirror.remote_instances"):
+            page = service.events().instances(
+                calendarId=calendar_id, eventId=master["id"], pageToken=page_token,
+                timeMin=dt.datetime.fromtimestamp(time_min, TZ).isoformat(),
+                timeMax=dt.datetime.fromtimestamp(time_max, TZ).isoformat()
+            ).execute()
+        items.extend(page.get("items", []))
+        page_token = page.get("nextPageToken")
+        if not page_token:
+            return items
+
+def instances(calendar_id: str, master: dict, time_min: float, time_max: float) -> list[dict]:
+    """Instances of a mirrored series overlapping [time_min, time_max) (epoch seconds), without its exceptions."""
+    with lock:
+        skip = {
+            original_ts for (original_ts,) in _db().execute(
+                "SELECT original_ts FROM exceptions WHERE calendar_id = ? AND event_id = ?", (calendar_id, master["id"])
+            )
+        }
+
+    try:
+        return recurrence.instances(master, time_min, time_max, skip)
+    except ValueError:
+        return [
+            instance for instance in _remote_instances(calendar_id, master, time_min, time_max)
+            if recurrence.original_timestamp(instance) not in skip
+        ]
+
+def _query(calendar_id: str, time_min: str, time_max: str, condition: str = "", params: tuple = ()) -> list[dict]:
+    """Single events and instances of series overlapping the interval, ordered by start time."""
+    low, high = to_timestamp(time_min), to_timestamp(time_max)
+
+    with lock:
+        db = _db()
+        rows = db.execute(
+            f"SELECT start_ts, body FROM events WHERE calendar_id = ? AND start_ts < ? AND end_ts > ?{condition}",
+            (calendar_id, high, low, *params)
+        ).fetchall()
+        masters = db.execute(
+            f"SELECT body FROM series WHERE calendar_id = ? AND start_ts < ? AND until_ts > ?{condition}",
+            (calendar_id, high, low, *params)
+        ).fetchall()
+
+    # expanded outside the lock, since a rule recurrence.py does not expand is asked from the API
+    events = [(start_ts, json.loads(body)) for start_ts, body in rows]
+    for (body,) in masters:
+        events.extend(
+            (recurrence.original_timestamp({"start": instance["start"]}), instance)
+            for instance in instances(calendar_id, json.loads(body), low, high)
+        )
+
+    events.sort(key=lambda item: item[0])
+    return [event for _, event in events]
+
+def list_events(calendar_id: str, time_min: str, time_max: str, force_refresh: bool = False) -> list[dict]:
+    """Events overlapping [time_min, time_max), ordered by start time, served from the mirror."""
+    ensure_fresh(calendar_id, force_refresh)
+
+    with tracing.span("mirror.query"):
+        return _query(calendar_id, time_min, time_max)
+
+def find_events(calendar_id: str, name: str, time_min: str, time_max: str,
+                force_refresh: bool = False) -> list[dict]:
+    """Events in the interval whose summary contains name (case-insensitive)."""
+    ensure_fresh(calendar_id, force_refresh)
+
+    pattern = "%" + name.strip().lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+    return _query(calendar_id, time_min, time_max, " AND summary_norm LIKE ? ESCAPE '\\'", (pattern,))
+
+def all_events(calendar_id: str) -> list[dict]:
+    """Every mirrored event of a calendar, recurring ones as their masters, without syncing first."""
+    with lock:
+        db = _db()
+        rows = db.execute("SELECT body FROM events WHERE calendar_id = ?", (calendar_id,)).fetchall()
+        rows += db.execute("SELECT body FROM series WHERE calendar_id = ?", (calendar_id,)).fetchall()
+
+    return [json.loads(body) for (body,) in rows]
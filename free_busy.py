@@ -0,0 +1,242 @@
+import datetime as dt
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from zoneinfo import ZoneInfo
+
+import calendar_batch
+import tracing
+from utils import setup_calendar_service
+
+TZ = ZoneInfo("Europe/Warsaw")
+
+# the API answers for at most 50 calendars per freebusy().query
+FREEBUSY_CALENDAR_LIMIT = 50
+
+# longer windows are split into several queries; the API rejects too long time ranges
+FREEBUSY_MAX_DAYS = 60
+
+# suggested slots fall within these local hours
+WORK_DAY_START = dt.time(8, 0)
+WORK_DAY_END = dt.time(20, 0)
+
+# suggested slots start on a multiple of this many minutes
+SLOT_STEP_MINUTES = 15
+
+def _parse(value: str) -> dt.datetime:
+    """An ISO 8601 instant; without an offset it is local time in Europe/Warsaw."""
+    moment = dt.datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return moment if moment.tzinfo else moment.replace(tzinfo=TZ)
+
+def _timestamp(value: str) -> float:
+    return _parse(value).timestamp()
+
+class BusyIntervals:
+    """Sorted, merged busy intervals (epoch seconds) answering overlap and free-slot queries.
+
+    Building costs O(n log n); overlaps() and each slot found by free_slots()
+    cost O(log n): a max-tree over the gaps between consecutive intervals finds
+    the first long enough gap without walking the shorter ones.
+    """
+
+    def __init__(self, intervals=()):
+        merged = []
+        for start, end in sorted(intervals):
+            if end <= start:
+                continue
+            if merged and start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+
+        self.starts = [start for start, _ in merged]
+        self.ends = [end for _, end in merged]
+
+        gaps = [self.starts[k + 1] - self.ends[k] for k in range(len(merged) - 1)]
+        self._gap_count = len(gaps)
+        self._size = 1 << max(len(gaps) - 1, 0).bit_length()
+        self._tree = [-1.0] * (2 * self._size)
+        self._tree[self._size:self._size + len(gaps)] = gaps
+        for node in range(self._size - 1, 0, -1):
+            self._tree[node] = max(self._tree[2 * node], self._tree[2 * node + 1])
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def __iter__(self):
+        return zip(self.starts, self.ends)
+
+    @classmethod
+    def merge(cls, structures) -> "BusyIntervals":
+        """Union of several structures, e.g. the busy times of many calendars."""
+        return cls(interval for structure in structures for interval in structure)
+
+    def conflicts(self, start: float, end: float) -> list[tuple[float, float]]:
+        """Busy intervals overlapping [start, end)."""
+        first = bisect_right(self.ends, start)
+        last = bisect_left(self.starts, end, lo=first)
+        return list(zip(self.starts[first:last], self.ends[first:last]))
+
+    def overlaps(self, start: float, end: float) -> bool:
+        first = bisect_right(self.ends, start)
+        return first < len(self.starts) and self.starts[first] < end
+
+    def _first_gap(self, position: int, length: float) -> int | None:
+        """Index k >= position of the first gap (ends[k], starts[k + 1]) at least length long."""
+        if position >= self._gap_count:
+            return None
+
+        tree, node = self._tree, position + self._size
+        while tree[node] < length:
+            # climb while node is a right child, then step to the subtree just right of it
+            while node & 1:
+                node >>= 1
+                if node == 0:
+                    return None
+            node += 1
+
+        while node < self._size:
+            node = 2 * node if tree[2 * node] >= length else 2 * node + 1
+        return node - self._size
+
+    def free_slots(self, window_start: float, window_end: float, duration: float, count: int = 1,
+                   step: float = SLOT_STEP_MINUTES * 60) -> list[tuple[float, float]]:
+        """Up to count free (start, end) slots of duration seconds within the window, earliest first.
+
+        Slots start on a multiple of step; one slot is suggested per gap.
+        """
+        slots = []
+
+        def offer(free_start: float, free_end: float) -> bool:
+            start = -(-free_start // step) * step
+            if start + duration <= min(free_end, window_end):
+                slots.append((start, start + duration))
+            return len(slots) >= count
+
+        n = len(self.starts)
+        first = bisect_right(self.ends, window_start)
+        if first == n:
+            offer(window_start, window_end)
+            return slots
+        if self.starts[first] > window_start and offer(window_start, self.starts[first]):
+            return slots
+
+        gap = first
+        while True:
+            gap = self._first_gap(gap, duration)
+            if gap is None or self.ends[gap] >= window_end:
+                break
+            if offer(self.ends[gap], self.starts[gap + 1]):
+                return slots
+            gap += 1
+
+        if self.ends[-1] < window_end:
+            offer(max(self.ends[-1], window_start), window_end)
+        return slots
+
+def off_hours(window_start: float, window_end: float) -> list[tuple[float, float]]:
+    """Local time outside WORK_DAY_START-WORK_DAY_END on every day of the window, as busy intervals."""
+    day = dt.datetime.fromtimestamp(window_start, TZ).date()
+    last_day = dt.datetime.fromtimestamp(window_end, TZ).date()
+    intervals = []
+
+    while day <= last_day:
+        midnight = dt.datetime.combine(day, dt.time(0), TZ).timestamp()
+        intervals.append((midnight, dt.datetime.combine(day, WORK_DAY_START, TZ).timestamp()))
+        next_midnight = dt.datetime.combine(day + dt.timedelta(days=1), dt.time(0), TZ).timestamp()
+        intervals.append((dt.datetime.combine(day, WORK_DAY_END, TZ).timestamp(), next_midnight))
+        day += dt.timedelta(days=1)
+
+    return intervals
+
+def _windows(time_min: str, time_max: str) -> list[tuple[str, str]]:
+    start, end = _parse(time_min), _parse(time_max)
+    windows = []
+
+    while start < end:
+        stop = min(start + dt.timedelta(days=FREEBUSY_MAX_DAYS), end)
+        windows.append((start.isoformat(), stop.isoformat()))
+        start = stop
+    return windows
+
+def query_busy(calendar_ids: list[str], time_min: str, time_max: str) -> dict[str, BusyIntervals]:
+    """Busy intervals of every calendar between time_min and time_max (ISO 8601).
+
+    Calendars are asked FREEBUSY_CALENDAR_LIMIT at a time and long intervals in
+    windows of FREEBUSY_MAX_DAYS; several queries travel in batch requests.
+    A calendar the API could not answer for is reported and counts as free.
+    """
+    calendar_ids = list(dict.fromkeys(calendar_ids))
+    bodies = [
+        {
+            "timeMin": window_min,
+            "timeMax": window_max,
+            "timeZone": "Europe/Warsaw",
+            "items": [{"id": calendar_id} for calendar_id in calendar_ids[offset:offset + FREEBUSY_CALENDAR_LIMIT]],
+        }
+        for window_min, window_max in _windows(time_min, time_max)
+        for offset in range(0, len(calendar_ids), FREEBUSY_CALENDAR_LIMIT)
+    ]
+
+    with tracing.span("calendar.freebusy", calendars=len(calendar_ids), queries=len(bodies)):
+        if len(bodies) == 1:
+            service = setup_calendar_service()
+            results = [{"item": bodies[0], "ok": True, "result": service.freebusy().query(body=bodies[0]).execute()}]
+        else:
+            results = calendar_batch.query_free_busy(bodies)
+
+    intervals = defaultdict(list)
+    for result in results:
+        if not result["ok"]:
+            print(f"⚠️ Nie udało się pobrać zajętości kalendarzy: {result['error']}")
+            continue
+        for calendar_id, calendar in result["result"].get("calendars", {}).items():
+            if calendar.get("errors"):
+                reason = calendar["errors"][0].get("reason", "")
+                print(f"⚠️ Brak dostępu do zajętości kalendarza {calendar_id}: {reason}")
+            for busy in calendar.get("busy", []):
+                intervals[calendar_id].append((_timestamp(busy["start"]), _timestamp(busy["end"])))
+
+    return {calendar_id: BusyIntervals(intervals[calendar_id]) for calendar_id in calendar_ids}
+
+def event_interval(event: dict) -> tuple[float, float] | None:
+    """(start, end) of an event with a time of day; None for all-day events."""
+    if "dateTime" not in event.get("start", {}) or "dateTime" not in event.get("end", {}):
+        return None
+    return _timestamp(event["start"]["dateTime"]), _timestamp(event["end"]["dateTime"])
+
+def find_conflicts(calendar_ids: list[str], events: list[dict]) -> list[tuple[dict, str, list[tuple[float, float]]]]:
+    """(event, calendar id, busy intervals) for every event overlapping busy time in one of the calendars.
+
+    All events are checked with a single free/busy query spanning them.
+    """
+    timed = [(event, interval) for event in events if (interval := event_interval(event))]
+    if not timed:
+        return []
+
+    time_min = dt.datetime.fromtimestamp(min(start for _, (start, _) in timed), TZ).isoformat()
+    time_max = dt.datetime.fromtimestamp(max(end for _, (_, end) in timed), TZ).isoformat()
+    busy = query_busy(calendar_ids, time_min, time_max)
+
+    conflicts = []
+    for event, (start, end) in timed:
+        for calendar_id, intervals in busy.items():
+            overlapping = intervals.conflicts(start, end)
+            if overlapping:
+                conflicts.append((event, calendar_id, overlapping))
+    return conflicts
+
+def find_slots(calendar_ids: list[str], time_min: str, time_max: str, duration_minutes: int,
+               count: int = 3) -> list[tuple[dt.datetime, dt.datetime]]:
+    """Earliest free slots of duration_minutes common to all the calendars, within working hours and not in the past."""
+    window_start = max(_timestamp(time_min), dt.datetime.now(tz=dt.timezone.utc).timestamp())
+    window_end = _timestamp(time_max)
+    if window_start >= window_end:
+        return []
+
+    busy = query_busy(calendar_ids, time_min, time_max)
+    intervals = BusyIntervals.merge([*busy.values(), off_hours(window_start, window_end)])
+
+    return [
+        (dt.datetime.fromtimestamp(start, TZ), dt.datetime.fromtimestamp(end, TZ))
+        for start, end in intervals.free_slots(window_start, window_end, duration_minutes * 60, count)
+    ]
@@ -0,0 +1,122 @@
+"""Thin command-line client of the Hermes daemon (python main.py --serve).
+
+Only the standard library is imported, so starting it costs a few
+milliseconds; Gemini, the Google clients, caches and the event mirror stay
+warm in the daemon. Without a command it works like the interactive prompt
+of main.py, otherwise it runs the command and exits, with status 1 when the
+command failed.
+
+    python hermes_client.py ["pokaż wydarzenia na jutro"] [--session NAME] [--address PATH|HOST:PORT]
+"""
+import os
+import sys
+import json
+import socket
+import argparse
+import tempfile
+
+# a Unix socket where the platform has them, otherwise a local TCP port
+DEFAULT_ADDRESS = os.getenv("HERMES_DAEMON_ADDRESS") or (
+    os.path.join(tempfile.gettempdir(), f"hermes-{os.getuid()}.sock") if hasattr(socket, "AF_UNIX")
+    else "127.0.0.1:8767"
+)
+
+# secret a daemon listening on a TCP port writes (readable by its owner only) and expects in the first message
+TOKEN_FILE = os.getenv("HERMES_DAEMON_TOKEN_FILE") or os.path.join(os.path.expanduser("~"), ".hermes_daemon_token")
+
+def parse_address(address: str) -> tuple[int, str | tuple[str, int]]:
+    """(socket family, address) of a Unix socket path or a "host:port"."""
+    host, _, port = address.rpartition(":")
+    if port.isdigit() and host and os.sep not in address:
+        return socket.AF_INET, (host, int(port))
+    return socket.AF_UNIX, address
+
+class Connection:
+    """One connection to the daemon, speaking JSON lines; the daemon keeps one session per connection."""
+
+    def __init__(self, address: str = DEFAULT_ADDRESS, session: str | None = None):
+        family, target = parse_address(address)
+        hello = {"session": session, "tty": sys.stdout.isatty()}
+        if family == socket.AF_INET:
+            with open(TOKEN_FILE, encoding="utf-8") as token:
+                hello["token"] = token.read().strip()
+
+        self.socket = socket.socket(family, socket.SOCK_STREAM)
+        self.socket.connect(target)
+        self.reader = self.socket.makefile("r", encoding="utf-8")
+        reply = self.request(hello)
+        if "prompt" not in reply:
+            raise ConnectionRefusedError(reply.get("error", "Demon odrzucił połączenie."))
+        self.prompt = reply["prompt"]
+
+    def send(self, message: dict):
+        self.socket.sendall((json.dumps(message, ensure_ascii=False) + "\n").encode())
+
+    def receive(self) -> dict:
+        line = self.reader.readline()
+        if not line:
+            raise ConnectionError("Demon Hermesa zamknął połączenie.")
+        return json.loads(line)
+
+    def request(self, message: dict, ask=input, output=print) -> dict:
+        """Send one message and handle the daemon's output and questions until its reply."""
+        self.send(message)
+        while True:
+            reply = self.receive()
+            if "output" in reply:
+                output(reply["output"])
+            elif "ask" in reply:
+                try:
+                    answer = ask(reply["ask"])
+                except EOFError:
+                    answer = None
+                self.send({"answer": answer})
+            else:
+                if "prompt" in reply:
+                    self.prompt = reply["prompt"]
+                return reply
+
+    def command(self, text: str, ask=input, output=print) -> dict:
+        """Run one command; the reply has its status, duration_ms and the session's new prompt."""
+        return self.request({"command": text}, ask, output)
+
+    def close(self):
+        self.reader.close()
+        self.socket.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Hermes – klient demona asystenta Kalendarza Google")
+    parser.add_argument("command", nargs="*", help="polecenie do wykonania; bez niego tryb interaktywny")
+    parser.add_argument("--session", help="nazwa sesji współdzielonej między połączeniami (kalendarz i historia)")
+    parser.add_argument("--address", default=DEFAULT_ADDRESS, help="gniazdo Unix lub host:port demona")
+    options = parser.parse_args()
+
+    try:
+        connection = Connection(options.address, options.session)
+    except OSError as e:
+        print(f"❌ Nie można połączyć się z demonem ({options.address}): {e}\n"
+              f"   Uruchom go poleceniem: python main.py --serve", file=sys.stderr)
+        sys.exit(2)
+
+    try:
+        if options.command:
+            reply = connection.command(" ".join(options.command))
+            sys.exit(0 if reply["status"] == "ok" else 1)
+
+        while True:
+            try:
+                user_prompt = input(connection.prompt).strip()
+            except EOFError:
+                break
+            if user_prompt.lower() in ["exit", "quit"]:
+                print("👋 Do widzenia!")
+                break
+            if user_prompt:
+                connection.command(user_prompt)
+    except KeyboardInterrupt:
+        print()
+    finally:
+        connection.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,368 @@
+import os
+import time
+import sqlite3
+import threading
+from email.utils import parseaddr
+
+import calendar_batch
+import request_scheduler
+import tracing
+from utils import setup_gmail_service, fold_text
+
+DB_FILE = os.getenv("HERMES_MAIL_DB", "mail.db")
+
+# set HERMES_MAIL_INDEX=0 to always search the mailbox through the Gmail API
+ENABLED = os.getenv("HERMES_MAIL_INDEX", "1") != "0"
+
+# reads never see data older than this many seconds; an older index is brought
+# up to date with an incremental history.list request before answering
+MAX_STALENESS_SECONDS = 60
+
+LIST_PAGE_SIZE = 500
+HISTORY_PAGE_SIZE = 500
+
+# Gmail accepts 100 calls per batch request but starts rate limiting above 50
+BATCH_LIMIT = 50
+
+# messages.batchModify accepts at most this many ids
+MODIFY_LIMIT = 1000
+
+METADATA_HEADERS = ["From", "To", "Subject"]
+METADATA_FIELDS = "id,threadId,labelIds,snippet,internalDate,payload/headers"
+
+# rows read from the index per query while streaming search results
+STREAM_CHUNK = 200
+
+# searches skip these unless asked for them, like the Gmail search box
+HIDDEN_LABELS = ("SPAM", "TRASH")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    message_id TEXT PRIMARY KEY,
+    thread_id TEXT NOT NULL,
+    internal_ts REAL NOT NULL,
+    sender TEXT NOT NULL,
+    recipients TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    snippet TEXT NOT NULL,
+    labels TEXT NOT NULL,
+    search_text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS messages_by_time ON messages (internal_ts, message_id);
+CREATE TABLE IF NOT EXISTS sync_state (
+    account TEXT PRIMARY KEY,
+    history_id TEXT,
+    page_token TEXT,
+    complete INTEGER NOT NULL,
+    synced_at REAL NOT NULL
+);
+"""
+
+ACCOUNT = "me"
+
+_connection = None
+_lock = threading.RLock()
+_sync_lock = threading.RLock()
+_sync_thread = None
+
+def _db() -> sqlite3.Connection:
+    global _connection
+
+    if _connection is None:
+        _connection = sqlite3.connect(DB_FILE, check_same_thread=False)
+        _connection.executescript(_SCHEMA)
+        # header filters compare folded text, like search_text
+        _connection.create_function("fold", 1, fold_text, deterministic=True)
+    return _connection
+
+def _labels_column(label_ids) -> str:
+    """Label ids as " INBOX UNREAD ", so one label is matched with LIKE '% INBOX %'."""
+    return " " + " ".join(sorted(set(label_ids))) + " "
+
+def _row(message: dict) -> tuple:
+    headers = {header["name"].lower(): header["value"] for header in message.get("payload", {}).get("headers", [])}
+    sender, recipients, subject = headers.get("from", ""), headers.get("to", ""), headers.get("subject", "")
+    snippet = message.get("snippet", "")
+
+    return (
+        message["id"], message.get("threadId", message["id"]), int(message.get("internalDate", 0)) / 1000,
+        sender, recipients, subject, snippet, _labels_column(message.get("labelIds", [])),
+        fold_text(" ".join((sender, recipients, subject, snippet))),
+    )
+
+def _message(row: tuple) -> dict:
+    message_id, thread_id, internal_ts, sender, recipients, subject, snippet, labels = row
+    return {
+        "id": message_id, "threadId": thread_id, "internalTs": internal_ts, "from": sender,
+        "to": recipients, "subject": subject, "snippet": snippet, "labelIds": labels.split(),
+    }
+
+def from_api(message: dict) -> dict:
+    """A messages.get metadata response in the shape iter_messages() yields."""
+    return _message(_row(message)[:8])
+
+def sender_name(message: dict) -> str:
+    """Display name of the sender, or the address without one."""
+    name, address = parseaddr(message["from"])
+    return name or address or message["from"]
+
+def iter_metadata(message_ids: list[str]):
+    """Yield the metadata (headers, labels, snippet) of messages, BATCH_LIMIT calls per batch request.
+
+    Messages are fetched one batch at a time, so the first ones are available
+    after a single round trip. Messages deleted in the meantime are skipped.
+    """
+    service = setup_gmail_service()
+    # building a resource walks the discovery document, so it is done once, not per message
+    messages = service.users().messages()
+
+    for offset in range(0, len(message_ids), BATCH_LIMIT):
+        requests = [
+            (message_id, messages.get(
+                userId="me", id=message_id, format="metadata",
+                metadataHeaders=METADATA_HEADERS, fields=METADATA_FIELDS
+            ))
+            for message_id in message_ids[offset:offset + BATCH_LIMIT]
+        ]
+        with tracing.span("gmail.get_metadata", messages=len(requests)):
+            results = calendar_batch.execute(service, requests, api="gmail", limit=BATCH_LIMIT)
+
+        for result in results:
+            if result["ok"]:
+                yield result["result"]
+            elif not result["error"].startswith("HTTP 404"):
+                print(f"⚠️ Nie udało się pobrać wiadomości {result['item']}: {result['error']}")
+
+def _state() -> tuple | None:
+    with _lock:
+        return _db().execute(
+            "SELECT history_id, page_token, complete, synced_at FROM sync_state WHERE account = ?", (ACCOUNT,)
+        ).fetchone()
+
+def _full_sync(service):
+    """Index every message page by page, newest first; resumes where an interrupted run stopped.
+
+    The historyId is taken before listing, so changes made during a long first
+    sync are caught up by the next incremental one. Every page is committed on
+    its own, so a mailbox of 100k messages becomes searchable gradually.
+    """
+    state = _state()
+    if state is None:
+        history_id = service.users().getProfile(userId="me").execute()["historyId"]
+        with _lock:
+            db = _db()
+            db.execute("DELETE FROM messages")
+            db.execute("INSERT OR REPLACE INTO sync_state VALUES (?, ?, NULL, 0, ?)", (ACCOUNT, history_id, 0.0))
+            db.commit()
+        page_token = None
+    else:
+        page_token = state[1]
+
+    while True:
+        page = service.users().messages().list(
+            userId="me", maxResults=LIST_PAGE_SIZE, pageToken=page_token, fields="messages(id),nextPageToken"
+        ).execute()
+        messages = list(iter_metadata([message["id"] for message in page.get("messages", [])]))
+        page_token = page.get("nextPageToken")
+
+        with _lock:
+            db = _db()
+            db.executemany("INSERT OR REPLACE INTO messages VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", map(_row, messages))
+            db.execute(
+                "UPDATE sync_state SET page_token = ?, complete = ?, synced_at = ? WHERE account = ?",
+                (page_token, page_token is None, time.time(), ACCOUNT)
+            )
+            db.commit()
+
+        if not page_token:
+            return
+
+def _relabel(db: sqlite3.Connection, message_id: str, added=(), removed=()):
+    row = db.execute("SELECT labels FROM messages WHERE message_id = ?", (message_id,)).fetchone()
+    if row is not None:
+        labels = (set(row[0].split()) | set(added)) - set(removed)
+        db.execute("UPDATE messages SET labels = ? WHERE message_id = ?", (_labels_column(labels), message_id))
+
+def _history_sync(service, history_id: str):
+    """Apply the changes since history_id: new messages are fetched, label changes and deletions applied locally.
+
+    An expired historyId (HTTP 404) drops the sync state, so the next sync starts over with a full one.
+    """
+    added, deleted, relabeled = {}, set(), []
+    page_token = None
+
+    while True:
+        try:
+            page = service.users().history().list(
+                userId="me", startHistoryId=history_id, maxResults=HISTORY_PAGE_SIZE, pageToken=page_token
+            ).execute()
+        except Exception as e:
+            if request_scheduler.status(e) != 404:
+                raise
+            with _lock:
+                db = _db()
+                db.execute("DELETE FROM sync_state WHERE account = ?", (ACCOUNT,))
+                db.commit()
+            return
+
+        for record in page.get("history", []):
+            for change in record.get("messagesAdded", []):
+                added[change["message"]["id"]] = True
+                deleted.discard(change["message"]["id"])
+            for change in record.get("messagesDeleted", []):
+                added.pop(change["message"]["id"], None)
+                deleted.add(change["message"]["id"])
+            for change in record.get("labelsAdded", []):
+                relabeled.append((change["message"]["id"], change.get("labelIds", []), ()))
+            for change in record.get("labelsRemoved", []):
+                relabeled.append((change["message"]["id"], (), change.get("labelIds", [])))
+
+        page_token = page.get("nextPageToken")
+        if not page_token:
+            break
+
+    # fetched messages carry their current labels, so earlier label changes to them are moot
+    messages = list(iter_metadata(list(added)))
+
+    with _lock:
+        db = _db()
+        db.executemany("DELETE FROM messages WHERE message_id = ?", [(message_id,) for message_id in deleted])
+        for message_id, labels_added, labels_removed in relabeled:
+            if message_id not in added:
+                _relabel(db, message_id, labels_added, labels_removed)
+        db.executemany("INSERT OR REPLACE INTO messages VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", map(_row, messages))
+        db.execute(
+            "UPDATE sync_state SET history_id = ?, synced_at = ? WHERE account = ?",
+            (page["historyId"], time.time(), ACCOUNT)
+        )
+        db.commit()
+
+@tracing.traced("mail.sync")
+def sync():
+    """Bring the header index up to date: a (resumed) full sync first, incremental history syncs afterwards."""
+    service = setup_gmail_service()
+
+    with _sync_lock:
+        state = _state()
+        if state is None or not state[2]:
+            _full_sync(service)
+            state = _state()
+        _history_sync(service, state[0])
+
+def is_complete() -> bool:
+    state = _state()
+    return state is not None and bool(state[2])
+
+def sync_in_background() -> threading.Thread:
+    """Start syncing until the index is complete on a thread of its own, unless one is running; returns it.
+
+    A first full sync of a large mailbox takes minutes, far beyond a command's
+    deadline, so it never runs inside a command.
+    """
+    global _sync_thread
+
+    def run():
+        try:
+            while not is_complete():
+                sync()
+        except Exception as e:
+            print(f"⚠️ Budowanie indeksu poczty przerwane (zostanie wznowione): {e}")
+
+    with _lock:
+        if _sync_thread is None or not _sync_thread.is_alive():
+            _sync_thread = threading.Thread(target=run, name="mail-index-sync", daemon=True)
+            _sync_thread.start()
+        return _sync_thread
+
+def ensure_fresh(force_refresh: bool = False) -> bool:
+    """Bring a complete index up to date when older than MAX_STALENESS_SECONDS or a refresh is forced.
+
+    Returns whether the index can answer searches. A missing or unfinished one
+    is (re)built by sync_in_background() instead, and False is returned.
+    """
+    if not is_complete():
+        sync_in_background()
+        return False
+
+    with _sync_lock:
+        state = _state()
+        if force_refresh or state is None or not state[2] or time.time() - state[3] > MAX_STALENESS_SECONDS:
+            sync()
+
+    if is_complete():
+        return True
+    sync_in_background()
+    return False
+
+def relabel(message_ids: list[str], added=(), removed=()):
+    """Apply a label change made through the API, e.g. by batchModify, without waiting for the next sync."""
+    with _lock:
+        db = _db()
+        for message_id in message_ids:
+            _relabel(db, message_id, added, removed)
+        db.commit()
+
+def _escape(text: str) -> str:
+    return "%" + fold_text(text.strip()).replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+def iter_messages(sender: str | None = None, recipient: str | None = None, subject: str | None = None,
+                  text: str | None = None, label_ids=(), unread: bool | None = None, after: float | None = None,
+                  before: float | None = None, limit: int | None = None, force_refresh: bool = False):
+    """Lazily yield indexed messages matching every given filter, newest first.
+
+    Text filters match case- and diacritic-insensitive substrings; after and
+    before are epoch seconds. Rows are read STREAM_CHUNK at a time, so the
+    first results are printed before the whole mailbox has been scanned.
+    """
+    ensure_fresh(force_refresh)
+
+    clauses, params = [], []
+    for column, value in (("sender", sender), ("recipients", recipient), ("subject", subject)):
+        if value:
+            clauses.append(f"fold({column}) LIKE ? ESCAPE '\\'")
+            params.append(_escape(value))
+    if text:
+        clauses.append("search_text LIKE ? ESCAPE '\\'")
+        params.append(_escape(text))
+    for label_id in label_ids:
+        clauses.append("labels LIKE ?")
+        params.append(f"% {label_id} %")
+    for label_id in HIDDEN_LABELS:
+        if label_id not in label_ids:
+            clauses.append("labels NOT LIKE ?")
+            params.append(f"% {label_id} %")
+    if unread is not None:
+        clauses.append("labels LIKE ?" if unread else "labels NOT LIKE ?")
+        params.append("% UNREAD %")
+    if after is not None:
+        clauses.append("internal_ts >= ?")
+        params.append(after)
+    if before is not None:
+        clauses.append("internal_ts < ?")
+        params.append(before)
+
+    where = " AND ".join(clauses) or "1"
+    columns = "message_id, thread_id, internal_ts, sender, recipients, subject, snippet, labels"
+    cursor, found = None, 0
+
+    while limit is None or found < limit:
+        # keyset pagination: each chunk continues below the last row of the previous one
+        page_clause = "" if cursor is None else " AND (internal_ts, message_id) < (?, ?)"
+        chunk = STREAM_CHUNK if limit is None else min(STREAM_CHUNK, limit - found)
+        with tracing.span("mail.query"), _lock:
+            rows = _db().execute(
+                f"SELECT {columns} FROM messages WHERE {where}{page_clause} "
+                "ORDER BY internal_ts DESC, message_id DESC LIMIT ?",
+                (*params, *(cursor or ()), chunk)
+            ).fetchall()
+
+        for row in rows:
+            yield _message(row)
+        found += len(rows)
+        if len(rows) < chunk:
+            return
+        cursor = (rows[-1][2], rows[-1][0])
+
+def count() -> int:
+    with _lock:
+        return _db().execute("SELECT COUNT(*) FROM messages").fetchone()[0]
@@ -1,31 +1,79 @@
-import os
+import sys
+import argparse
+import threading
 
 from dotenv import load_dotenv
 from zoneinfo import ZoneInfo  
 
-from google import genai
+# before the Hermes modules, which read their HERMES_* settings when imported
+load_dotenv()
 
-from ai_router import choose_specified_model
+from ai_router import dispatch
 from ai_google_calendar import change_calendar_api
-from utils import setup_calendar_service
+import calendar_cache
+import hermes_client
+import request_scheduler
+import response_cache
+import session
+import tracing
 import utils
 
-load_dotenv()
-
-genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
-
 MODEL_NAME = "gemini-2.0-flash"  
 
 TZ = ZoneInfo("Europe/Warsaw")
 
 if __name__ == "__main__":
-    service = setup_calendar_service()
-    utils.cur_calendar = service.calendarList().get(calendarId="primary").execute()
+    parser = argparse.ArgumentParser(description="Hermes – asystent Kalendarza Google")
+    parser.add_argument("--profile", action="store_true", help="po każdym poleceniu wypisz czasy poszczególnych etapów")
+    parser.add_argument("--trace-file", help="dopisuj ślady poleceń do pliku (JSONL)")
+    parser.add_argument("--trace-format", choices=["jsonl", "otlp"], help="format śladów: jsonl lub otlp (OpenTelemetry)")
+    parser.add_argument("--batch", metavar="PLIK",
+                        help="wykonaj polecenia z pliku ('-' = stdin), po jednym w wierszu lub jako JSONL")
+    parser.add_argument("--output", metavar="PLIK", help="wyniki trybu wsadowego (JSONL) do pliku zamiast na stdout")
+    parser.add_argument("--concurrency", type=int,
+                        help="ile poleceń wsadowych wykonywać jednocześnie (domyślnie 4)")
+    parser.add_argument("--confirm", choices=["yes", "no"], default="no",
+                        help="odpowiedź na pytania o potwierdzenie usunięcia w trybie wsadowym")
+    parser.add_argument("--ambiguous", choices=["first", "all", "skip"], default="skip",
+                        help="gdy pasuje kilka wydarzeń: pierwsze, wszystkie albo pomiń")
+    parser.add_argument("--calendar", default="primary", help="kalendarz, w którym zaczynają polecenia")
+    parser.add_argument("--serve", nargs="?", const=hermes_client.DEFAULT_ADDRESS, metavar="ADRES",
+                        help="działaj jako demon dla hermes_client.py na gnieździe Unix lub host:port")
+    options = parser.parse_args()
+
+    tracing.configure(profile=options.profile, trace_file=options.trace_file, trace_format=options.trace_format)
+
+    # import google-genai and create the client while the calendar list loads and the user types
+    threading.Thread(target=utils.get_genai_client, name="genai-preload", daemon=True).start()
+
+    change_calendar_api(options.calendar)
+
+    # batch and daemon modes are imported only when used, keeping the interactive start-up light
+    if options.batch:
+        import batch_mode
+
+        source = sys.stdin if options.batch == "-" else open(options.batch, encoding="utf-8")
+        output = open(options.output, "w", encoding="utf-8") if options.output else sys.stdout
+        counts = batch_mode.run(source, output, options.concurrency or batch_mode.CONCURRENCY, options.confirm, options.ambiguous)
+        sys.exit(1 if counts["failed"] or counts["error"] else 0)
+
+    if options.serve:
+        import daemon
+
+        daemon.run(options.serve)
+        sys.exit(0)
 
     while True:
-        user_prompt = input(change_calendar_api(utils.cur_calendar["id"])).strip()
+        user_prompt = input(calendar_cache.prompt(session.default.calendar["id"])).strip()
         if user_prompt.lower() in ["exit", "quit"]:
+            stats = response_cache.stats
+            print(f"♻️ Pamięć podręczna odpowiedzi: {stats['hits']} trafień, {stats['misses']} chybień")
             print("👋 Do widzenia!")
             break
         else:
-            choose_specified_model(user_prompt)
\ No newline at end of file
+            try:
+                dispatch(user_prompt)
+            except request_scheduler.DeadlineExceeded as e:
+                print(f"⏱️ Polecenie przekroczyło limit czasu: {e}")
+            except Exception as e:
+                print(f"❌ Nie udało się wykonać polecenia: {e}")
\ No newline at end of file
@@ -0,0 +1,437 @@
+"""Local expansion of recurring events (RFC 5545 RRULE, RDATE and EXDATE lines).
+
+The event mirror fetches a recurring event as one master (singleEvents=False)
+and expands the instances a range needs here, instead of downloading every
+instance of every series. Rules are expanded in the wall
+clock of the event's time zone, so "every Monday 10:00" stays at 10:00 across
+DST changes, and instances get the ids the Calendar API gives them.
+"""
+import math
+import calendar
+import datetime as dt
+from bisect import bisect_left
+from functools import lru_cache
+from typing import NamedTuple
+from zoneinfo import ZoneInfo
+
+TZ = ZoneInfo("Europe/Warsaw")
+
+# instances of one series in one month are cached; ranges asked for again reuse whole months
+CACHE_SIZE = 4096
+
+# periods without any instance after which an impossible rule (e.g. 30 February) is given up
+MAX_EMPTY_PERIODS = 1000
+
+WEEKDAY_CODES = ["MO", "TU", "WE", "TH", "FR", "SA", "SU"]
+
+WEEKDAY_NAMES = ["pon", "wt", "śr", "czw", "pt", "sob", "nd"]
+
+FREQUENCIES = ("DAILY", "WEEKLY", "MONTHLY", "YEARLY")
+
+class Rule(NamedTuple):
+    freq: str
+    interval: int = 1
+    count: int | None = None
+    until: str | None = None
+    # (ordinal or 0, weekday 0-6), e.g. (1, 4) for the first Friday, (-1, 0) for the last Monday
+    by_day: tuple = ()
+    by_month_day: tuple = ()
+    by_month: tuple = ()
+    week_start: int = 0
+
+class Series(NamedTuple):
+    """What an expansion depends on; hashable, so expansions can be cached per series."""
+    rules: tuple
+    rdates: tuple
+    exdates: frozenset
+    dtstart: dt.datetime
+    zone: str
+    all_day: bool
+
+@lru_cache(maxsize=CACHE_SIZE)
+def parse_rule(line: str) -> Rule:
+    """A Rule for an "RRULE:FREQ=WEEKLY;BYDAY=MO" line; ValueError for rule parts Hermes does not expand."""
+    parts = dict(part.split("=", 1) for part in line.removeprefix("RRULE:").split(";") if part)
+    fields = {}
+
+    for key, value in parts.items():
+        if key == "FREQ":
+            if value not in FREQUENCIES:
+                raise ValueError(f"unsupported recurrence frequency: {value}")
+            fields["freq"] = value
+        elif key == "INTERVAL":
+            fields["interval"] = int(value)
+        elif key == "COUNT":
+            fields["count"] = int(value)
+        elif key == "UNTIL":
+            fields["until"] = value
+        elif key == "BYDAY":
+            fields["by_day"] = tuple(
+                (int(day[:-2] or 0), WEEKDAY_CODES.index(day[-2:])) for day in value.split(",")
+            )
+        elif key == "BYMONTHDAY":
+            fields["by_month_day"] = tuple(int(day) for day in value.split(","))
+        elif key == "BYMONTH":
+            fields["by_month"] = tuple(int(month) for month in value.split(","))
+        elif key == "WKST":
+            fields["week_start"] = WEEKDAY_CODES.index(value)
+        else:
+            raise ValueError(f"unsupported recurrence rule part: {key}")
+
+    if "freq" not in fields:
+        raise ValueError(f"recurrence rule without FREQ: {line}")
+    return Rule(**fields)
+
+def _parse_moment(value: str, zone: ZoneInfo) -> dt.datetime:
+    """Local wall time of an iCalendar DATE, local DATE-TIME or UTC "...Z" DATE-TIME."""
+    if len(value) == 8:
+        return dt.datetime.strptime(value, "%Y%m%d")
+    if value.endswith("Z"):
+        moment = dt.datetime.strptime(value, "%Y%m%dT%H%M%SZ").replace(tzinfo=dt.timezone.utc)
+        return moment.astimezone(zone).replace(tzinfo=None)
+    return dt.datetime.strptime(value, "%Y%m%dT%H%M%S")
+
+def _parse_dates(line: str, zone: ZoneInfo, all_day: bool, time: dt.time) -> list[dt.datetime]:
+    """Local wall times of an "EXDATE;TZID=Europe/Warsaw:20250908T100000,..." or RDATE line."""
+    head, _, values = line.partition(":")
+    params = dict(param.split("=", 1) for param in head.split(";")[1:])
+    if "TZID" in params:
+        zone = ZoneInfo(params["TZID"])
+
+    moments = []
+    for value in values.split(","):
+        moment = _parse_moment(value, zone)
+        # a DATE in a timed series means the instance of that day
+        if len(value) == 8 and not all_day:
+            moment = dt.datetime.combine(moment.date(), time)
+        moments.append(moment)
+    return moments
+
+def series(event: dict) -> Series:
+    """The Series of a recurring event's master."""
+    start = event["start"]
+    all_day = "dateTime" not in start
+    zone_name = start.get("timeZone") or TZ.key
+    zone = ZoneInfo(zone_name)
+
+    if all_day:
+        dtstart = dt.datetime.fromisoformat(start["date"])
+    else:
+        dtstart = dt.datetime.fromisoformat(start["dateTime"].replace("Z", "+00:00"))
+        dtstart = (dtstart.astimezone(zone) if dtstart.tzinfo else dtstart).replace(tzinfo=None)
+
+    rules, rdates, exdates = [], [], set()
+    for line in event.get("recurrence", []):
+        name = line.split(":", 1)[0].split(";", 1)[0].upper()
+        if name == "RRULE":
+            rules.append(parse_rule(line))
+        elif name == "RDATE":
+            rdates.extend(_parse_dates(line, zone, all_day, dtstart.time()))
+        elif name == "EXDATE":
+            exdates.update(_parse_dates(line, zone, all_day, dtstart.time()))
+        else:
+            raise ValueError(f"unsupported recurrence line: {name}")
+
+    return Series(tuple(rules), tuple(sorted(set(rdates))), frozenset(exdates), dtstart, zone_name, all_day)
+
+def _add_months(year: int, month: int, months: int) -> tuple[int, int]:
+    index = year * 12 + month - 1 + months
+    return index // 12, index % 12 + 1
+
+def _month_days(rule: Rule, year: int, month: int, dtstart: dt.datetime) -> list[int]:
+    """Days of a month picked by BYMONTHDAY and BYDAY (both narrow the set), by default dtstart's day."""
+    length = calendar.monthrange(year, month)[1]
+    days = None
+
+    if rule.by_month_day:
+        days = {day if day > 0 else length + day + 1 for day in rule.by_month_day}
+    if rule.by_day:
+        first_weekday = calendar.monthrange(year, month)[0]
+        weekdays = set()
+        for ordinal, weekday in rule.by_day:
+            matching = list(range(1 + (weekday - first_weekday) % 7, length + 1, 7))
+            if not ordinal:
+                weekdays.update(matching)
+            elif -len(matching) <= ordinal <= len(matching):
+                weekdays.add(matching[ordinal - 1 if ordinal > 0 else ordinal])
+        days = weekdays if days is None else days & weekdays
+    if days is None:
+        days = {dtstart.day}
+
+    return sorted(day for day in days if 1 <= day <= length)
+
+def _year_days(rule: Rule, year: int, dtstart: dt.datetime) -> list[dt.date]:
+    if rule.by_month or rule.by_month_day or not rule.by_day:
+        months = rule.by_month or (range(1, 13) if rule.by_month_day or rule.by_day else (dtstart.month,))
+        return [dt.date(year, month, day) for month in months for day in _month_days(rule, year, month, dtstart)]
+
+    # BYDAY without BYMONTH counts weekdays within the whole year ("the 20th Monday")
+    days = set()
+    for ordinal, weekday in rule.by_day:
+        first = dt.date(year, 1, 1)
+        first += dt.timedelta(days=(weekday - first.weekday()) % 7)
+        matching = [first + dt.timedelta(weeks=week) for week in range(53) if (first + dt.timedelta(weeks=week)).year == year]
+        if not ordinal:
+            days.update(matching)
+        elif -len(matching) <= ordinal <= len(matching):
+            days.add(matching[ordinal - 1 if ordinal > 0 else ordinal])
+    return sorted(days)
+
+def _period_days(rule: Rule, dtstart: dt.datetime, period: int) -> list[dt.date]:
+    """Candidate days of one period (day, week, month or year) of the rule, in order."""
+    step = period * rule.interval
+    first = dtstart.date()
+
+    if rule.freq == "DAILY":
+        days = [first + dt.timedelta(days=step)]
+        if rule.by_day:
+            days = [day for day in days if day.weekday() in {weekday for _, weekday in rule.by_day}]
+        if rule.by_month_day:
+            days = [day for day in days if day.day in _month_days(rule._replace(by_day=()), day.year, day.month, dtstart)]
+    elif rule.freq == "WEEKLY":
+        week = first - dt.timedelta(days=(first.weekday() - rule.week_start) % 7) + dt.timedelta(weeks=step)
+        weekdays = sorted({weekday for _, weekday in rule.by_day} or {first.weekday()},
+                          key=lambda weekday: (weekday - rule.week_start) % 7)
+        days = [week + dt.timedelta(days=(weekday - rule.week_start) % 7) for weekday in weekdays]
+    elif rule.freq == "MONTHLY":
+        year, month = _add_months(first.year, first.month, step)
+        days = [dt.date(year, month, day) for day in _month_days(rule, year, month, dtstart)]
+    else:
+        days = _year_days(rule, first.year + step, dtstart)
+
+    if rule.by_month:
+        days = [day for day in days if day.month in rule.by_month]
+    return days
+
+def _first_period(rule: Rule, dtstart: dt.datetime, since: dt.date) -> int:
+    """The last period starting on or before since, so expansion can skip the periods before it."""
+    first = dtstart.date()
+    if since <= first:
+        return 0
+
+    if rule.freq == "DAILY":
+        periods = (since - first).days
+    elif rule.freq == "WEEKLY":
+        periods = (since - first).days // 7
+    elif rule.freq == "MONTHLY":
+        periods = (since.year - first.year) * 12 + since.month - first.month
+    else:
+        periods = since.year - first.year
+    return max(0, periods // rule.interval - 1)
+
+def _until(rule: Rule, zone: ZoneInfo) -> dt.datetime | None:
+    if rule.until is None:
+        return None
+    until = _parse_moment(rule.until, zone)
+    # UNTIL as a DATE includes the whole day
+    return until + dt.timedelta(days=1, microseconds=-1) if len(rule.until) == 8 else until
+
+def _iter_rule(rule: Rule, dtstart: dt.datetime, zone: ZoneInfo, since: dt.date | None = None):
+    """Local start times generated by one rule, in order, dtstart first (RFC 5545 counts it as the first instance)."""
+    until = _until(rule, zone)
+    period = 0 if since is None or rule.count else _first_period(rule, dtstart, since)
+    produced, empty = 0, 0
+
+    if period == 0:
+        produced = 1
+        yield dtstart
+
+    while empty < MAX_EMPTY_PERIODS:
+        found = False
+        for day in _period_days(rule, dtstart, period):
+            moment = dt.datetime.combine(day, dtstart.time())
+            if moment <= dtstart:
+                continue
+            if until is not None and moment > until:
+                return
+            if rule.count is not None and produced >= rule.count:
+                return
+            found = True
+            produced += 1
+            yield moment
+        empty = 0 if found else empty + 1
+        period += 1
+
+def _month_end(year: int, month: int) -> dt.datetime:
+    return dt.datetime(*_add_months(year, month, 1), 1)
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _counted(rule: Rule, dtstart: dt.datetime, zone: str) -> tuple[dt.datetime, ...]:
+    """Every instance of a COUNT rule; a bounded list, expanded once."""
+    return tuple(_iter_rule(rule, dtstart, ZoneInfo(zone)))
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _month(series: Series, year: int, month: int) -> tuple[dt.datetime, ...]:
+    """Local start times of a series' instances within one calendar month, RDATEs added and EXDATEs removed."""
+    begin, end = dt.datetime(year, month, 1), _month_end(year, month)
+    zone = ZoneInfo(series.zone)
+    moments = {moment for moment in series.rdates if begin <= moment < end}
+
+    for rule in series.rules:
+        if rule.count is not None:
+            counted = _counted(rule, series.dtstart, series.zone)
+            moments.update(counted[bisect_left(counted, begin):bisect_left(counted, end)])
+            continue
+        for moment in _iter_rule(rule, series.dtstart, zone, begin.date()):
+            if moment >= end:
+                break
+            if moment >= begin:
+                moments.add(moment)
+
+    return tuple(sorted(moments - series.exdates))
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _month_instances(series: Series, year: int, month: int, duration: dt.timedelta,
+                     zone_name: str | None) -> tuple[tuple, ...]:
+    """(start, end, start field, end field, id suffix) of each instance in a month, formatted once."""
+    zone = ZoneInfo(series.zone)
+    return tuple(
+        (
+            _timestamp(moment, zone, series.all_day), _timestamp(moment + duration, zone, series.all_day),
+            _date_field(moment, zone, series.all_day, zone_name),
+            _date_field(moment + duration, zone, series.all_day, zone_name),
+            instance_id("", moment, zone, series.all_day),
+        )
+        for moment in _month(series, year, month)
+    )
+
+def _timestamp(moment: dt.datetime, zone: ZoneInfo, all_day: bool) -> float:
+    # all-day events are placed in Europe/Warsaw, like event_store.to_timestamp() does
+    return moment.replace(tzinfo=TZ if all_day else zone).timestamp()
+
+def _duration(event: dict, all_day: bool, zone: ZoneInfo) -> dt.timedelta:
+    """Wall-clock length of the master, which every instance keeps."""
+    end = event.get("end", event["start"])
+    if all_day:
+        return dt.date.fromisoformat(end["date"]) - dt.date.fromisoformat(event["start"]["date"])
+    start = dt.datetime.fromisoformat(event["start"]["dateTime"].replace("Z", "+00:00"))
+    end = dt.datetime.fromisoformat(end["dateTime"].replace("Z", "+00:00"))
+    local = lambda moment: (moment.astimezone(zone) if moment.tzinfo else moment).replace(tzinfo=None)
+    return local(end) - local(start)
+
+def _date_field(moment: dt.datetime, zone: ZoneInfo, all_day: bool, zone_name: str | None) -> dict:
+    if all_day:
+        return {"date": moment.date().isoformat()}
+    field = {"dateTime": moment.replace(tzinfo=zone).isoformat()}
+    if zone_name:
+        field["timeZone"] = zone_name
+    return field
+
+def instance_id(master_id: str, moment: dt.datetime, zone: ZoneInfo, all_day: bool) -> str:
+    """The id the Calendar API gives the instance of a series starting at a local time."""
+    if all_day:
+        return f"{master_id}_{moment:%Y%m%d}"
+    return f"{master_id}_{moment.replace(tzinfo=zone).astimezone(dt.timezone.utc):%Y%m%dT%H%M%SZ}"
+
+def original_timestamp(event: dict) -> float:
+    """Start (epoch seconds) an instance had in its series before it was moved or cancelled."""
+    original = event.get("originalStartTime") or event["start"]
+    if "dateTime" in original:
+        return dt.datetime.fromisoformat(original["dateTime"].replace("Z", "+00:00")).timestamp()
+    return dt.datetime.combine(dt.date.fromisoformat(original["date"]), dt.time(0, 0), tzinfo=TZ).timestamp()
+
+def instances(event: dict, time_min: float, time_max: float, skip=()) -> list[dict]:
+    """Instances of a recurring event overlapping [time_min, time_max) (epoch seconds), in start order.
+
+    Each one is the master with its own start, end, id, recurringEventId and
+    originalStartTime, as singleEvents=True would list it. skip holds original
+    starts of instances that were moved or cancelled. Raises ValueError for
+    rules this module does not expand.
+    """
+    current = series(event)
+    zone = ZoneInfo(current.zone)
+    duration = _duration(event, current.all_day, zone)
+    zone_name = event["start"].get("timeZone")
+
+    first = dt.datetime.fromtimestamp(time_min, zone).replace(tzinfo=None) - duration - dt.timedelta(days=1)
+    last = dt.datetime.fromtimestamp(time_max, zone).replace(tzinfo=None) + dt.timedelta(days=1)
+    first = max(first, current.dtstart)
+
+    master = {key: value for key, value in event.items() if key not in ("recurrence", "id")}
+    found = []
+    year, month = first.year, first.month
+
+    while dt.datetime(year, month, 1) <= last:
+        for start, end, start_field, end_field, suffix in _month_instances(current, year, month, duration, zone_name):
+            if start >= time_max or end <= time_min or start in skip:
+                continue
+            found.append(dict(
+                master, id=event.get("id", "") + suffix, start=dict(start_field), end=dict(end_field),
+                recurringEventId=event.get("id"), originalStartTime=dict(start_field),
+            ))
+        year, month = _add_months(year, month, 1)
+
+    return found
+
+def span(event: dict) -> tuple[float, float]:
+    """(first start, last end) of a recurring event in epoch seconds; the end is inf for an endless series.
+
+    Rules this module does not expand get an endless span, so range queries
+    never miss them.
+    """
+    try:
+        current = series(event)
+    except ValueError:
+        start = event["start"]
+        return original_timestamp({"start": start}), math.inf
+
+    zone = ZoneInfo(current.zone)
+    duration = _duration(event, current.all_day, zone)
+    last = max(current.rdates, default=current.dtstart)
+
+    for rule in current.rules:
+        if rule.count is not None:
+            last = max(last, _counted(rule, current.dtstart, current.zone)[-1])
+        elif rule.until is not None:
+            last = max(last, _until(rule, zone))
+        else:
+            return _timestamp(current.dtstart, zone, current.all_day), math.inf
+
+    return _timestamp(current.dtstart, zone, current.all_day), _timestamp(last + duration, zone, current.all_day)
+
+def _plural(number: int, one: str, few: str, many: str) -> str:
+    if number == 1:
+        return one
+    if number % 10 in (2, 3, 4) and number % 100 not in (12, 13, 14):
+        return few
+    return many
+
+def _day_name(ordinal: int, weekday: int) -> str:
+    if ordinal == -1:
+        return f"ostatni {WEEKDAY_NAMES[weekday]}"
+    if ordinal < 0:
+        return f"{-ordinal}. od końca {WEEKDAY_NAMES[weekday]}"
+    return f"{ordinal}. {WEEKDAY_NAMES[weekday]}" if ordinal else WEEKDAY_NAMES[weekday]
+
+_EVERY = {
+    "DAILY": ("codziennie", "dni", "dni", "dni"),
+    "WEEKLY": ("co tydzień", "tydzień", "tygodnie", "tygodni"),
+    "MONTHLY": ("co miesiąc", "miesiąc", "miesiące", "miesięcy"),
+    "YEARLY": ("co roku", "rok", "lata", "lat"),
+}
+
+def describe(recurrence: list[str]) -> str:
+    """Short Polish description of an event's recurrence, e.g. "co tydzień: pon, śr, do 31.12.2025"."""
+    texts = []
+    for line in recurrence:
+        if not line.upper().startswith("RRULE"):
+            continue
+        try:
+            rule = parse_rule(line)
+        except ValueError:
+            texts.append(line)
+            continue
+
+        every, one, few, many = _EVERY[rule.freq]
+        text = every if rule.interval == 1 else f"co {rule.interval} {_plural(rule.interval, one, few, many)}"
+        days = [_day_name(ordinal, weekday) for ordinal, weekday in sorted(rule.by_day, key=lambda day: day[1])]
+        if days:
+            text += ": " + ", ".join(days)
+        if rule.by_month_day:
+            text += ", dnia " + ", ".join(str(day) for day in rule.by_month_day)
+        if rule.count is not None:
+            text += f", {rule.count} {_plural(rule.count, 'raz', 'razy', 'razy')}"
+        if rule.until is not None:
+            text += f", do {_parse_moment(rule.until, TZ):%d.%m.%Y}"
+        texts.append(text)
+    return "; ".join(texts)
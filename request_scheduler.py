@@ -0,0 +1,401 @@
+import os
+import time
+import random
+import asyncio
+import threading
+import contextlib
+import contextvars
+from collections import Counter
+from urllib.parse import urlsplit
+
+import tracing
+import utils
+
+# set HERMES_RATE_LIMIT_ENABLED=0 to send requests as soon as they are made (retries stay on)
+RATE_LIMIT_ENABLED = os.getenv("HERMES_RATE_LIMIT_ENABLED", "1") != "0"
+
+# (requests per second, burst) per API, below the default quotas: Calendar allows 600
+# requests a minute per user, Gmail 250 quota units a second (a messages.get costs 5),
+# Gemini limits every model separately
+RATE_LIMITS = {
+    "calendar": (float(os.getenv("HERMES_CALENDAR_RPS", "8")), 16),
+    "gmail": (float(os.getenv("HERMES_GMAIL_RPS", "40")), 50),
+    "gemini": (float(os.getenv("HERMES_GEMINI_RPS", "25")), 25),
+}
+
+MAX_ATTEMPTS = 5
+
+# full-jitter exponential backoff: attempt n sleeps a random time up to min(cap, base * 2**n)
+BACKOFF_BASE_SECONDS = 0.25
+BACKOFF_CAP_SECONDS = 8.0
+
+# retries may add this share of extra requests, plus a steady allowance per second,
+# so an outage does not multiply the load on an API that is already failing
+RETRY_BUDGET_RATIO = 0.2
+RETRY_BUDGET_PER_SECOND = 0.5
+RETRY_BUDGET_CAPACITY = 10.0
+
+# every command gives up on requests it cannot finish within this many seconds
+COMMAND_DEADLINE_SECONDS = 60.0
+
+# smaller model answering when the main one stays throttled or unavailable
+FALLBACK_MODELS = {"gemini-2.0-flash": "gemini-2.0-flash-lite"}
+
+# attempts at the main model before switching to its fallback
+ATTEMPTS_BEFORE_FALLBACK = 2
+
+# ask the fallback model too when the main one has not answered within this many
+# seconds and take the first answer (HERMES_HEDGE_AFTER_MS; off by default)
+HEDGE_AFTER_SECONDS = float(os.environ["HERMES_HEDGE_AFTER_MS"]) / 1000 if os.getenv("HERMES_HEDGE_AFTER_MS") else None
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# methods that may be sent again after a failure that could have reached the server
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "PUT", "DELETE", "PATCH"})
+
+stats = Counter()
+
+_deadline = contextvars.ContextVar("hermes_deadline", default=None)
+_buckets = {}
+_budgets = {}
+_lock = threading.Lock()
+
+class DeadlineExceeded(TimeoutError):
+    """The command ran out of time before a request could be sent or retried."""
+
+class RetryableResponse(Exception):
+    """An HTTP response with a retryable status, raised so call() retries it."""
+
+    def __init__(self, response, content: bytes):
+        super().__init__(f"HTTP {response.status}")
+        self.response = response
+        self.content = content
+
+class TokenBucket:
+    """rate tokens a second, at most capacity saved up; callers reserve a token and wait their turn."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self, cost: float = 1.0) -> float:
+        """Take cost tokens and return how long to wait before they are available.
+
+        Tokens may go negative, so concurrent callers queue up in arrival order.
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= cost
+            return max(0.0, -self.tokens / self.rate)
+
+    def refund(self, cost: float = 1.0):
+        with self.lock:
+            self.tokens = min(self.capacity, self.tokens + cost)
+
+class RetryBudget:
+    """Retries allowed as a share of recent requests, plus a small steady allowance."""
+
+    def __init__(self, ratio: float = RETRY_BUDGET_RATIO, per_second: float = RETRY_BUDGET_PER_SECOND,
+                 capacity: float = RETRY_BUDGET_CAPACITY):
+        self.ratio = ratio
+        self.per_second = per_second
+        self.capacity = capacity
+        self.balance = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, amount: float):
+        now = time.monotonic()
+        self.balance = min(self.capacity, self.balance + amount + (now - self.updated) * self.per_second)
+        self.updated = now
+
+    def record_request(self):
+        with self.lock:
+            self._refill(self.ratio)
+
+    def try_retry(self) -> bool:
+        with self.lock:
+            self._refill(0.0)
+            if self.balance < 1:
+                return False
+            self.balance -= 1
+            return True
+
+def _bucket(api: str) -> TokenBucket | None:
+    """Token bucket of an API; "gemini/<model>" gets one per model, as Gemini quotas are per model."""
+    limits = RATE_LIMITS.get(api.split("/")[0])
+    if limits is None:
+        return None
+    with _lock:
+        if api not in _buckets:
+            _buckets[api] = TokenBucket(*limits)
+        return _buckets[api]
+
+def _budget(api: str) -> RetryBudget:
+    with _lock:
+        if api not in _budgets:
+            _budgets[api] = RetryBudget()
+        return _budgets[api]
+
+def reset():
+    """Forget rate limit and retry budget state and counters, e.g. after changing the settings."""
+    with _lock:
+        _buckets.clear()
+        _budgets.clear()
+    stats.clear()
+
+@contextlib.contextmanager
+def deadline(seconds: float):
+    """Give the requests made inside (by the tasks and threads started there too) seconds to finish.
+
+    A nested deadline can only shorten the enclosing one.
+    """
+    current = _deadline.get()
+    new = time.monotonic() + seconds
+    token = _deadline.set(new if current is None else min(current, new))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+def remaining() -> float | None:
+    """Seconds left until the current deadline, or None without one."""
+    current = _deadline.get()
+    return None if current is None else current - time.monotonic()
+
+def status(error: Exception) -> int | None:
+    """HTTP status of a googleapiclient HttpError, a google-genai APIError or a RetryableResponse."""
+    if isinstance(error, RetryableResponse):
+        return error.response.status
+    response = getattr(error, "resp", None)
+    if response is not None:
+        return getattr(response, "status", None)
+    code = getattr(error, "code", None)
+    return code if isinstance(code, int) else None
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, DeadlineExceeded):
+        return False
+    code = status(error)
+    if code in RETRY_STATUSES:
+        return True
+    if code == 403:
+        # Calendar reports exceeded per-user quotas as 403 rateLimitExceeded / userRateLimitExceeded
+        content = error.content if isinstance(error, RetryableResponse) else getattr(error, "content", None)
+        return _rate_limited(content) or "ratelimitexceeded" in str(error).lower()
+    return code is None and isinstance(error, (ConnectionError, TimeoutError))
+
+def is_retryable_request(method: str, error: Exception) -> bool:
+    """is_retryable() for a request sent with method.
+
+    A request that is not idempotent (an insert, a sent e-mail, a batch) is
+    repeated only when the server surely did not act on it: it was throttled
+    or the connection was never made. After a 5xx or a dropped connection the
+    write may have happened, and a retry would duplicate it.
+    """
+    if method.upper() in IDEMPOTENT_METHODS:
+        return is_retryable(error)
+    if isinstance(error, ConnectionRefusedError):
+        return True
+    code = status(error)
+    return code == 429 or (code == 403 and is_retryable(error))
+
+def _retry_after(error: Exception) -> float:
+    response = error.response if isinstance(error, RetryableResponse) else getattr(error, "resp", None)
+    try:
+        return float(response.get("retry-after", 0))
+    except (AttributeError, TypeError, ValueError):
+        return 0.0
+
+def _slot_wait(api: str, cost: float) -> float:
+    """Reserve a slot in api's rate limit and return the wait; DeadlineExceeded if it ends past the deadline."""
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded(f"{api}: brak czasu na kolejne żądanie")
+
+    bucket = _bucket(api) if RATE_LIMIT_ENABLED else None
+    if bucket is None:
+        return 0.0
+
+    wait = bucket.reserve(cost)
+    if left is not None and wait >= left:
+        bucket.refund(cost)
+        raise DeadlineExceeded(f"{api}: limit żądań nie pozwala zdążyć przed terminem")
+    if wait > 0:
+        stats["throttled"] += 1
+    return wait
+
+def retry_delay(api: str, error: Exception, attempt: int, max_attempts: int,
+                retryable=is_retryable) -> float | None:
+    """Backoff before the next attempt, or None when the error should be raised instead."""
+    if not retryable(error) or attempt + 1 >= max_attempts:
+        return None
+    if not _budget(api).try_retry():
+        stats["budget_exhausted"] += 1
+        return None
+
+    delay = max(random.uniform(0, min(BACKOFF_CAP_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt)), _retry_after(error))
+    left = remaining()
+    if left is not None and delay >= left:
+        return None
+
+    stats["retries"] += 1
+    return delay
+
+def call(api: str, function, *args, cost: float = 1.0, max_attempts: int | None = None,
+         retryable=is_retryable, **kwargs):
+    """Run function(*args, **kwargs) under api's rate limit, retrying transient failures.
+
+    Errors retryable() accepts (429/5xx and dropped connections by default)
+    are retried with jittered exponential backoff while attempts, the API's
+    retry budget and the current deadline allow; otherwise the last error is
+    raised.
+    """
+    budget = _budget(api)
+    max_attempts = max_attempts or MAX_ATTEMPTS
+
+    for attempt in range(max_attempts):
+        wait = _slot_wait(api, cost)
+        if wait > 0:
+            with tracing.span("scheduler.throttle", api=api, wait_ms=round(wait * 1000, 1)):
+                time.sleep(wait)
+
+        budget.record_request()
+        try:
+            return function(*args, **kwargs)
+        except Exception as e:
+            delay = retry_delay(api, e, attempt, max_attempts, retryable)
+            if delay is None:
+                raise
+            with tracing.span("scheduler.backoff", api=api, attempt=attempt + 1, status=status(e)):
+                time.sleep(delay)
+
+async def call_async(api: str, function, *args, cost: float = 1.0, max_attempts: int | None = None,
+                     retryable=is_retryable, **kwargs):
+    """call() for a coroutine function; an attempt still running at the deadline is cancelled."""
+    budget = _budget(api)
+    max_attempts = max_attempts or MAX_ATTEMPTS
+
+    for attempt in range(max_attempts):
+        wait = _slot_wait(api, cost)
+        if wait > 0:
+            with tracing.span("scheduler.throttle", api=api, wait_ms=round(wait * 1000, 1)):
+                await asyncio.sleep(wait)
+
+        budget.record_request()
+        try:
+            left = remaining()
+            if left is None:
+                return await function(*args, **kwargs)
+            try:
+                return await asyncio.wait_for(function(*args, **kwargs), left)
+            except asyncio.TimeoutError:
+                raise DeadlineExceeded(f"{api}: brak odpowiedzi przed terminem") from None
+        except Exception as e:
+            delay = retry_delay(api, e, attempt, max_attempts, retryable)
+            if delay is None:
+                raise
+            with tracing.span("scheduler.backoff", api=api, attempt=attempt + 1, status=status(e)):
+                await asyncio.sleep(delay)
+
+def _batch_cost(uri: str, body) -> float:
+    """Calendar and Gmail quotas count every call of a batch request, not the request itself."""
+    if not urlsplit(uri).path.startswith("/batch") or not body:
+        return 1.0
+    text = body.decode("utf-8", "replace") if isinstance(body, bytes) else str(body)
+    return float(max(1, text.count("Content-ID:")))
+
+def _rate_limited(content: bytes | None) -> bool:
+    return any(reason in (content or b"") for reason in (b"rateLimitExceeded", b"userRateLimitExceeded"))
+
+def http_request(api: str, send, uri: str, method: str = "GET", body=None, *args, **kwargs):
+    """httplib2 send(uri, method, body, ...) through call(), retrying 429/5xx responses too.
+
+    Only idempotent methods are retried after a 5xx or a dropped connection
+    (see is_retryable_request). The last retryable response is returned as
+    is, so googleapiclient raises its usual HttpError for it.
+    """
+    def attempt():
+        response, content = send(uri, method, body, *args, **kwargs)
+        if response.status in RETRY_STATUSES or (response.status == 403 and _rate_limited(content)):
+            raise RetryableResponse(response, content)
+        return response, content
+
+    try:
+        return call(api, attempt, cost=_batch_cost(uri, body),
+                    retryable=lambda error: is_retryable_request(method, error))
+    except RetryableResponse as e:
+        return e.response, e.content
+
+async def _first_success(tasks: list):
+    """Result of the first task to succeed; the others are cancelled. Raises the last error if all fail."""
+    pending = set(tasks)
+    error = None
+    while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            if task.exception() is None:
+                for other in pending:
+                    other.cancel()
+                return task.result()
+            error = task.exception()
+    raise error
+
+async def _generate_async(model: str, contents, config, max_attempts: int | None = None):
+    return await call_async(
+        f"gemini/{model}", utils.get_genai_client().aio.models.generate_content,
+        model=model, contents=contents, config=config, max_attempts=max_attempts
+    )
+
+async def generate_content_async(model: str, contents, config):
+    """client.aio.models.generate_content with rate limiting and retries.
+
+    When model stays throttled or unavailable, its FALLBACK_MODELS entry answers
+    instead; with HEDGE_AFTER_SECONDS set, the fallback is also asked once the
+    main model is slow, and the first answer wins.
+    """
+    fallback = FALLBACK_MODELS.get(model)
+    if fallback is None:
+        return await _generate_async(model, contents, config)
+
+    primary = asyncio.ensure_future(_generate_async(model, contents, config, ATTEMPTS_BEFORE_FALLBACK))
+
+    if HEDGE_AFTER_SECONDS is not None:
+        done, _ = await asyncio.wait({primary}, timeout=HEDGE_AFTER_SECONDS)
+        if not done:
+            stats["hedged"] += 1
+            with tracing.span("llm.hedge", model=fallback):
+                return await _first_success([primary, asyncio.ensure_future(_generate_async(fallback, contents, config))])
+
+    try:
+        return await primary
+    except Exception as e:
+        if not is_retryable(e):
+            raise
+
+    stats["fallbacks"] += 1
+    with tracing.span("llm.fallback", model=fallback):
+        return await _generate_async(fallback, contents, config)
+
+def generate_content(model: str, contents, config):
+    """Blocking generate_content with rate limiting, retries and the fallback model."""
+    client = utils.get_genai_client()
+    fallback = FALLBACK_MODELS.get(model)
+
+    try:
+        return call(
+            f"gemini/{model}", client.models.generate_content, model=model, contents=contents, config=config,
+            max_attempts=ATTEMPTS_BEFORE_FALLBACK if fallback else None
+        )
+    except Exception as e:
+        if fallback is None or not is_retryable(e):
+            raise
+
+    stats["fallbacks"] += 1
+    with tracing.span("llm.fallback", model=fallback):
+        return call(f"gemini/{fallback}", client.models.generate_content, model=fallback, contents=contents, config=config)
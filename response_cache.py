@@ -0,0 +1,131 @@
+import os
+import re
+import copy
+import json
+import time
+import threading
+import datetime as dt
+from zoneinfo import ZoneInfo
+from collections import OrderedDict
+
+from utils import fold_text
+
+TZ = ZoneInfo("Europe/Warsaw")
+
+CACHE_FILE = os.getenv("HERMES_RESPONSE_CACHE", "response_cache.json")
+
+# set HERMES_RESPONSE_CACHE_ENABLED=0 to always ask Gemini
+ENABLED = os.getenv("HERMES_RESPONSE_CACHE_ENABLED", "1") != "0"
+
+CACHE_SIZE = 512
+
+TTL_SECONDS = 12 * 3600
+
+# answers to "za godzinę", "teraz" etc. depend on the clock, not only on the date, and are never cached
+_CLOCK_RELATIVE = re.compile(r"\bza\s+(?:\S+\s+)?(?:godz|minut|chwil|kwadrans)|\b(?:teraz|zaraz|natychmiast)\b")
+
+stats = {"hits": 0, "misses": 0, "uncacheable": 0}
+
+_cache = None
+_lock = threading.Lock()
+
+def normalize_prompt(text: str) -> str:
+    """Fold case and diacritics, drop punctuation and collapse whitespace."""
+    return " ".join(re.sub(r"[^\w]+", " ", fold_text(text)).split())
+
+def _key(prompt: str, intent: str, model: str) -> str | None:
+    """Cache key, or None for prompts whose answer depends on the time of day.
+
+    Every key carries today's date in Europe/Warsaw, the date context the
+    extraction instructions are given, so "jutro" cached yesterday can never
+    be served today.
+    """
+    normalized = normalize_prompt(prompt)
+    if not normalized or _CLOCK_RELATIVE.search(normalized):
+        return None
+
+    today = dt.datetime.now(tz=TZ).date().isoformat()
+    return "|".join((model, intent, today, normalized))
+
+def _load() -> OrderedDict:
+    global _cache
+
+    if _cache is None:
+        _cache = OrderedDict()
+        if os.path.exists(CACHE_FILE):
+            try:
+                with open(CACHE_FILE, "r", encoding="utf-8") as file:
+                    _cache.update(json.load(file))
+            except (OSError, ValueError):
+                pass
+        _expire()
+    return _cache
+
+def _expire():
+    now = time.time()
+    for key in [key for key, entry in _cache.items() if now - entry["stored_at"] > TTL_SECONDS]:
+        del _cache[key]
+
+def _save():
+    with open(CACHE_FILE, "w", encoding="utf-8") as file:
+        json.dump(_cache, file, ensure_ascii=False)
+
+def get(prompt: str, intent: str, model: str):
+    """Cached answer for the prompt at this stage, or None on a miss."""
+    if not ENABLED:
+        return None
+
+    key = _key(prompt, intent, model)
+
+    with _lock:
+        if key is None:
+            stats["uncacheable"] += 1
+            return None
+
+        cache = _load()
+        entry = cache.get(key)
+        if entry is None or time.time() - entry["stored_at"] > TTL_SECONDS:
+            cache.pop(key, None)
+            stats["misses"] += 1
+            return None
+
+        cache.move_to_end(key)
+        stats["hits"] += 1
+        return copy.deepcopy(entry["value"])
+
+def put(prompt: str, intent: str, model: str, value):
+    """Store a JSON-serializable answer, evicting the least recently used entries beyond CACHE_SIZE."""
+    if not ENABLED:
+        return
+
+    key = _key(prompt, intent, model)
+    if key is None:
+        return
+
+    with _lock:
+        cache = _load()
+        cache[key] = {"value": copy.deepcopy(value), "stored_at": time.time()}
+        cache.move_to_end(key)
+        while len(cache) > CACHE_SIZE:
+            cache.popitem(last=False)
+        _save()
+
+def get_function_call(prompt: str, intent: str, model: str) -> "types.FunctionCall | None":
+    value = get(prompt, intent, model)
+    if value is None:
+        return None
+
+    from google.genai import types
+
+    return types.FunctionCall(name=value["name"], args=value["args"])
+
+def put_function_call(prompt: str, intent: str, model: str, function_call: "types.FunctionCall"):
+    put(prompt, intent, model, {"name": function_call.name, "args": function_call.args})
+
+def clear():
+    global _cache
+
+    with _lock:
+        _cache = OrderedDict()
+        if os.path.exists(CACHE_FILE):
+            os.remove(CACHE_FILE)
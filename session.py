@@ -0,0 +1,87 @@
+import io
+import sys
+import contextlib
+import contextvars
+
+from conversation import ConversationHistory, history
+
+class Session:
+    """State shared by the commands of one user: the selected calendar and the conversation history.
+
+    answers holds fixed replies to the questions the API functions would
+    otherwise ask on stdin, by kind:
+    - "confirm": "Usunąć? (T/N)" and similar, "t" or "n"
+    - "choose": which of several matching events, e.g. "1", "w" (all) or "" (cancel)
+    - "color": whether to pick another color for an unknown one, "t" or "n"
+    - "new_color": the color to use instead
+
+    Questions without a fixed answer go to prompt (input() by default), and
+    with redirect_stdout() active, print() of the session's commands goes to
+    output instead of the real stdout. force_refresh is set while a command
+    starting with "odśwież" runs: its listings and lookups sync the event
+    mirror with the API first, however recent it is.
+    """
+
+    def __init__(self, calendar: dict | None = None, conversation: ConversationHistory | None = None,
+                 answers: dict | None = None, output=None, prompt=None):
+        self.calendar = calendar or {"summary": "primary", "id": "primary"}
+        self.history = conversation if conversation is not None else ConversationHistory()
+        self.answers = answers or {}
+        self.output = output
+        self.prompt = prompt
+        self.force_refresh = False
+
+    def ask(self, question: str, kind: str) -> str:
+        """Reply to a question from the session's answers, or ask the user through prompt."""
+        answer = self.answers.get(kind)
+        if answer is None:
+            return (self.prompt or input)(question)
+        print(f"{question}{answer}")
+        return answer
+
+# the interactive session of main.py; batch commands each run in a session of their own
+default = Session(conversation=history)
+
+_current = contextvars.ContextVar("hermes_session", default=default)
+
+def current() -> Session:
+    """Session of the running command (coroutines and I/O threads it started included)."""
+    return _current.get()
+
+class _SessionStdout(io.TextIOBase):
+    """sys.stdout replacement sending print() to the output of the current session, if it has one."""
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def _target(self):
+        output = current().output
+        return output if output is not None else self.stream
+
+    def write(self, text: str) -> int:
+        return self._target().write(text)
+
+    def flush(self):
+        self._target().flush()
+
+    def isatty(self) -> bool:
+        return self._target().isatty()
+
+@contextlib.contextmanager
+def redirect_stdout():
+    """Send print() of every session with an output there while the enclosed code runs."""
+    stdout = sys.stdout
+    sys.stdout = _SessionStdout(stdout)
+    try:
+        yield
+    finally:
+        sys.stdout = stdout
+
+@contextlib.contextmanager
+def use(session: Session):
+    """Run the enclosed code, and the tasks and threads it starts, in session."""
+    token = _current.set(session)
+    try:
+        yield session
+    finally:
+        _current.reset(token)
@@ -0,0 +1,111 @@
+import os
+import json
+import time
+import threading
+
+TOOLS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ai_tools_definitions")
+
+# how often (seconds) definition files are checked for changes
+RELOAD_CHECK_INTERVAL = 1.0
+
+_declarations = {}
+_tools = {}
+_configs = {}
+_mtimes = {}
+_checked_at = 0.0
+_lock = threading.RLock()
+
+def _validate(declaration: dict, path: str):
+    """Reject declarations Gemini would refuse, naming the offending file."""
+    if not isinstance(declaration.get("name"), str) or not declaration["name"]:
+        raise ValueError(f"{path}: function declaration needs a non-empty 'name'")
+    if not isinstance(declaration.get("description"), str):
+        raise ValueError(f"{path}: function declaration needs a 'description'")
+
+    parameters = declaration["parameters"]
+    if parameters.get("type") != "object" or not isinstance(parameters.get("properties"), dict):
+        raise ValueError(f"{path}: 'parameters' must be an object schema with 'properties'")
+
+    missing = set(parameters.get("required", [])) - set(parameters["properties"])
+    if missing:
+        raise ValueError(f"{path}: required parameters not declared: {', '.join(sorted(missing))}")
+
+def _scan() -> dict[str, float]:
+    return {
+        entry.path: entry.stat().st_mtime
+        for entry in os.scandir(TOOLS_DIR)
+        if entry.name.endswith(".json")
+    }
+
+def load():
+    """(Re)load every function declaration from ai_tools_definitions and drop built objects.
+
+    JSON files without 'parameters' (e.g. current_calendar.json) are data, not
+    function declarations, and are skipped.
+    """
+    global _declarations, _mtimes
+
+    with _lock:
+        mtimes = _scan()
+        declarations = {}
+
+        for path in sorted(mtimes):
+            with open(path, "r", encoding="utf-8") as file:
+                declaration = json.load(file)
+            if "parameters" not in declaration:
+                continue
+            _validate(declaration, path)
+            declarations[declaration["name"]] = declaration
+
+        _declarations = declarations
+        _mtimes = mtimes
+        _tools.clear()
+        _configs.clear()
+
+def _reload_if_changed():
+    global _checked_at
+
+    now = time.monotonic()
+    if _declarations and now - _checked_at < RELOAD_CHECK_INTERVAL:
+        return
+    _checked_at = now
+
+    if not _declarations or _scan() != _mtimes:
+        load()
+
+def declaration(name: str) -> dict:
+    with _lock:
+        _reload_if_changed()
+        return _declarations[name]
+
+def tool(*names: str) -> "types.Tool":
+    """Built Tool with the given function declarations, constructed once."""
+    from google.genai import types
+
+    with _lock:
+        _reload_if_changed()
+        if names not in _tools:
+            _tools[names] = types.Tool(function_declarations=[_declarations[name] for name in names])
+        return _tools[names]
+
+def config(names: tuple[str, ...], instructions: str, header: str = "") -> "types.GenerateContentConfig":
+    """GenerateContentConfig for the tools and static instructions, built once.
+
+    Only the time-dependent header (e.g. "Today is ...") is attached per call,
+    on a shallow copy of the cached config.
+    """
+    from google.genai import types
+
+    with _lock:
+        _reload_if_changed()
+        key = (names, instructions)
+        if key not in _configs:
+            _configs[key] = types.GenerateContentConfig(
+                tools=[tool(*names)],
+                system_instruction=instructions
+            )
+        base = _configs[key]
+
+    if not header:
+        return base
+    return base.model_copy(update={"system_instruction": header + instructions})
@@ -0,0 +1,201 @@
+import os
+import json
+import time
+import secrets
+import inspect
+import functools
+import threading
+import contextvars
+
+# HERMES_TRACE_FILE=trace.jsonl turns tracing on and appends every finished command to the file
+TRACE_FILE = os.getenv("HERMES_TRACE_FILE")
+
+# "jsonl" writes one span per line, "otlp" one OTLP/JSON ExportTraceServiceRequest per command
+TRACE_FORMAT = os.getenv("HERMES_TRACE_FORMAT", "jsonl")
+
+SERVICE_NAME = "hermes"
+
+ENABLED = bool(TRACE_FILE)
+
+# print a per-command breakdown after every command (main.py --profile)
+PROFILE = False
+
+_current = contextvars.ContextVar("hermes_span", default=None)
+_export_lock = threading.Lock()
+
+class _NoopSpan:
+    """Returned while tracing is off so instrumented code pays one flag check."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def set(self, **attributes):
+        pass
+
+_NOOP = _NoopSpan()
+
+class Span:
+    def __init__(self, name: str, attributes: dict):
+        parent = _current.get()
+
+        self.name = name
+        self.attributes = attributes
+        self.span_id = secrets.token_hex(8)
+        self.parent = parent
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        # every span of a trace shares the root's list, children append to it from any thread
+        self.spans = parent.spans if parent else []
+        self.start_ns = 0
+        self.end_ns = 0
+        self.error = None
+        self._token = None
+
+    def __enter__(self):
+        self.start_ns = time.time_ns()
+        self._perf_start = time.perf_counter_ns()
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.end_ns = self.start_ns + time.perf_counter_ns() - self._perf_start
+        if exc is not None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        _current.reset(self._token)
+        self.spans.append(self)
+
+        if self.parent is None:
+            _finish(self)
+        return False
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6
+
+def span(name: str, **attributes):
+    """Context manager timing one stage; nested spans become its children."""
+    if not ENABLED:
+        return _NOOP
+    return Span(name, attributes)
+
+def traced(name: str):
+    """Decorator wrapping every call of a function, sync or async, in a span."""
+    def decorator(function):
+        if inspect.iscoroutinefunction(function):
+            @functools.wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                if not ENABLED:
+                    return await function(*args, **kwargs)
+                with Span(name, {}):
+                    return await function(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return function(*args, **kwargs)
+            with Span(name, {}):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def record_usage(current, response):
+    """Attach Gemini token counts from a response's usage metadata to a span."""
+    usage = getattr(response, "usage_metadata", None)
+    if usage is not None:
+        current.set(
+            prompt_tokens=usage.prompt_token_count,
+            output_tokens=usage.candidates_token_count,
+            total_tokens=usage.total_token_count
+        )
+
+def configure(enabled: bool | None = None, trace_file: str | None = None, trace_format: str | None = None,
+              profile: bool | None = None):
+    """Change tracing settings at runtime; profiling or a trace file turn tracing on."""
+    global ENABLED, TRACE_FILE, TRACE_FORMAT, PROFILE
+
+    if trace_file is not None:
+        TRACE_FILE = trace_file
+    if trace_format is not None:
+        TRACE_FORMAT = trace_format
+    if profile is not None:
+        PROFILE = profile
+    ENABLED = enabled if enabled is not None else bool(TRACE_FILE) or PROFILE
+
+def _as_dict(item: Span) -> dict:
+    return {
+        "trace_id": item.trace_id,
+        "span_id": item.span_id,
+        "parent_id": item.parent.span_id if item.parent else None,
+        "name": item.name,
+        "start_ns": item.start_ns,
+        "duration_ms": round(item.duration_ms, 3),
+        "attributes": item.attributes,
+        "error": item.error,
+    }
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+def to_otlp(spans: list[Span]) -> dict:
+    """OTLP/JSON ExportTraceServiceRequest for one trace, as accepted by OpenTelemetry collectors."""
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+        "scopeSpans": [{
+            "scope": {"name": SERVICE_NAME},
+            "spans": [
+                {
+                    "traceId": item.trace_id,
+                    "spanId": item.span_id,
+                    "parentSpanId": item.parent.span_id if item.parent else "",
+                    "name": item.name,
+                    "kind": 1,
+                    "startTimeUnixNano": str(item.start_ns),
+                    "endTimeUnixNano": str(item.end_ns),
+                    "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in item.attributes.items()],
+                    "status": {"code": 2, "message": item.error} if item.error else {"code": 1},
+                }
+                for item in spans
+            ],
+        }],
+    }]}
+
+def _depth(item: Span) -> int:
+    depth = 0
+    while item.parent is not None:
+        item, depth = item.parent, depth + 1
+    return depth
+
+def breakdown(root: Span) -> str:
+    """Human-readable tree of a finished trace, children in start order."""
+    lines = []
+    for item in sorted(root.spans, key=lambda item: (item.start_ns, -item.end_ns)):
+        details = " ".join(f"{key}={value}" for key, value in item.attributes.items() if key != "prompt")
+        if item.error:
+            details += f" ❌ {item.error}"
+        lines.append(f"{item.duration_ms:9.1f} ms  {'  ' * _depth(item)}{item.name} {details}".rstrip())
+    return "\n".join(lines)
+
+def _finish(root: Span):
+    if PROFILE:
+        print(f"⏱️ Profil polecenia:\n{breakdown(root)}")
+
+    if TRACE_FILE:
+        if TRACE_FORMAT == "otlp":
+            lines = [json.dumps(to_otlp(root.spans), ensure_ascii=False)]
+        else:
+            lines = [json.dumps(_as_dict(item), ensure_ascii=False, default=str) for item in root.spans]
+
+        with _export_lock, open(TRACE_FILE, "a", encoding="utf-8") as file:
+            file.write("\n".join(lines) + "\n")
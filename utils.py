@@ -1,43 +1,229 @@
 import os
-from googleapiclient.discovery import build
-from google.oauth2.credentials import Credentials
-from google.auth.transport.requests import Request
-from google_auth_oauthlib.flow import InstalledAppFlow
+import json
+import functools
+import threading
+import unicodedata
+import datetime as dt
+from typing import TYPE_CHECKING
+from urllib.parse import urlsplit
+
+import tracing
+
+# google-genai, googleapiclient, httplib2 and the OAuth libraries take over a
+# second to import, so they are imported on first use, not with this module
+if TYPE_CHECKING:
+    from google.oauth2.credentials import Credentials
 
 SCOPES = [
-    "https://www.googleapis.com/auth/calendar",           
-    "https://www.googleapis.com/auth/calendar.events"     
+    "https://www.googleapis.com/auth/calendar",
+    "https://www.googleapis.com/auth/calendar.events",
+    # reading, labelling and sending mail; permanent deletion is not needed
+    "https://www.googleapis.com/auth/gmail.modify"
 ]
 
-cur_calendar = {"summary": "primary", "id": "primary"}
+TOKEN_FILE = "token.json"
+
+TOKEN_REFRESH_MARGIN = dt.timedelta(minutes=5)
+
+_creds = None
+_token_json = None
+_refresh_timer = None
+_generation = 0
+_discovery_docs = {}
+_genai_client = None
+_service_lock = threading.RLock()
+_thread_local = threading.local()
+
+@functools.cache
+def _traced_http_class():
+    """httplib2.Http subclass sending every request, batch requests included, through the
+    request scheduler of its API and recording a tracing span for every attempt."""
+    import httplib2
+    import request_scheduler
+
+    class TracedHttp(httplib2.Http):
+        # rate limit and retry budget the requests count against, set by get_service()
+        api = "calendar"
+
+        def _send(self, uri, method="GET", *args, **kwargs):
+            if not tracing.ENABLED:
+                return super().request(uri, method, *args, **kwargs)
+
+            with tracing.span("http.request", method=method, path=urlsplit(uri).path) as span:
+                response, content = super().request(uri, method, *args, **kwargs)
+                span.set(status=response.status, bytes=len(content or b""))
+                return response, content
+
+        def request(self, uri, method="GET", *args, **kwargs):
+            return request_scheduler.http_request(self.api, self._send, uri, method, *args, **kwargs)
+
+    return TracedHttp
+
+def _save_credentials(creds: "Credentials"):
+    """Write token.json only when the serialized token differs from the stored one."""
+    global _token_json
+
+    token_json = creds.to_json()
+    if token_json == _token_json:
+        return
+
+    with open(TOKEN_FILE, "w") as token:
+        token.write(token_json)
+    _token_json = token_json
+
+def _load_credentials() -> "Credentials":
+    """Load OAuth credentials from token.json, refreshing or running the consent flow if needed."""
+    global _token_json
+
+    from google.oauth2.credentials import Credentials
+    from google.auth.transport.requests import Request
+
+    creds = None
+
+    if os.path.exists(TOKEN_FILE):
+        with open(TOKEN_FILE, "r") as token:
+            _token_json = token.read()
+        info = json.loads(_token_json)
+        # a token granted before Gmail support lacks its scope and needs a new consent
+        if set(SCOPES) <= set(info.get("scopes", SCOPES)):
+            creds = Credentials.from_authorized_user_info(info, SCOPES)
+
+    if not creds or not creds.valid:
+        if creds and creds.expired and creds.refresh_token:
+            creds.refresh(Request())
+        else:
+            from google_auth_oauthlib.flow import InstalledAppFlow
+
+            flow = InstalledAppFlow.from_client_secrets_file("credentials.json", SCOPES)
+            creds = flow.run_local_server(port=0)
+        _save_credentials(creds)
+
+    return creds
+
+def _refresh_credentials():
+    """Refresh the shared token in the background before it expires."""
+    from google.auth.transport.requests import Request
+
+    with _service_lock:
+        if _creds is None:
+            return
+        try:
+            _creds.refresh(Request())
+            _save_credentials(_creds)
+        except Exception as e:
+            print(f"⚠️ Nie udało się odświeżyć tokenu Google: {e}")
+            return
+    _schedule_refresh()
+
+def _schedule_refresh():
+    global _refresh_timer
 
-messages = []
+    if _refresh_timer is not None:
+        _refresh_timer.cancel()
+        _refresh_timer = None
+
+    if _creds is None or _creds.expiry is None or not _creds.refresh_token:
+        return
+
+    # google-auth keeps expiry as a naive UTC datetime
+    now = dt.datetime.now(dt.timezone.utc).replace(tzinfo=None)
+    delay = (_creds.expiry - TOKEN_REFRESH_MARGIN - now).total_seconds()
+
+    _refresh_timer = threading.Timer(max(delay, 0.0), _refresh_credentials)
+    _refresh_timer.daemon = True
+    _refresh_timer.start()
+
+def get_credentials() -> "Credentials":
+    """Return process-wide OAuth credentials, loading them from disk only once."""
+    global _creds
+
+    with _service_lock:
+        if _creds is None:
+            with tracing.span("auth.load_credentials"):
+                _creds = _load_credentials()
+            _schedule_refresh()
+        return _creds
+
+def _get_discovery_doc(api: str, version: str) -> dict:
+    """Parse the packaged discovery document once per API."""
+    from googleapiclient.discovery_cache import get_static_doc
+
+    with _service_lock:
+        if (api, version) not in _discovery_docs:
+            _discovery_docs[(api, version)] = json.loads(get_static_doc(api, version))
+        return _discovery_docs[(api, version)]
+
+def get_service(api: str, version: str):
+    """Return a Google API client for the current thread.
+
+    httplib2 connections are not thread-safe, so every thread gets its own client
+    with a keep-alive connection pool, while credentials and the parsed discovery
+    document are shared by the whole process.
+    """
+    if getattr(_thread_local, "generation", None) != _generation:
+        _thread_local.services = {}
+        _thread_local.generation = _generation
+    services = _thread_local.services
+
+    service = services.get((api, version))
+    if service is None:
+        import google_auth_httplib2
+        from googleapiclient.discovery import build_from_document
+
+        with tracing.span("service.build", api=api, version=version):
+            traced_http = _traced_http_class()()
+            traced_http.api = api
+            http = google_auth_httplib2.AuthorizedHttp(get_credentials(), http=traced_http)
+            service = build_from_document(_get_discovery_doc(api, version), http=http)
+        services[(api, version)] = service
+
+    return service
+
+def get_genai_client():
+    """Return the process-wide Gemini client, importing google-genai and creating it on first use."""
+    global _genai_client
+
+    with _service_lock:
+        if _genai_client is None:
+            with tracing.span("genai.client"):
+                from google import genai
+
+                _genai_client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
+        return _genai_client
 
 def setup_calendar_service():
-    """Create an token file with authenticated Google Calendar service using OAuth tokens."""
+    """Return the shared authenticated Google Calendar service, building it on first use."""
     try:
-        creds = None
-
-        if os.path.exists("token.json"):
-            creds = Credentials.from_authorized_user_file("token.json", SCOPES)
-
-        if not creds or not creds.valid:
-            if creds and creds.expired and creds.refresh_token:
-                creds.refresh(Request())
-            else:
-                flow = InstalledAppFlow.from_client_secrets_file("credentials.json", SCOPES)
-                creds = flow.run_local_server(port=0)
-            with open("token.json", "w") as token:
-                token.write(creds.to_json())
-            
-        service = build("calendar", "v3", credentials=creds)
-        
-        return service
+        return get_service("calendar", "v3")
     except Exception as e:
         print(f"⚠️ Wystąpił błąd podczas konfigurowania usługi Kalendarza Google: {e}")
         return None
-    
+
+def setup_gmail_service():
+    """Return the shared authenticated Gmail service, building it on first use."""
+    try:
+        return get_service("gmail", "v1")
+    except Exception as e:
+        print(f"⚠️ Wystąpił błąd podczas konfigurowania usługi Gmail: {e}")
+        return None
+
+def reset_services():
+    """Drop cached credentials and clients, e.g. after token.json was replaced."""
+    global _creds, _token_json, _refresh_timer, _generation
+
+    with _service_lock:
+        if _refresh_timer is not None:
+            _refresh_timer.cancel()
+        _creds = None
+        _token_json = None
+        _refresh_timer = None
+        _generation += 1
+
 def hex_to_rgb(hex_color: str) -> tuple[int, int, int]:
     hex_color = hex_color.lstrip("#")
     return tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
 
+def fold_text(text: str) -> str:
+    """Lowercase text and strip Polish diacritics ("Spotkanie z Anią" -> "spotkanie z ania")."""
+    text = unicodedata.normalize("NFKD", text.lower().replace("ł", "l"))
+    return "".join(char for char in text if not unicodedata.combining(char))